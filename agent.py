@@ -2,15 +2,13 @@ from dotenv import load_dotenv
 import os
 import logging
 import sys
+import time
 import asyncio
-from mistralai import Mistral
 
 from livekit import agents, rtc
 from livekit.agents import AgentSession, RoomInputOptions
 from livekit.plugins import noise_cancellation
-from prompts import AGENT_INSTRUCTION, CUSTOMER_CARE_INSTRUCTION, SESSION_INSTRUCTION
 from tools import (
-    get_business_context,
     manage_customer,
 )
 
@@ -21,35 +19,8 @@ load_dotenv()
 setup_logging()
 logger = get_logger(__name__)
 
-# Initialize Mistral client (NEW API)
-mistral_client = Mistral(api_key=os.getenv("MISTRAL_API_KEY"))
-
 from typing import Any
 
-# Quick startup backend connectivity check to help debug DB/backend reachability
-def check_backend_connectivity() -> None:
-    try:
-        import requests
-        backend_url = os.getenv('BACKEND_URL', 'http://localhost:3000')
-        health = requests.get(f"{backend_url}/api/business/resolve", timeout=3)
-        if health.ok:
-            try:
-                data = health.json()
-                logger.info(f"Backend reachable: resolved business {data.get('businessId') or data.get('name', '(none)')}")
-            except Exception:
-                logger.info("Backend reachable: /api/business/resolve returned non-json response")
-        else:
-            logger.warning(f"Backend responded but returned status {health.status_code}")
-    except Exception as e:
-        logger.warning(f"Backend connectivity check failed: {e}")
-
-
-# Run the connectivity check at import/startup (best-effort)
-try:
-    check_backend_connectivity()
-except Exception:
-    pass
-
 # Warn if BACKEND_API_KEY is not configured - many protected backend endpoints
 # expect this key when tools call into the backend.
 if not os.getenv('BACKEND_API_KEY'):
@@ -59,13 +30,33 @@ from agent import safe_generate_reply
 from agent.history import (
     get_room_history,
     update_history,
+    load_room_history,
+    release_room,
     persist_user_message_if_possible,
     persist_assistant_message_if_possible,
     room_user_identity,
 )
+from agent.persistence import flush_conversation_writer, open_conversation_writer
 
 
 from agent.assistant import Assistant
+from agent.response_stream import ResponseStreamPublisher
+from agent.admission import priority_for_role
+from agent.deadline import clear_turn_deadline, scope_turn_deadlines, start_turn_deadline
+from agent.prewarm import prewarm, prewarmed
+from agent.backend_health import backend_health
+from agent.business_cache import start_context_warmer
+from agent.data_channel import (
+    DataChannelDispatcher, MSG_AGENT_RESPONSE, MSG_ROLE_CONTEXT, MSG_TEXT,
+    forget_room_encoding, negotiate_encoding, publish_message, set_room_encoding,
+)
+from agent.reply_scheduler import ReplyScheduler
+from agent.transcripts import TranscriptCoalescer
+from agent.load import configure_load_reporting, job_load_reporter, worker_load
+from agent.bootstrap import bootstrap_session, fetch_owner_profile
+from agent.instructions import instruction_cache, mode_for_role
+from agent.tasks import close_room_supervisor, get_room_supervisor, task_metrics
+from agent.welcome import TRIGGER_PARTICIPANT, TRIGGER_ROLE_CONTEXT, WelcomeGate, has_remote_participants
 
 
 async def collect_customer_info_if_needed(session: AgentSession, ctx, room_name: str, business_id: str):
@@ -208,10 +199,79 @@ async def collect_customer_info_if_needed(session: AgentSession, ctx, room_name:
 async def entrypoint(ctx: agents.JobContext):
     room_name = getattr(ctx.room, 'name', 'unknown')
     logger.info(f"Agent entrypoint called for room: {room_name}")
+    prewarm_report = getattr(getattr(ctx, 'proc', None), 'userdata', {}).get('prewarm_report')
+    if prewarm_report:
+        logger.debug(f"Job process was prewarmed: {prewarm_report}")
+    else:
+        logger.debug("Job process was not prewarmed; loading models on first use")
+    # Backend reachability is probed in the background; readers use backend_health.status
+    try:
+        backend_health.start()
+    except Exception as e:
+        logger.debug(f"Could not start backend health checks: {e}")
+    # Prewarm filled the business context cache; keep the hot businesses fresh from here
+    try:
+        start_context_warmer()
+    except Exception as e:
+        logger.debug(f"Could not start business context warmer: {e}")
+    # Publishes this job process's LLM, executor and loop-lag signals for worker_load
+    try:
+        job_load_reporter.start()
+    except Exception as e:
+        logger.debug(f"Could not start job load reporting: {e}")
     logger.debug(f"Agent joining room: {room_name}")
     session = None
+    assistant = None
     # Allow runtime overrides provided via data channel (e.g., role_context)
     runtime_overrides: dict = {}
+    # Greeting fires on role_context, a participant join or a fallback timer, whichever comes first
+    welcome_gate = WelcomeGate(room_name)
+    room_closed = asyncio.Event()
+    release_task = None
+    # Every background task for this room is tracked, limited and cancelled on exit
+    room_tasks = get_room_supervisor(room_name)
+    open_conversation_writer(room_name)
+    # Defaults until metadata parsing fills them in; the transcript flush reads them at call time
+    user_role = 'customer'
+    business_id = ''
+    # Agent speech is persisted once per turn from final transcription segments
+    transcripts = TranscriptCoalescer(
+        room_name,
+        lambda text: persist_assistant_message_if_possible(ctx, user_role, text, business_id),
+        room_tasks.spawn,
+    )
+
+    def release_room_resources():
+        """Flush pending history/conversation writes and drop per-room state; runs once per room."""
+        nonlocal release_task
+        if release_task is None:
+            async def _release():
+                try:
+                    await transcripts.close()
+                except Exception as e:
+                    logger.debug(f"Could not persist pending transcript for {room_name}: {e}")
+                try:
+                    await close_room_supervisor(room_name)
+                except Exception as e:
+                    logger.debug(f"Could not cancel background tasks for {room_name}: {e}")
+                # The last room in this process stops the health probes; the next entrypoint restarts them
+                if not task_metrics()['rooms']:
+                    try:
+                        await backend_health.stop()
+                    except Exception as e:
+                        logger.debug(f"Could not stop backend health checks: {e}")
+                try:
+                    await release_room(room_name)
+                except Exception as e:
+                    logger.debug(f"Could not release room history for {room_name}: {e}")
+                try:
+                    await flush_conversation_writer(room_name)
+                except Exception as e:
+                    logger.debug(f"Could not flush conversation writer for {room_name}: {e}")
+                forget_room_encoding(room_name)
+                logger.info(f"Released resources for room {room_name}; task metrics: {task_metrics()}")
+            release_task = asyncio.ensure_future(_release())
+        return release_task
     
     try:
         # Setup disconnect handler to clean up properly
@@ -229,6 +289,7 @@ async def entrypoint(ctx: agents.JobContext):
             try:
                 identity = getattr(participant, 'identity', 'unknown')
                 logger.debug(f"Participant connected/reconnected: {identity}")
+                welcome_gate.trigger(TRIGGER_PARTICIPANT)
                 # Participant can reconnect - agent is ready
             except Exception as e:
                 logger.debug(f"Error handling participant connect: {e}")
@@ -241,10 +302,38 @@ async def entrypoint(ctx: agents.JobContext):
                 logger.debug('Attached participant connection/disconnection handlers')
         except Exception as e:
             logger.debug(f"Could not attach participant event handlers: {e}")
+
+        # The job lives until the room disconnects or the worker shuts the job down
+        def handle_room_disconnected(*_):
+            logger.info(f"Room {room_name} disconnected")
+            room_closed.set()
+
+        async def release_on_shutdown(*_):
+            room_closed.set()
+            await release_room_resources()
+
+        try:
+            if hasattr(ctx, 'add_shutdown_callback'):
+                ctx.add_shutdown_callback(release_on_shutdown)
+            if hasattr(ctx.room, 'on'):
+                ctx.room.on('disconnected', handle_room_disconnected)
+        except Exception as e:
+            logger.debug(f"Could not attach room lifetime handlers: {e}")
     
     except Exception as e:
         logger.debug(f"Error in entrypoint setup: {e}")
     
+    # Warm room history from the configured history store (survives restarts for sqlite/redis)
+    try:
+        await load_room_history(room_name)
+    except Exception as e:
+        logger.debug(f"Could not load room history: {e}")
+
+    business_context = {}
+    owner_info = {}
+    general_user = {}
+    # Identifiers the current business_context/owner_info were resolved for
+    resolved_for = {'business': '', 'owner_email': ''}
     try:
         # 1. Parse and normalize metadata FIRST (before any other operations)
         # Try multiple methods to get metadata
@@ -332,146 +421,22 @@ async def entrypoint(ctx: agents.JobContext):
 
         # 2. Fetch business context if we have a businessId or can resolve one
         # PRIORITY: Fetch immediately for all roles to have context ready ASAP
-        business_context = {}
         # Helpful extras: frontend may provide slug or owner email in metadata.
         slug_candidate = None
         if isinstance(metadata, dict):
             slug_candidate = metadata.get('slug') or metadata.get('businessSlug') or metadata.get('business_slug')
 
-        # ALWAYS fetch business context immediately if we have businessId or slug
-        # This ensures the agent has ALL business details (name, description, products, policies, etc.) from the start
-        # This applies to ALL roles: owners, customers, and general users
-        # OPTIMIZATION: Parallelize business context and owner profile fetching for owners
-        identifier_to_fetch = None
-        if business_id:
-            identifier_to_fetch = business_id
-        elif slug_candidate:
-            identifier_to_fetch = slug_candidate
-        
-        if identifier_to_fetch:
-            try:
-                # Call the tool function directly
-                from livekit.agents import RunContext
-                mock_ctx = RunContext()
-                # Store room reference if possible
-                if hasattr(mock_ctx, 'room'):
-                    try:
-                        mock_ctx.room = ctx.room
-                    except Exception:
-                        pass
-
-                # OPTIMIZATION: Use asyncio.create_task for parallel execution if owner
-                if is_owner:
-                    # Fetch business context and owner profile in parallel
-                    business_task = asyncio.create_task(get_business_context(mock_ctx, identifier_to_fetch))
-                    business_context_result = await business_task
-                else:
-                    business_context_result = await get_business_context(mock_ctx, identifier_to_fetch)
-                if business_context_result:
-                    import json as _json
-                    try:
-                        business_context = _json.loads(business_context_result) if isinstance(business_context_result, str) else business_context_result
-                        logger.info(f"Successfully fetched business context for {identifier_to_fetch}: {business_context.get('name', 'unknown')}")
-                        logger.debug(f"Business context includes: name={business_context.get('name')}, description={bool(business_context.get('description'))}, products={len(business_context.get('products', []))}, policies={bool(business_context.get('policies'))}")
-                        
-                        # If we used slug and got businessId back, update business_id
-                        if slug_candidate and identifier_to_fetch == slug_candidate and not business_id:
-                            resolved_id = business_context.get('businessId') or business_context.get('_id')
-                            if resolved_id:
-                                business_id = str(resolved_id)
-                                logger.info(f"Resolved slug {slug_candidate} to businessId {business_id} in entrypoint")
-                    except Exception:
-                        business_context = {}
-                else:
-                    logger.warning(f"get_business_context returned empty result for {identifier_to_fetch}")
-            except Exception as e:
-                logger.warning(f"Failed to fetch business context: {e}")
-        
-        # For owners: Additional resolution if businessId wasn't found yet
-        if is_owner and not business_id:
-            # For owners, try to get businessId from metadata or try to resolve it
-            logger.debug("Owner detected but no businessId in metadata, attempting to resolve")
-            # Try to extract from room metadata more thoroughly
-            if isinstance(metadata, dict):
-                # Check for alternative metadata keys
-                alt_business_id = metadata.get('businessId') or metadata.get('business_id') or metadata.get('business')
-                if alt_business_id:
-                    business_id = str(alt_business_id)
-                    # Retry fetching with resolved businessId
-                    try:
-                        from livekit.agents import RunContext
-                        mock_ctx = RunContext()
-                        if hasattr(mock_ctx, 'room'):
-                            try:
-                                mock_ctx.room = ctx.room
-                            except Exception:
-                                pass
-                        business_context_result = await get_business_context(mock_ctx, business_id)
-                        if business_context_result:
-                            import json as _json
-                            try:
-                                business_context = _json.loads(business_context_result) if isinstance(business_context_result, str) else business_context_result
-                                logger.debug(f"Successfully fetched business context after resolution: {business_context.get('name', 'unknown')}")
-                            except Exception:
-                                business_context = {}
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch business context after resolution: {e}")
-            # If still no business_id, try resolving from owner email (metadata) via tools.get_owner_profile
-            if not business_id and isinstance(metadata, dict):
-                owner_email = metadata.get('userEmail') or metadata.get('ownerEmail') or metadata.get('email')
-                if owner_email and isinstance(owner_email, str) and '@' in owner_email:
-                    try:
-                        from tools import get_owner_profile
-                        from livekit.agents import RunContext
-                        mock_ctx = RunContext()
-                        if hasattr(mock_ctx, 'room'):
-                            try:
-                                mock_ctx.room = ctx.room
-                            except Exception:
-                                pass
-                        owner_res = await get_owner_profile(mock_ctx, owner_email)
-                        import json as _json
-                        parsed = _json.loads(owner_res) if isinstance(owner_res, str) else owner_res
-                        # If owner profile includes businessId or businesses list, pick first
-                        if isinstance(parsed, dict):
-                            found_bid = parsed.get('businessId') or parsed.get('business') or parsed.get('business_id')
-                            if found_bid:
-                                business_id = str(found_bid)
-                                try:
-                                    business_context_result = await get_business_context(mock_ctx, business_id)
-                                    if business_context_result:
-                                        business_context = _json.loads(business_context_result) if isinstance(business_context_result, str) else business_context_result
-                                except Exception:
-                                    pass
-                    except Exception:
-                        pass
-
-        # Additional fallback: If we still don't have business context and have slug, try one more time
-        # (This handles edge cases where the first fetch might have failed)
-        if (not business_context or not business_context.get('name')) and slug_candidate and identifier_to_fetch != slug_candidate:
-            try:
-                from livekit.agents import RunContext
-                mock_ctx = RunContext()
-                if hasattr(mock_ctx, 'room'):
-                    try:
-                        mock_ctx.room = ctx.room
-                    except Exception:
-                        pass
-                business_context_result = await get_business_context(mock_ctx, slug_candidate)
-                if business_context_result:
-                    import json as _json
-                    try:
-                        business_context = _json.loads(business_context_result) if isinstance(business_context_result, str) else business_context_result
-                        # If resolved, try to extract businessId
-                        if isinstance(business_context, dict):
-                            resolved_id = business_context.get('businessId') or business_context.get('_id')
-                            if resolved_id and not business_id:
-                                business_id = str(resolved_id)
-                                logger.info(f"Resolved slug {slug_candidate} to businessId {business_id} in fallback")
-                    except Exception:
-                        pass
-            except Exception as e:
-                logger.debug(f"Fallback slug resolution failed: {e}")
+        # Business context, owner profile and general-user identity are resolved concurrently
+        # under one deadline; everything below works with whatever arrived in time
+        boot = await bootstrap_session(ctx.room, metadata, user_role, business_id, slug_candidate)
+        business_context = boot['business_context'] or {}
+        business_id = boot['business_id'] or business_id
+        owner_info = boot['owner_info'] or {}
+        general_user = boot['general_user'] or {}
+        resolved_for['business'] = business_id or slug_candidate or ''
+        resolved_for['owner_email'] = metadata.get('userEmail') or metadata.get('ownerEmail') or metadata.get('email') or ''
+        if business_context:
+            logger.info(f"Successfully fetched business context for {business_id or slug_candidate}: {business_context.get('name', 'unknown')}")
     except Exception as e:
         logger.debug(f"Error preparing metadata/business context: {e}")
 
@@ -484,127 +449,45 @@ async def entrypoint(ctx: agents.JobContext):
     else:
         logger.warning(f"Business context is empty or not available for role {user_role}, businessId: {business_id}")
     
-    agent_config = business_context.get('agentConfig', {}) if isinstance(business_context, dict) else {}
-
-    # Evaluate mode first to avoid format string issues
-    mode_value = 'OWNER' if is_owner else ('GENERAL' if is_general else 'CUSTOMER')
-
-    # Convert business_hours dict to string if needed
-    business_hours_config = agent_config.get('businessHours', {}) if isinstance(agent_config, dict) else {}
-    if isinstance(business_hours_config, dict):
-        business_hours_str = ', '.join([f"{k}: {v}" for k, v in business_hours_config.items()]) if business_hours_config else '9-5'
-    else:
-        business_hours_str = str(business_hours_config) if business_hours_config else '9-5'
-
-    # Extract business details for agent instruction
+    # Compiled instructions are shared by every session with the same business, mode and context
+    mode_value = mode_for_role(user_role)
+    formatted_instruction = instruction_cache.get(business_id, mode_value, business_context)
     biz_name = business_context.get('name', 'the business') if isinstance(business_context, dict) else 'the business'
-    biz_description = business_context.get('description', '') if isinstance(business_context, dict) else ''
-    biz_products = business_context.get('products', []) if isinstance(business_context, dict) else []
-    biz_policies = business_context.get('policies', '') if isinstance(business_context, dict) else ''
-
-    formatted_instruction = AGENT_INSTRUCTION.format(
-        business_name=biz_name,
-        business_description=biz_description,
-        products_list=', '.join(biz_products) if isinstance(biz_products, list) else '',
-        business_policies=biz_policies,
-        mode=mode_value,
-        agent_tone=agent_config.get('tone', 'professional') if isinstance(agent_config, dict) else 'professional',
-        response_style=agent_config.get('responseStyle', 'concise') if isinstance(agent_config, dict) else 'concise',
-        business_hours_str=business_hours_str,
-        custom_prompt=agent_config.get('customPrompt', '') if isinstance(agent_config, dict) else ''
-    )
-    
-    logger.info(f"Agent instruction formatted with business_name='{biz_name}', mode={mode_value}")
-
-    # If customer role, append customer care guidance
-    if not is_owner and not is_general:
-        try:
-            formatted_instruction = f"{formatted_instruction}\n\n{CUSTOMER_CARE_INSTRUCTION}"
-        except Exception:
-            pass
-
-    # Always include session onboarding instruction in the assistant's system prompt
-    try:
-        formatted_instruction = f"{formatted_instruction}\n\n{SESSION_INSTRUCTION}"
-    except Exception:
-        pass
+    logger.info(f"Agent instruction formatted with business_name='{biz_name}', mode={mode_value}; cache: {instruction_cache.snapshot()}")
 
     # 4. Create the session
-    session = AgentSession()
+    # userdata carries per-turn state (e.g. the turn deadline) to tools via RunContext
+    session = AgentSession(userdata={})
 
     # 5. Start the session with room, agent, and input options (CRITICAL ORDER)
     try:
         logger.info(f"Starting agent session for room: {room_name}, role: {user_role}")
+        assistant = Assistant(
+            instructions=formatted_instruction,
+            business_id=business_id,
+            response_publisher=ResponseStreamPublisher(ctx.room),
+            llm_priority=priority_for_role(user_role),
+            mode=mode_value,
+        )
         await session.start(
             room=ctx.room,
-            agent=Assistant(instructions=formatted_instruction),
+            agent=assistant,
             room_input_options=RoomInputOptions(
                 video_enabled=True,
-                noise_cancellation=noise_cancellation.BVC(),
+                noise_cancellation=prewarmed(getattr(ctx, 'proc', None), 'noise_cancellation', noise_cancellation.BVC),
             ),
         )
         logger.info(f"Agent session started successfully for room: {room_name}")
+        welcome_gate.attach_first_audio(session)
+        scope_turn_deadlines(session)
     except Exception as e:
         logger.error(f"Failed to start agent session for room {room_name}: {e}")
         raise
 
-    # Fetch owner profile for owners to get name - do this early
-    # Also check if business context already includes owner info
-    owner_name = None
-    owner_info = {}
-    
-    # First, check if business context already has owner info (from business context API)
-    if is_owner and isinstance(business_context, dict) and business_context.get('owner'):
-        owner_from_context = business_context.get('owner')
-        if isinstance(owner_from_context, dict):
-            owner_info = owner_from_context.copy()
-            owner_name = owner_from_context.get('name')
-            logger.info(f"Using owner info from business context: {owner_name}")
-    
-    # If we don't have owner info yet, try fetching it
-    # OPTIMIZATION: Fetch owner profile in parallel with business context if not already available
-    if is_owner and (not owner_info or not owner_name):
-        try:
-            from tools import get_owner_profile
-            from livekit.agents import RunContext
-            mock_ctx = RunContext()
-            if hasattr(mock_ctx, 'room'):
-                try:
-                    mock_ctx.room = ctx.room
-                except Exception:
-                    pass
-            
-            # Try multiple methods to get owner info - fetch in parallel if possible
-            owner_email = metadata.get('userEmail') or metadata.get('ownerEmail') or metadata.get('email')
-            owner_tasks = []
-            
-            if owner_email:
-                owner_tasks.append(get_owner_profile(mock_ctx, owner_email))
-            
-            if business_id:
-                owner_tasks.append(get_owner_profile(mock_ctx, business_id))
-            
-            # Execute owner profile fetches in parallel
-            if owner_tasks:
-                try:
-                    results = await asyncio.gather(*owner_tasks, return_exceptions=True)
-                    import json as _json
-                    for owner_res in results:
-                        if isinstance(owner_res, Exception):
-                            continue
-                        try:
-                            parsed = _json.loads(owner_res) if isinstance(owner_res, str) else owner_res
-                            if isinstance(parsed, dict) and parsed and parsed.get('name'):
-                                owner_info = parsed
-                                owner_name = parsed.get('name')
-                                logger.info(f"Fetched owner profile: {owner_name}")
-                                break
-                        except Exception:
-                            continue
-                except Exception as e:
-                    logger.debug(f"Could not fetch owner profile in parallel: {e}")
-        except Exception as e:
-            logger.debug(f"Could not fetch owner profile: {e}")
+    # Owner profile was resolved during bootstrap (business context owner first, then profile lookups)
+    owner_name = owner_info.get('name') if is_owner and isinstance(owner_info, dict) else None
+    if owner_name:
+        logger.info(f"Using owner info: {owner_name}")
     
     # Fallback to metadata userName if available
     if not owner_name and metadata.get('userName'):
@@ -624,29 +507,9 @@ async def entrypoint(ctx: agents.JobContext):
         await ctx.connect()
         logger.info(f"Agent connected to room: {room_name}")
         
-        # Wait briefly for participants to join (especially for general rooms)
-        # This ensures the agent is ready when the user connects
-        logger.info(f"Waiting for participants to join room: {room_name}")
-        max_wait_for_participants = 10  # Wait up to 10 seconds
-        waited = 0
-        while waited < max_wait_for_participants:
-            try:
-                if hasattr(ctx.room, 'remote_participants'):
-                    remote_parts = getattr(ctx.room, 'remote_participants', {})
-                    if isinstance(remote_parts, dict) and len(remote_parts) > 0:
-                        logger.info(f"Found {len(remote_parts)} participant(s) in room: {room_name}")
-                        break
-                if hasattr(ctx.room, 'participants'):
-                    parts = getattr(ctx.room, 'participants', {})
-                    if isinstance(parts, dict):
-                        remote_count = len([p for p in parts.values() if hasattr(p, 'identity') and 'agent' not in str(p.identity).lower()])
-                        if remote_count > 0:
-                            logger.info(f"Found {remote_count} participant(s) in room: {room_name}")
-                            break
-            except Exception:
-                pass
-            await asyncio.sleep(0.5)
-            waited += 0.5
+        # Participants already in the room count as a join for the welcome trigger
+        if has_remote_participants(ctx.room):
+            welcome_gate.trigger(TRIGGER_PARTICIPANT)
     except Exception as e:
         logger.error(f"Failed to connect agent to room {room_name}: {e}")
         raise
@@ -674,162 +537,103 @@ async def entrypoint(ctx: agents.JobContext):
     # 7. Setup timeout state for monitoring (must be before data handler)
     # Timeout state removed - no longer monitoring timeouts
 
-    # 8. Setup data handler for incoming messages
-    async def _handle_incoming_data(payload, participant=None):
+    # 8. Data channel: one dispatcher decodes, deduplicates and routes every packet
+    async def _handle_role_context(message):
+        """role_context: override runtime metadata, resolve the business and greet."""
+        # role_context updates the session's role and business for every later handler
+        nonlocal user_role, is_owner, is_general, business_id
+        context_data = message.obj.get('context') if isinstance(message.obj, dict) else None
+        if not isinstance(context_data, dict):
+            return
         try:
-            text = None
-            raw = None
-
-            if isinstance(payload, (bytes, bytearray)):
-                try:
-                    raw = payload.decode('utf-8')
-                except Exception:
-                    raw = None
-            elif isinstance(payload, str):
-                raw = payload
-            elif hasattr(payload, 'data'):
-                try:
-                    raw = payload.data.decode('utf-8') if isinstance(payload.data, (bytes, bytearray)) else str(payload.data)
-                except Exception:
-                    raw = None
-
-            if raw:
+            runtime_overrides.update(context_data)
+            # Replies use msgpack frames only when this client says it can read them
+            set_room_encoding(room_name, negotiate_encoding(context_data))
+            
+            # Update user_role and other variables based on role_context
+            new_role = context_data.get('role', user_role)
+            if new_role and new_role != user_role:
+                user_role = new_role
+                is_owner = (user_role == 'owner')
+                is_general = (user_role == 'general')
+                logger.info(f"Role updated from role_context: {user_role}")
+            
+            # Update metadata with role_context info
+            if context_data.get('userName'):
+                metadata['userName'] = context_data['userName']
+            if context_data.get('userEmail'):
+                metadata['userEmail'] = context_data['userEmail']
+            if context_data.get('businessId'):
+                business_id = context_data['businessId']
+                metadata['businessId'] = business_id
+            if assistant is not None:
+                # Cached deep_reasoning answers follow the session's current role and business
+                assistant.set_cache_scope(business_id, mode_for_role(user_role))
+            
+            # Also try to update room metadata for consistency
+            try:
                 import json as _json
-                try:
-                    obj = _json.loads(raw)
-                except Exception:
-                    # If not JSON, treat raw string as text message
-                    text = raw if isinstance(raw, str) else str(raw)
-                    obj = None
+                merged = dict(getattr(ctx.room, 'metadata', {}) or {})
+                if isinstance(merged, str):
+                    try:
+                        merged = _json.loads(merged)
+                    except Exception:
+                        merged = {}
+                for k, v in runtime_overrides.items():
+                    merged[k] = v
+                if hasattr(ctx.room, 'set_metadata'):
+                    try:
+                        await ctx.room.set_metadata(_json.dumps(merged))
+                    except Exception:
+                        pass
+            except Exception:
+                pass
+            
+            # IMMEDIATELY fetch business context and owner info when role_context arrives
+            # This ensures the agent has all details before greeting
+            async def fetch_and_greet():
+                nonlocal business_context, owner_info, business_id
+                
+                slug_from_context = context_data.get('slug') or context_data.get('businessSlug') or ''
+                identifier_to_use = business_id or slug_from_context or ''
+                owner_email = context_data.get('userEmail') or metadata.get('userEmail') or ''
+                has_business = isinstance(business_context, dict) and bool(business_context.get('name'))
+                has_owner = isinstance(owner_info, dict) and bool(owner_info.get('name'))
+
+                # Session bootstrap already resolved the business (and owner) in parallel; only look
+                # again when role_context names a different business/owner or something is missing
+                business_changed = identifier_to_use not in ('', resolved_for['business'], business_context.get('businessId') if has_business else None)
+                owner_changed = bool(owner_email) and owner_email != resolved_for['owner_email']
+                needs_owner = user_role == 'owner' and (owner_changed or not has_owner)
+                if identifier_to_use and (business_changed or not has_business or needs_owner):
+                    try:
+                        boot = await bootstrap_session(ctx.room, metadata, user_role, business_id, slug_from_context or None)
+                        if boot['business_context'] or business_changed:
+                            business_context = boot['business_context'] or {}
+                        business_id = boot['business_id'] or business_id
+                        if boot['owner_info']:
+                            owner_info = boot['owner_info']
+                        resolved_for['business'] = identifier_to_use
+                        resolved_for['owner_email'] = owner_email
+                        logger.info(f"Re-resolved context after role_context: {business_context.get('name', 'unknown') if isinstance(business_context, dict) else 'unknown'}")
+                    except Exception as e:
+                        logger.warning(f"Error fetching business/owner context: {e}")
+                else:
+                    logger.debug('Greeting with the context resolved at session start')
 
-                if obj:
-                    # Handle role_context messages to override runtime metadata
-                    if obj.get('type') == 'role_context' and isinstance(obj.get('context'), dict):
-                        try:
-                            context_data = obj.get('context')
-                            runtime_overrides.update(context_data)
-                            
-                            # Update user_role and other variables based on role_context
-                            new_role = context_data.get('role', user_role)
-                            if new_role and new_role != user_role:
-                                user_role = new_role
-                                is_owner = (user_role == 'owner')
-                                is_general = (user_role == 'general')
-                                logger.info(f"Role updated from role_context: {user_role}")
-                            
-                            # Update metadata with role_context info
-                            if context_data.get('userName'):
-                                metadata['userName'] = context_data['userName']
-                            if context_data.get('userEmail'):
-                                metadata['userEmail'] = context_data['userEmail']
-                            if context_data.get('businessId'):
-                                business_id = context_data['businessId']
-                                metadata['businessId'] = business_id
-                            
-                            # Also try to update room metadata for consistency
-                            try:
-                                import json as _json
-                                merged = dict(getattr(ctx.room, 'metadata', {}) or {})
-                                if isinstance(merged, str):
-                                    try:
-                                        merged = _json.loads(merged)
-                                    except Exception:
-                                        merged = {}
-                                for k, v in runtime_overrides.items():
-                                    merged[k] = v
-                                if hasattr(ctx.room, 'set_metadata'):
-                                    try:
-                                        await ctx.room.set_metadata(_json.dumps(merged))
-                                    except Exception:
-                                        pass
-                            except Exception:
-                                pass
-                            
-                            # IMMEDIATELY fetch business context and owner info when role_context arrives
-                            # This ensures the agent has all details before greeting
-                            async def fetch_and_greet():
-                                nonlocal business_context, owner_info, business_id
-                                
-                                # Get slug from context_data if available
-                                slug_from_context = context_data.get('slug') or context_data.get('businessSlug') or ''
-                                
-                                # Fetch business context - try businessId first, then slug
-                                identifier_to_use = business_id or slug_from_context
-                                
-                                if identifier_to_use:
-                                    try:
-                                        from livekit.agents import RunContext
-                                        mock_ctx = RunContext()
-                                        if hasattr(mock_ctx, 'room'):
-                                            try:
-                                                mock_ctx.room = ctx.room
-                                            except Exception:
-                                                pass
-                                        
-                                        # Fetch business context (works with both businessId and slug)
-                                        business_context_result = await get_business_context(mock_ctx, identifier_to_use)
-                                        if business_context_result:
-                                            import json as _json
-                                            try:
-                                                business_context = _json.loads(business_context_result) if isinstance(business_context_result, str) else business_context_result
-                                                logger.info(f"Fetched business context for {identifier_to_use}: {business_context.get('name', 'unknown')}")
-                                                
-                                                # If we used slug and got businessId back, update business_id
-                                                if slug_from_context and not business_id:
-                                                    resolved_id = business_context.get('businessId') or business_context.get('_id')
-                                                    if resolved_id:
-                                                        business_id = str(resolved_id)
-                                                        logger.info(f"Resolved slug {slug_from_context} to businessId: {business_id}")
-                                            except Exception:
-                                                business_context = {}
-                                        
-                                        # For owners, also fetch owner profile
-                                        if user_role == 'owner':
-                                            owner_email = context_data.get('userEmail') or metadata.get('userEmail')
-                                            if owner_email:
-                                                try:
-                                                    from tools import get_owner_profile
-                                                    owner_res = await get_owner_profile(mock_ctx, owner_email)
-                                                    import json as _json
-                                                    parsed = _json.loads(owner_res) if isinstance(owner_res, str) else owner_res
-                                                    if isinstance(parsed, dict) and parsed:
-                                                        owner_info = parsed
-                                                        logger.info(f"Fetched owner profile: {owner_info.get('name', 'unknown')}")
-                                                except Exception as e:
-                                                    logger.warning(f"Failed to fetch owner profile: {e}")
-                                            # Also try fetching by businessId
-                                            if (not owner_info or not owner_info.get('name')) and business_id:
-                                                try:
-                                                    from tools import get_owner_profile
-                                                    owner_res = await get_owner_profile(mock_ctx, business_id)
-                                                    import json as _json
-                                                    parsed = _json.loads(owner_res) if isinstance(owner_res, str) else owner_res
-                                                    if isinstance(parsed, dict) and parsed:
-                                                        owner_info = parsed
-                                                        logger.info(f"Fetched owner profile by businessId: {owner_info.get('name', 'unknown')}")
-                                                except Exception as e:
-                                                    logger.warning(f"Failed to fetch owner profile by businessId: {e}")
-                                    except Exception as e:
-                                        logger.warning(f"Error fetching business/owner context: {e}")
-                                
-                                # Now send the welcome message with fresh data
-                                await send_role_specific_welcome(session, ctx, user_role, business_id, business_context, metadata, owner_info)
-                            
-                            # Fetch data and greet asynchronously
-                            asyncio.create_task(fetch_and_greet())
-                        except Exception as e:
-                            logger.warning(f"Error processing role_context: {e}")
-                        # No user text to process in this message
-                        return
-                    if obj.get('type') == 'text_message' and obj.get('text'):
-                        text = obj.get('text')
-                    elif obj.get('text'):
-                        # Also handle plain text in object
-                        text = obj.get('text')
-                elif not text and raw:
-                    # Raw string as fallback
-                    text = raw
+                # Now send the welcome message with fresh data
+                await send_role_specific_welcome(session, ctx, user_role, business_id, business_context, metadata, owner_info)
+            
+            # Fetch data and greet asynchronously
+            welcome_gate.trigger(TRIGGER_ROLE_CONTEXT)
+            room_tasks.spawn(fetch_and_greet(), 'fetch_and_greet')
+        except Exception as e:
+            logger.warning(f"Error processing role_context: {e}")
 
+    async def _handle_text_message(message):
+        """Chat text: record it in history, persist it and answer it."""
+        text = message.text
+        try:
             if not text:
                 return
 
@@ -846,701 +650,370 @@ async def entrypoint(ctx: agents.JobContext):
             except Exception:
                 pass
 
-            # Generate spoken reply with centralized timeout/error handling
-            try:
-                await safe_generate_reply(session, ctx, text, timeout=30.0)
-
-                # Send text response back via data channel so frontend can display it
-                try:
-                    import json as _json
-                    response_data = _json.dumps({
-                        'type': 'agent_response',
-                        'text': text  # The agent's response will be in the transcription/response
-                    })
-                    # Try to send via room data channel
-                    if hasattr(ctx.room, 'local_participant'):
-                        try:
-                            await ctx.room.local_participant.publish_data(
-                                response_data.encode('utf-8'),
-                                reliable=True
-                            )
-                        except:
-                            pass
-                except Exception:
-                    pass  # Don't fail if we can't send text response
-            except Exception:
-                logger.exception('Failed to generate reply from data message')
+            # Bursts are merged into one turn; a newer message supersedes a reply in progress
+            reply_scheduler.submit(text)
         except Exception:
             logger.exception('Unhandled error in data message handler')
 
-    # 6. Attach data handler for text messages
-        # According to LiveKit docs, agents receive text via lk.chat topic
-        # We need to listen to participant data events
-        async def _handle_participant_data(message, participant=None):
-            """Handle data messages from participants (text messages via lk.chat topic)"""
-            try:
-                # Extract data from message - handle different types
-                raw = None
-                topic = None
-                
-                # If message is a DataPacket
-                if hasattr(message, 'data'):
-                    data = message.data
-                    topic = getattr(message, 'topic', None) or getattr(message, 'topic', '') or ''
-                    
-                    if isinstance(data, (bytes, bytearray)):
-                        try:
-                            raw = data.decode('utf-8')
-                        except:
-                            raw = None
-                    else:
-                        raw = str(data) if data else None
-                # If message is bytes/string directly
-                elif isinstance(message, (bytes, bytearray)):
-                    try:
-                        raw = message.decode('utf-8')
-                    except:
-                        raw = None
-                elif isinstance(message, str):
-                    raw = message
-                # If it's a dict with data
-                elif isinstance(message, dict):
-                    raw = message.get('data') or message.get('text') or str(message)
-                    topic = message.get('topic', '')
-                
-                # Process if we have data (check topic if available)
-                # Accept messages with lk.chat topic OR no topic (fallback for compatibility)
-                should_process = False
-                if topic:
-                    if topic == 'lk.chat':
-                        should_process = True
-                else:
-                    # No topic specified - check if message looks like text
-                    should_process = True
-                
-                if raw and should_process:
-                    # Try to parse as JSON
-                    import json as _json
-                    text = None
-                    try:
-                        obj = _json.loads(raw)
-                        if isinstance(obj, dict):
-                            # Extract text from various possible fields
-                            text = obj.get('text') or obj.get('message') or obj.get('data') or raw
-                            # Also check if topic is in the object
-                            obj_topic = obj.get('topic', '')
-                            if obj_topic and obj_topic != 'lk.chat' and topic and topic != 'lk.chat':
-                                # Skip if topic doesn't match
-                                return
-                        else:
-                            text = raw
-                    except:
-                        # Not JSON, treat as plain text
-                        text = raw
-                    
-                    if text and text.strip():
-                        logger.debug(f"Received text message from participant: {text[:100]}")
-                        # Update room history
-                        try:
-                            rname = getattr(ctx.room, 'name', None)
-                            if rname:
-                                update_history(rname, 'user', text)
-                        except:
-                            pass
-                            # Persist user message if possible
-                            try:
-                                await persist_user_message_if_possible(ctx, user_role, text, business_id)
-                            except Exception:
-                                pass
-                        
-                        # Process the text message through the session with centralized handling
-                        try:
-                            ok = await safe_generate_reply(session, ctx, text, timeout=30.0)
-                            if ok:
-                                logger.info(f"Successfully processed text message and generated reply")
-                            else:
-                                logger.warning(f"Reply generation did not complete for text: {text[:50]}")
-                        except Exception as e:
-                            logger.exception(f"Failed to generate reply from text: {e}")
-            except Exception as e:
-                logger.exception(f"Error handling participant data: {e}")
-        
-        # Listen to room participant data events
-        # LiveKit agents receive text via data_received events from participants
+    async def _generate_text_reply(text):
+        """One reply turn for (possibly coalesced) chat text; run by the room's reply scheduler."""
+        deadline = start_turn_deadline(session)
         try:
-            def on_data_received(*args, **kwargs):
-                """Handle data_received event - can be called with different signatures"""
-                try:
-                    # Handle different event signatures
-                    packet = None
-                    participant = None
-                    topic = None
-                    
-                    # Try to extract from args/kwargs
-                    if args:
-                        packet = args[0] if len(args) > 0 else None
-                        participant = args[1] if len(args) > 1 else None
-                    
-                    if kwargs:
-                        packet = kwargs.get('packet') or kwargs.get('message') or packet
-                        participant = kwargs.get('participant') or participant
-                        topic = kwargs.get('topic') or ''
-                    
-                    # If packet is None, the whole first arg might be the packet
-                    if not packet and args:
-                        packet = args[0]
-                    
-                    if packet:
-                        # Check topic if available
-                        if hasattr(packet, 'topic'):
-                            topic = packet.topic or ''
-                        
-                        # Handle lk.chat topic messages
-                        if topic == 'lk.chat' or not topic:
-                            asyncio.create_task(_handle_participant_data(packet, participant))
-                except Exception as e:
-                    logger.debug(f"Error in on_data_received wrapper: {e}")
-            
-            # Attach listener to room - try multiple event names
-            if hasattr(ctx.room, 'on'):
-                try:
-                    ctx.room.on('data_received', on_data_received)
-                    logger.debug('Attached room data_received handler')
-                except Exception as e:
-                    logger.debug(f"Could not attach room data_received: {e}")
-                
-                # Also try 'data' event
-                try:
-                    ctx.room.on('data', on_data_received)
-                    logger.debug('Attached room data handler')
-                except:
-                    pass
-                
-                # Listen for new participants joining
-                async def on_participant_connected(participant):
-                    try:
-                        if hasattr(participant, 'on'):
-                            participant.on('data_received', on_data_received)
-                            participant.on('data', on_data_received)
-                            logger.debug(f"Attached data handler for new participant: {participant.identity}")
-                    except Exception as e:
-                        logger.debug(f"Could not attach handler for new participant: {e}")
-                
-                try:
-                    ctx.room.on('participant_connected', on_participant_connected)
-                    logger.debug('Attached participant_connected handler')
-                except Exception as e:
-                    logger.debug(f"Could not attach participant_connected: {e}")
-                
-            # Also attach to existing remote participants (users sending data to agent)
-            # From agent's perspective, users are remote participants
+            await safe_generate_reply(session, ctx, text, timeout=30.0)
+
+            # Send text response back via data channel so frontend can display it
             try:
-                if hasattr(ctx.room, 'remote_participants'):
-                    participants_dict = ctx.room.remote_participants
-                    if hasattr(participants_dict, 'values'):
-                        for participant in participants_dict.values():
-                            try:
-                                if participant and hasattr(participant, 'on'):
-                                    participant.on('data_received', on_data_received)
-                                    participant.on('data', on_data_received)
-                                    logger.debug(f"Attached data handler for existing participant: {getattr(participant, 'identity', 'unknown')}")
-                            except Exception as e:
-                                logger.debug(f"Could not attach handler for participant: {e}")
-                # Also try getting participants another way
-                elif hasattr(ctx.room, 'participants'):
-                    participants_dict = ctx.room.participants
-                    if hasattr(participants_dict, 'values'):
-                        for participant in participants_dict.values():
-                            try:
-                                # Skip the agent itself (local participant)
-                                if hasattr(participant, 'identity') and 'agent' not in str(participant.identity).lower():
-                                    if hasattr(participant, 'on'):
-                                        participant.on('data_received', on_data_received)
-                                        participant.on('data', on_data_received)
-                                        logger.debug(f"Attached data handler for participant: {participant.identity}")
-                            except Exception as e:
-                                logger.debug(f"Could not attach handler: {e}")
-            except Exception as e:
-                logger.debug(f"Could not iterate participants: {e}")
-                
-            logger.debug('Setup participant data handler for text messages')
-        except Exception as e:
-            logger.warning(f"Could not attach participant data handler: {e}")
-        
-        # Also try the old data handler as fallback
-        try:
-            attached = False
-            if hasattr(session, 'on') and callable(getattr(session, 'on')):
-                try: 
-                    session.on('data', _handle_incoming_data)
-                    attached = True
-                except: 
-                    pass
-                try: 
-                    session.on('data_received', _handle_incoming_data)
-                    attached = True
-                except: 
-                    pass
-            if not attached and hasattr(session, 'add_data_listener'):
-                try: 
-                    session.add_data_listener(_handle_incoming_data)
-                    attached = True
-                except: 
-                    pass
-            if not attached and hasattr(ctx.room, 'on'):
-                try: 
-                    ctx.room.on('data', _handle_incoming_data)
-                    attached = True
-                except: 
-                    pass
-                try:
-                    ctx.room.on('data_received', _handle_incoming_data)
-                    attached = True
-                except:
-                    pass
-            if attached:
-                logger.debug('Attached fallback data handler')
+                # The agent's response will be in the transcription/response
+                await publish_message(ctx.room, {'type': MSG_AGENT_RESPONSE, 'text': text})
+            except Exception:
+                pass  # Don't fail if we can't send text response
         except Exception:
-            logger.debug('Could not attach fallback data handler')
+            logger.exception('Failed to generate reply from data message')
+        finally:
+            clear_turn_deadline(session, deadline)
 
-        # Attach transcription listeners to capture assistant (agent) speech and persist it
-        try:
-            def on_transcription(event):
-                try:
-                    # Aggregate text from segments
-                    text = ''
-                    if hasattr(event, 'segments') and isinstance(event.segments, list):
-                        try:
-                            text = ' '.join([seg.text for seg in event.segments if getattr(seg, 'text', '')])
-                        except Exception:
-                            text = ''
-                    if not text and hasattr(event, 'text'):
-                        text = getattr(event, 'text', '')
+    def _interrupt_speech():
+        if session is not None and hasattr(session, 'interrupt'):
+            session.interrupt()
 
-                    if not text or not str(text).strip():
-                        return
+    reply_scheduler = ReplyScheduler(room_name, _generate_text_reply, interrupt=_interrupt_speech)
+    # Runs for the whole room, so it must not hold one of the handlers' slots
+    room_tasks.spawn(reply_scheduler.run(), 'reply_scheduler', limit=False)
 
-                    # Only persist if the transcription is from the agent (local participant)
+    data_dispatcher = DataChannelDispatcher(room_name, room_tasks.spawn)
+    data_dispatcher.route(MSG_ROLE_CONTEXT, _handle_role_context)
+    data_dispatcher.route(MSG_TEXT, _handle_text_message)
+    if data_dispatcher.attach(ctx.room):
+        logger.debug('Attached data channel dispatcher')
+
+    # Attach transcription listeners to capture assistant (agent) speech and persist it;
+    # only final segments are kept and each turn is written once
+    try:
+        def on_transcription(*args):
+            try:
+                # Either an event object with segments/participant or (segments, participant, publication)
+                event = args[0] if args else None
+                if isinstance(event, list):
+                    segments = event
+                    participant = args[1] if len(args) > 1 else None
+                else:
+                    segments = getattr(event, 'segments', None)
+                    if not isinstance(segments, list):
+                        segments = [event] if getattr(event, 'text', '') else []
                     participant = getattr(event, 'participant', None)
-                    local_participant = getattr(ctx.room, 'local_participant', None)
-                    if local_participant is not None and participant == local_participant:
-                        asyncio.create_task(persist_assistant_message_if_possible(ctx, user_role, text, business_id))
-                except Exception:
-                    pass
 
-            if hasattr(ctx.room, 'on'):
-                try:
-                    ctx.room.on('transcription', on_transcription)
-                except Exception:
-                    pass
-                try:
-                    ctx.room.on('transcriptionReceived', on_transcription)
-                except Exception:
-                    pass
-        except Exception:
-            logger.debug('Could not attach transcription listeners')
+                # Only persist if the transcription is from the agent (local participant)
+                local_participant = getattr(ctx.room, 'local_participant', None)
+                if local_participant is not None and participant == local_participant and segments:
+                    transcripts.add_segments(segments)
+            except Exception:
+                pass
 
-        # 8. Setup text input handler via AgentSession (if available)
-        # AgentSession may have built-in text handling
-        try:
-            if hasattr(session, 'on_user_text') or hasattr(session, 'handle_text'):
-                logger.debug('AgentSession has built-in text handling')
-            
-            # Also try to use AgentSession's text message handler if it exists
-            if hasattr(session, 'on'):
+        if hasattr(ctx.room, 'on'):
+            for event_name in ('transcription_received', 'transcription', 'transcriptionReceived'):
                 try:
-                    session.on('user_message', lambda msg: asyncio.create_task(_handle_participant_data(msg.text if hasattr(msg, 'text') else msg, None)))
-                    logger.debug('Attached session user_message handler')
-                except:
+                    ctx.room.on(event_name, on_transcription)
+                except Exception:
                     pass
-        except Exception as e:
-            logger.debug(f"Could not setup session text handler: {e}")
-        
-        # If owner, attempt to fetch owner details from business_context
-        owner_info = {}
-        if is_owner:
-            # Prefer owner info embedded in business_context if present
-            if isinstance(business_context, dict):
-                owner_info = business_context.get('owner') or business_context.get('ownerInfo') or {}
-            else:
-                owner_info = {}
-            # If owner_info is empty, we'll try metadata or business id below
-            # business_context may include owner metadata
-            # If owner_info is just an email or id, try to resolve via backend tool
-            try:
-                # Prefer to resolve full owner profile via tools.get_owner_profile
-                from tools import get_owner_profile
-                resolved = None
-                # If business_context has owner email or id, try that first
-                candidate = None
-                if isinstance(owner_info, dict):
-                    candidate = owner_info.get('email') or owner_info.get('id') or owner_info.get('_id')
-                elif isinstance(owner_info, str):
-                    candidate = owner_info
 
-                # If we have a candidate (email or id/slug), try resolving
-                if candidate:
-                    try:
-                        res = await get_owner_profile(mock_ctx, candidate)
-                        import json as _json
-                        if res:
-                            try:
-                                parsed = _json.loads(res) if isinstance(res, str) else res
-                                if isinstance(parsed, dict) and parsed:
-                                    resolved = parsed
-                                elif isinstance(parsed, list) and parsed:
-                                    resolved = parsed[0]
-                            except Exception:
-                                resolved = None
-                    except Exception:
-                        resolved = None
+        # The agent going quiet ends its turn without waiting for the gap timer
+        def on_agent_state(event):
+            if getattr(event, 'old_state', None) == 'speaking':
+                transcripts.end_turn()
 
-                # If resolution succeeded, use it; otherwise keep owner_info as-is
-                if resolved:
-                    owner_info = resolved
-                else:
-                    # If owner_info is an email string, normalize to dict
-                    if isinstance(owner_info, str) and '@' in owner_info:
-                        owner_info = {'email': owner_info}
-            except Exception:
-                owner_info = owner_info or {}
-
-            # If we still don't have owner_info, try metadata or business_id
+        if hasattr(session, 'on'):
             try:
-                if (not owner_info or (isinstance(owner_info, dict) and not owner_info.get('email') and not owner_info.get('name'))):
-                    md = metadata or {}
-                    candidate = None
-                    # Common metadata fields used by frontends
-                    candidate = md.get('ownerEmail') or md.get('email') or md.get('owner') or None
-                    if not candidate and business_id:
-                        candidate = business_id
-                    if candidate:
-                        try:
-                            res = await get_owner_profile(mock_ctx, candidate)
-                            import json as _json
-                            parsed = _json.loads(res) if isinstance(res, str) else res
-                            if isinstance(parsed, dict) and parsed:
-                                owner_info = parsed
-                        except Exception:
-                            pass
+                session.on('agent_state_changed', on_agent_state)
             except Exception:
                 pass
+    except Exception:
+        logger.debug('Could not attach transcription listeners')
 
-        # 9. Wait for role_context before sending welcome message
-        # This ensures we have the correct role from the frontend
-        # Set up a flag to track if welcome has been sent
-        welcome_sent = False
+    # 8. Setup text input handler via AgentSession (if available)
+    # AgentSession may have built-in text handling
+    try:
+        if hasattr(session, 'on_user_text') or hasattr(session, 'handle_text'):
+            logger.debug('AgentSession has built-in text handling')
         
-        async def send_role_specific_welcome(session, ctx, role, biz_id, biz_context, meta, owner_info_dict):
-            """Send role-specific welcome message"""
-            nonlocal welcome_sent
-            if welcome_sent:
-                return  # Already sent
-            welcome_sent = True
-            
-            welcome_msg = "Hello! I'm Voxa. How can I help you today?"
-            
+        # Also try to use AgentSession's text message handler if it exists
+        if hasattr(session, 'on'):
             try:
-                if role == 'owner':
-                    # Get owner name from multiple sources
-                    owner_name = None
-                    if isinstance(owner_info_dict, dict) and owner_info_dict.get('name'):
-                        owner_name = owner_info_dict.get('name')
-                    if not owner_name:
-                        owner_name = meta.get('userName') or meta.get('ownerName')
-                    if not owner_name and isinstance(owner_info_dict, dict) and owner_info_dict.get('email'):
-                        try:
-                            owner_name = owner_info_dict.get('email').split('@', 1)[0]
-                        except:
-                            pass
-                    if not owner_name and meta.get('userEmail'):
-                        try:
-                            owner_name = meta.get('userEmail').split('@', 1)[0]
-                        except:
-                            pass
-                    
-                    # Get business name from business context (should be available now)
-                    biz_name = biz_context.get('name') if isinstance(biz_context, dict) else None
-                    if not biz_name:
-                        biz_name = 'your business'
-                    
-                    # Use proper greeting from prompts.py with business name
-                    if owner_name and biz_name and biz_name != 'your business':
-                        welcome_msg = f"Hi {owner_name}! Welcome back to your Voxa business assistant for {biz_name}. I'm here to help you manage your business, handle customer inquiries, and keep everything running smoothly. What would you like to focus on today?"
-                    elif owner_name:
-                        welcome_msg = f"Hi {owner_name}! Welcome back to your Voxa business assistant. I'm here to help you manage your business, handle customer inquiries, and keep everything running smoothly. What would you like to focus on today?"
-                    elif biz_name and biz_name != 'your business':
-                        welcome_msg = f"Hi! Welcome back to your Voxa business assistant for {biz_name}. I'm here to help you manage your business, handle customer inquiries, and keep everything running smoothly. What would you like to focus on today?"
-                    else:
-                        welcome_msg = "Hi! Welcome back to your Voxa business assistant. I'm here to help you manage your business, handle customer inquiries, and keep everything running smoothly. What would you like to focus on today?"
-                elif role == 'customer':
-                    # Customer-facing greeting from prompts.py
-                    try:
-                        biz_name = biz_context.get('name') if isinstance(biz_context, dict) else None
-                    except Exception:
-                        biz_name = None
-                    if biz_name:
-                        welcome_msg = f"Hi there! I'm Voxa, your AI assistant for {biz_name}. I'm here to help with whatever you need. To get started and provide you with the best support, I'll just need a few quick details from you. Don't worry, your information stays completely secure and is only used for support purposes."
-                    else:
-                        welcome_msg = "Hi there! I'm Voxa, your AI assistant. I'm here to help with whatever you need. To get started and provide you with the best support, I'll just need a few quick details from you. Don't worry, your information stays completely secure and is only used for support purposes."
-                else:
-                    # General users (public) - greeting from prompts.py
-                    gen_name = meta.get('userName') or meta.get('name') or None
-                    gen_email = meta.get('userEmail') or meta.get('email') or None
-                    
-                    # If name not in metadata, try to fetch from backend using email
-                    if not gen_name and gen_email:
-                        try:
-                            import requests as _req
-                            backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
-                            api_key = os.getenv('BACKEND_API_KEY', '')
-                            headers = {}
-                            if api_key:
-                                headers["Authorization"] = f"Bearer {api_key}"
-                            
-                            try:
-                                import urllib.parse
-                                encoded_email = urllib.parse.quote(gen_email, safe='')
-                                gen_user_resp = _req.get(
-                                    f"{backend_url}/api/auth/general/user/{encoded_email}",
-                                    headers=headers,
-                                    timeout=5
-                                )
-                                if gen_user_resp.status_code == 200:
-                                    gen_user_data = gen_user_resp.json()
-                                    if gen_user_data.get('name'):
-                                        gen_name = gen_user_data.get('name')
-                                        logger.debug(f"Fetched general user name from backend: {gen_name}")
-                            except Exception as e:
-                                logger.debug(f"Failed to fetch general user by email: {e}")
-                        except Exception:
-                            pass
+                # Same dispatcher as the data channel, so a message seen on both is answered once
+                session.on('user_message', lambda msg: data_dispatcher.on_session_text(msg.text if hasattr(msg, 'text') else msg))
+                logger.debug('Attached session user_message handler')
+            except:
+                pass
+    except Exception as e:
+        logger.debug(f"Could not setup session text handler: {e}")
+    
+    # Owner details were resolved during bootstrap; only look further if nothing usable arrived
+    if is_owner and not (isinstance(owner_info, dict) and (owner_info.get('name') or owner_info.get('email'))):
+        ctx_owner = business_context.get('ownerInfo') if isinstance(business_context, dict) else None
+        candidate = None
+        if isinstance(ctx_owner, dict):
+            candidate = ctx_owner.get('email') or ctx_owner.get('id') or ctx_owner.get('_id')
+        elif isinstance(ctx_owner, str):
+            candidate = ctx_owner
+        candidate = candidate or metadata.get('ownerEmail') or metadata.get('email') or metadata.get('owner') or business_id
+        if candidate:
+            try:
+                owner_info = await fetch_owner_profile(ctx.room, candidate) or owner_info
+            except Exception as e:
+                logger.debug(f"Could not resolve owner profile: {e}")
 
-                    # Use proper greeting from prompts.py
-                    if gen_name:
-                        welcome_msg = f"Hi {gen_name}! I'm Voxa. I can help with info, support, and more. What would you like help with today?"
-                    elif gen_email:
-                        try:
-                            local = gen_email.split('@', 1)[0]
-                            if local:
-                                welcome_msg = f"Hi {local}! I'm Voxa. I can help with info, support, and more. What would you like help with today?"
-                            else:
-                                welcome_msg = "Hey! I'm Voxa. I can help with info, support, and more. What's your name?"
-                        except Exception:
-                            welcome_msg = "Hey! I'm Voxa. I can help with info, support, and more. What's your name?"
-                    else:
-                        welcome_msg = "Hey! I'm Voxa. I can help with info, support, and more. What's your name?"
-                
-                logger.info(f"Generated welcome message for {role}: {welcome_msg[:100]}...")
-                
-                # Wait for at least one participant to connect before sending welcome
-                # Reduced wait time for faster response
-                max_wait = 2  # Reduced from 5 to 2 seconds
-                wait_interval = 0.2  # Reduced from 0.5 to 0.2 for faster checks
-                waited = 0
-                participants_connected = False
-                
-                while waited < max_wait:
+    # 9. Wait for role_context before sending welcome message
+    # This ensures we have the correct role from the frontend
+    # Set up a flag to track if welcome has been sent
+    welcome_sent = False
+    
+    async def send_role_specific_welcome(session, ctx, role, biz_id, biz_context, meta, owner_info_dict):
+        """Send role-specific welcome message"""
+        nonlocal welcome_sent
+        if welcome_sent:
+            return  # Already sent
+        welcome_sent = True
+        
+        welcome_msg = "Hello! I'm Voxa. How can I help you today?"
+        
+        try:
+            if role == 'owner':
+                # Get owner name from multiple sources
+                owner_name = None
+                if isinstance(owner_info_dict, dict) and owner_info_dict.get('name'):
+                    owner_name = owner_info_dict.get('name')
+                if not owner_name:
+                    owner_name = meta.get('userName') or meta.get('ownerName')
+                if not owner_name and isinstance(owner_info_dict, dict) and owner_info_dict.get('email'):
                     try:
-                        if hasattr(ctx.room, 'remote_participants'):
-                            remote_parts = getattr(ctx.room, 'remote_participants', {})
-                            if isinstance(remote_parts, dict) and len(remote_parts) > 0:
-                                participants_connected = True
-                                break
-                        if hasattr(ctx.room, 'participants'):
-                            parts = getattr(ctx.room, 'participants', {})
-                            if isinstance(parts, dict):
-                                remote_count = len([p for p in parts.values() if hasattr(p, 'identity') and 'agent' not in str(p.identity).lower()])
-                                if remote_count > 0:
-                                    participants_connected = True
-                                    break
-                    except Exception:
+                        owner_name = owner_info_dict.get('email').split('@', 1)[0]
+                    except:
+                        pass
+                if not owner_name and meta.get('userEmail'):
+                    try:
+                        owner_name = meta.get('userEmail').split('@', 1)[0]
+                    except:
                         pass
-                    
-                    await asyncio.sleep(wait_interval)
-                    waited += wait_interval
                 
-                # Send welcome message via voice
-                try:
-                    ok = await safe_generate_reply(session, ctx, welcome_msg, timeout=30.0)
-                    if ok:
-                        logger.info(f"Welcome message sent via voice for {role}")
-                except Exception as e:
-                    logger.warning(f"Welcome message generation error: {e}")
-                    
-                # Also publish welcome message to data channel
+                # Get business name from business context (should be available now)
+                biz_name = biz_context.get('name') if isinstance(biz_context, dict) else None
+                if not biz_name:
+                    biz_name = 'your business'
+                
+                # Use proper greeting from prompts.py with business name
+                if owner_name and biz_name and biz_name != 'your business':
+                    welcome_msg = f"Hi {owner_name}! Welcome back to your Voxa business assistant for {biz_name}. I'm here to help you manage your business, handle customer inquiries, and keep everything running smoothly. What would you like to focus on today?"
+                elif owner_name:
+                    welcome_msg = f"Hi {owner_name}! Welcome back to your Voxa business assistant. I'm here to help you manage your business, handle customer inquiries, and keep everything running smoothly. What would you like to focus on today?"
+                elif biz_name and biz_name != 'your business':
+                    welcome_msg = f"Hi! Welcome back to your Voxa business assistant for {biz_name}. I'm here to help you manage your business, handle customer inquiries, and keep everything running smoothly. What would you like to focus on today?"
+                else:
+                    welcome_msg = "Hi! Welcome back to your Voxa business assistant. I'm here to help you manage your business, handle customer inquiries, and keep everything running smoothly. What would you like to focus on today?"
+            elif role == 'customer':
+                # Customer-facing greeting from prompts.py
                 try:
-                    import json as _json
-                    payload_data = { 'type': 'agent_response', 'text': welcome_msg }
-                    payload_json = _json.dumps(payload_data)
-                    payload_bytes = payload_json.encode('utf-8')
-                    
-                    if hasattr(ctx.room, 'local_participant') and getattr(ctx.room, 'local_participant'):
-                        local_participant = ctx.room.local_participant
-                        try:
-                            if hasattr(local_participant, 'publish_data'):
-                                await local_participant.publish_data(payload_bytes, reliable=True)
-                            elif hasattr(local_participant, 'sendText'):
-                                await local_participant.sendText(welcome_msg, topic='lk.chat')
-                        except Exception:
-                            pass
+                    biz_name = biz_context.get('name') if isinstance(biz_context, dict) else None
                 except Exception:
-                    pass
-            except Exception as e:
-                logger.exception(f'Failed to send role-specific welcome: {e}')
-        
-        # Wait a short time for role_context, then send welcome if not received
-        await asyncio.sleep(2)  # Give frontend time to send role_context
-        if not welcome_sent:
-            # Fallback: send welcome based on initial role detection
-            await send_role_specific_welcome(session, ctx, user_role, business_id, business_context, metadata, owner_info)
-
-        # 10. For customers, fetch business context at start
-        if user_role == 'customer' and business_id:
-            try:
-                # Business context already fetched above, but ensure it's available for tools
-                logger.debug(f"Customer connected for business {business_id}")
-            except Exception:
-                logger.exception('Failed to prepare customer context')
-
-        # 11. Collect customer info if needed (customers) and register general users
-        if user_role == 'customer' and business_id:
-            try:
-                cust = await collect_customer_info_if_needed(session, ctx, ctx.room.name, business_id)
+                    biz_name = None
+                if biz_name:
+                    welcome_msg = f"Hi there! I'm Voxa, your AI assistant for {biz_name}. I'm here to help with whatever you need. To get started and provide you with the best support, I'll just need a few quick details from you. Don't worry, your information stays completely secure and is only used for support purposes."
+                else:
+                    welcome_msg = "Hi there! I'm Voxa, your AI assistant. I'm here to help with whatever you need. To get started and provide you with the best support, I'll just need a few quick details from you. Don't worry, your information stays completely secure and is only used for support purposes."
+            else:
+                # General users (public) - greeting from prompts.py
+                gen_name = meta.get('userName') or meta.get('name') or None
+                gen_email = meta.get('userEmail') or meta.get('email') or None
                 
-                # After collecting customer info, automatically create a support ticket
-                try:
-                    from tools import create_ticket
-                    ticket_result = await create_ticket(
-                        ctx,
-                        title="Customer Support Request",
-                        description=f"Support request initiated by {cust.get('name', 'Customer')} via voice chat",
-                        priority="medium",
-                        customer_email=cust.get('email'),
-                        business_id=business_id,
-                        customer_name=cust.get('name'),
-                        customer_phone=cust.get('phone')
-                    )
-                    logger.debug(f"Ticket created: {ticket_result}")
-                    
-                    # Thank the customer and let them know a ticket was created
-                    try:
-                        await safe_generate_reply(session, ctx, f"Thank you {cust.get('name')}! I've collected your information and created a support ticket. How can I help you today?", timeout=30.0)
-                    except Exception as e:
-                        logger.warning(f"Could not generate thank you message: {e}")
-                        # Don't fail the whole flow if reply generation fails
-                except Exception as e:
-                    logger.exception(f"Failed to create ticket after collecting customer info: {e}")
-                    # Still thank the customer even if ticket creation fails
-                    try:
-                        await safe_generate_reply(session, ctx, f"Thank you {cust.get('name')}, I have your info. How can I help you today?", timeout=30.0)
-                    except Exception as reply_err:
-                        logger.warning(f"Could not generate thank you message: {reply_err}")
-            except Exception:
-                logger.exception('Failed to collect customer info')
-        elif user_role == 'general':
-            # Lightweight identity collection for general users: name, email, location
-            try:
-                hist = get_room_history(ctx.room.name)
-                needed = {'name': None, 'email': None, 'location': None}
-                # Try metadata first
-                md = getattr(ctx.room, 'metadata', {}) if hasattr(ctx.room, 'metadata') else {}
-                if isinstance(md, str):
+                # If name not in metadata, use the profile looked up during bootstrap
+                if not gen_name and isinstance(general_user, dict) and general_user.get('name'):
+                    gen_name = general_user.get('name')
+
+                # Use proper greeting from prompts.py
+                if gen_name:
+                    welcome_msg = f"Hi {gen_name}! I'm Voxa. I can help with info, support, and more. What would you like help with today?"
+                elif gen_email:
                     try:
-                        import json as _json
-                        md = _json.loads(md)
+                        local = gen_email.split('@', 1)[0]
+                        if local:
+                            welcome_msg = f"Hi {local}! I'm Voxa. I can help with info, support, and more. What would you like help with today?"
+                        else:
+                            welcome_msg = "Hey! I'm Voxa. I can help with info, support, and more. What's your name?"
                     except Exception:
-                        md = {}
-                if isinstance(md, dict):
-                    for k in needed:
-                        needed[k] = needed[k] or md.get(k)
-
-                async def ask(prompt_text: str, validate_fn):
+                        welcome_msg = "Hey! I'm Voxa. I can help with info, support, and more. What's your name?"
+                else:
+                    welcome_msg = "Hey! I'm Voxa. I can help with info, support, and more. What's your name?"
+            
+            logger.info(f"Generated welcome message for {role}: {welcome_msg[:100]}...")
+            
+            # Start voice rendering, then publish the text right away so chat UIs show
+            # the greeting without waiting for the realtime model's audio
+            # Supervised with the room; unlimited because the greeting task awaiting it may already hold a slot
+            voice_task = room_tasks.spawn(safe_generate_reply(session, ctx, welcome_msg, timeout=30.0), 'welcome_voice', limit=False)
+            try:
+                if hasattr(ctx.room, 'local_participant') and getattr(ctx.room, 'local_participant'):
+                    local_participant = ctx.room.local_participant
                     try:
-                        await safe_generate_reply(session, ctx, prompt_text, timeout=30.0)
+                        if hasattr(local_participant, 'publish_data'):
+                            await publish_message(ctx.room, {'type': MSG_AGENT_RESPONSE, 'text': welcome_msg})
+                        elif hasattr(local_participant, 'sendText'):
+                            await local_participant.sendText(welcome_msg, topic='lk.chat')
+                        logger.info(f"Welcome text published for {role} after {(time.monotonic() - welcome_gate.started) * 1000:.0f}ms")
                     except Exception:
                         pass
-                    # Wait for user response
-                    tries = 0
-                    while tries < 30:
-                        await asyncio.sleep(0.5)
-                        new_hist = get_room_history(ctx.room.name)
-                        if len(new_hist) > len(hist):
-                            reply = new_hist[-1]['content']
-                            if validate_fn(reply):
-                                return reply
-                        tries += 1
-                    return None
+            except Exception:
+                pass
 
-                if not needed['name']:
-                    needed['name'] = await ask("To get acquainted, what's your name?", lambda v: isinstance(v, str) and len(v.strip()) > 1)
-                if not needed['email']:
-                    needed['email'] = await ask("What's your email? I'll use it to keep context between chats.", lambda v: isinstance(v, str) and '@' in v and '.' in v)
-                if not needed['location']:
-                    needed['location'] = await ask("And where are you located? (city, country)", lambda v: isinstance(v, str) and len(v.strip()) > 1)
+            try:
+                ok = await voice_task if voice_task is not None else False
+                if ok:
+                    logger.info(f"Welcome message sent via voice for {role}")
+            except Exception as e:
+                logger.warning(f"Welcome message generation error: {e}")
+        except Exception as e:
+            logger.exception(f'Failed to send role-specific welcome: {e}')
+    
+    # Greet as soon as role_context or a participant arrives (role_context greets via fetch_and_greet)
+    welcome_reason = await welcome_gate.wait()
+    if welcome_reason != TRIGGER_ROLE_CONTEXT and not welcome_sent:
+        # Fallback: send welcome based on initial role detection
+        await send_role_specific_welcome(session, ctx, user_role, business_id, business_context, metadata, owner_info)
+
+    # 10. For customers, fetch business context at start
+    if user_role == 'customer' and business_id:
+        try:
+            # Business context already fetched above, but ensure it's available for tools
+            logger.debug(f"Customer connected for business {business_id}")
+        except Exception:
+            logger.exception('Failed to prepare customer context')
 
-                # Register general user in backend (idempotent)
+    # 11. Collect customer info if needed (customers) and register general users
+    if user_role == 'customer' and business_id:
+        try:
+            cust = await collect_customer_info_if_needed(session, ctx, ctx.room.name, business_id)
+            
+            # After collecting customer info, automatically create a support ticket
+            try:
+                from tools import create_ticket
+                ticket_result = await create_ticket(
+                    ctx,
+                    title="Customer Support Request",
+                    description=f"Support request initiated by {cust.get('name', 'Customer')} via voice chat",
+                    priority="medium",
+                    customer_email=cust.get('email'),
+                    business_id=business_id,
+                    customer_name=cust.get('name'),
+                    customer_phone=cust.get('phone')
+                )
+                logger.debug(f"Ticket created: {ticket_result}")
+                
+                # Thank the customer and let them know a ticket was created
                 try:
-                    import requests as _req
-                    backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
-                    _req.post(f"{backend_url}/api/auth/general/register", json={
-                        'name': needed['name'] or 'Guest',
-                        'email': needed['email'] or 'unknown@example.com',
-                        'location': needed['location'] or 'unknown',
-                    }, timeout=10)
-                except Exception:
-                    pass
-                # Cache identity for future persistence
+                    await safe_generate_reply(session, ctx, f"Thank you {cust.get('name')}! I've collected your information and created a support ticket. How can I help you today?", timeout=30.0)
+                except Exception as e:
+                    logger.warning(f"Could not generate thank you message: {e}")
+                    # Don't fail the whole flow if reply generation fails
+            except Exception as e:
+                logger.exception(f"Failed to create ticket after collecting customer info: {e}")
+                # Still thank the customer even if ticket creation fails
                 try:
-                    rname = getattr(ctx.room, 'name', None)
-                    if rname:
-                        room_user_identity[rname] = {
-                            'role': 'general',
-                            'email': needed['email'] or None
-                        }
+                    await safe_generate_reply(session, ctx, f"Thank you {cust.get('name')}, I have your info. How can I help you today?", timeout=30.0)
+                except Exception as reply_err:
+                    logger.warning(f"Could not generate thank you message: {reply_err}")
+        except Exception:
+            logger.exception('Failed to collect customer info')
+    elif user_role == 'general':
+        # Lightweight identity collection for general users: name, email, location
+        try:
+            hist = get_room_history(ctx.room.name)
+            needed = {'name': None, 'email': None, 'location': None}
+            # Try metadata first
+            md = getattr(ctx.room, 'metadata', {}) if hasattr(ctx.room, 'metadata') else {}
+            if isinstance(md, str):
+                try:
+                    import json as _json
+                    md = _json.loads(md)
                 except Exception:
-                    pass
-            except Exception:
-                logger.debug('general user onboarding failed')
+                    md = {}
+            if isinstance(md, dict):
+                for k in needed:
+                    needed[k] = needed[k] or md.get(k)
 
-       
-        # This allows the agent to stay alive for multiple connection cycles
-        # Keep the entrypoint running and wait for events
-        try:
-            logger.info(f"Agent entrypoint active for room: {room_name}, waiting for events...")
-            # Keep the entrypoint running until room closes
-            # Use a longer sleep and check for room state periodically
-            # IMPORTANT: The agent must stay alive to handle incoming messages
-            while True:
-                await asyncio.sleep(1.0)  # Check every second
-                # Check if room is still active
+            async def ask(prompt_text: str, validate_fn):
                 try:
-                    if hasattr(ctx.room, 'state'):
-                        room_state = getattr(ctx.room, 'state', None)
-                        if room_state in ('disconnected', 'closed'):
-                            logger.info(f"Room {room_name} disconnected, exiting entrypoint")
-                            break
-                    # Also check if we have any participants
-                    if hasattr(ctx.room, 'remote_participants'):
-                        remote_parts = getattr(ctx.room, 'remote_participants', {})
-                        if isinstance(remote_parts, dict) and len(remote_parts) == 0:
-                            # No participants, but keep waiting (they might reconnect)
-                            pass
+                    await safe_generate_reply(session, ctx, prompt_text, timeout=30.0)
                 except Exception:
                     pass
-        except asyncio.CancelledError:
-            logger.debug(f"Entrypoint cancelled for room: {room_name}")
-        
-        except Exception as e:
+                # Wait for user response
+                tries = 0
+                while tries < 30:
+                    await asyncio.sleep(0.5)
+                    new_hist = get_room_history(ctx.room.name)
+                    if len(new_hist) > len(hist):
+                        reply = new_hist[-1]['content']
+                        if validate_fn(reply):
+                            return reply
+                    tries += 1
+                return None
+
+            if not needed['name']:
+                needed['name'] = await ask("To get acquainted, what's your name?", lambda v: isinstance(v, str) and len(v.strip()) > 1)
+            if not needed['email']:
+                needed['email'] = await ask("What's your email? I'll use it to keep context between chats.", lambda v: isinstance(v, str) and '@' in v and '.' in v)
+            if not needed['location']:
+                needed['location'] = await ask("And where are you located? (city, country)", lambda v: isinstance(v, str) and len(v.strip()) > 1)
+
+            # Register general user in backend (idempotent)
             try:
-                room_name = getattr(ctx.room, 'name', 'unknown')
+                import requests as _req
+                backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
+                _req.post(f"{backend_url}/api/auth/general/register", json={
+                    'name': needed['name'] or 'Guest',
+                    'email': needed['email'] or 'unknown@example.com',
+                    'location': needed['location'] or 'unknown',
+                }, timeout=10)
             except Exception:
-                room_name = 'unknown'
-            logger.exception(f"Unhandled exception in entrypoint for room {room_name}: {e}")
-        finally:
-            # Cleanup happens automatically when the function exits
+                pass
+            # Cache identity for future persistence
+            try:
+                rname = getattr(ctx.room, 'name', None)
+                if rname:
+                    room_user_identity[rname] = {
+                        'role': 'general',
+                        'email': needed['email'] or None
+                    }
+            except Exception:
+                pass
+        except Exception:
+            logger.debug('general user onboarding failed')
+
+
+    # This allows the agent to stay alive for multiple connection cycles
+    # Keep the entrypoint running and wait for events
+    try:
+        logger.info(f"Agent entrypoint active for room: {room_name}, waiting for events...")
+        # Keep the entrypoint running until the room disconnects or the job shuts down;
+        # the agent must stay alive to handle incoming messages
+        is_connected = getattr(ctx.room, 'isconnected', None)
+        if callable(is_connected) and not is_connected():
+            room_closed.set()
+        await room_closed.wait()
+        logger.info(f"Room {room_name} closed, exiting entrypoint")
+    except asyncio.CancelledError:
+        logger.debug(f"Entrypoint cancelled for room: {room_name}")
+    
+    except Exception as e:
+        try:
+            room_name = getattr(ctx.room, 'name', 'unknown')
+        except Exception:
+            room_name = 'unknown'
+        logger.exception(f"Unhandled exception in entrypoint for room {room_name}: {e}")
+    finally:
+        # Release deterministically even if the entrypoint was cancelled
+        try:
+            await asyncio.shield(release_room_resources())
+        except BaseException:
             pass
 
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    configure_load_reporting()
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, load_fnc=worker_load))
\ No newline at end of file
@@ -0,0 +1,158 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import contextlib
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+# 0 disables the token budget
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '0'))
+
+# Lower value = served first
+PRIORITY_OWNER = 0
+PRIORITY_CUSTOMER = 1
+PRIORITY_GENERAL = 2
+
+
+def priority_for_role(role: Optional[str]) -> int:
+    if role == 'owner':
+        return PRIORITY_OWNER
+    if role == 'general':
+        return PRIORITY_GENERAL
+    return PRIORITY_CUSTOMER
+
+
+def estimate_tokens(messages: List[dict], completion_tokens: int = 512) -> int:
+    """Rough token estimate (~4 chars per token) used to reserve budget before a call."""
+    chars = sum(len(str(m.get('content', ''))) for m in messages)
+    return chars // 4 + completion_tokens
+
+
+class LLMRateLimited(Exception):
+    """Raised when the provider keeps rate limiting after Retry-After-aware retries."""
+
+
+class Admission:
+    """A granted slot; set ``tokens`` to the actual usage before release when known."""
+
+    def __init__(self, priority: int, reserved_tokens: int, queued_for: float, budget_entry: List[float]) -> None:
+        self.priority = priority
+        self.reserved_tokens = reserved_tokens
+        self.tokens: Optional[int] = None
+        self.queued_for = queued_for
+        self._budget_entry = budget_entry
+
+
+class LLMAdmissionController:
+    """Process-wide admission control for outbound LLM calls.
+
+    Callers wait in a priority queue (owners before customers before general users)
+    until a concurrency slot is free, the rolling token-per-minute budget has room,
+    and no provider Retry-After window is active.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._token_log: Deque[List[float]] = deque()  # [timestamp, tokens]
+        self._blocked_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self.queue_times: Deque[float] = deque(maxlen=500)
+        self.admitted = 0
+        self.rate_limited = 0
+
+    def _tokens_used(self, now: float) -> float:
+        while self._token_log and now - self._token_log[0][0] > 60.0:
+            self._token_log.popleft()
+        return sum(entry[1] for entry in self._token_log)
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup = asyncio.get_event_loop().call_later(max(0.01, delay), self._pump)
+
+    def _pump(self) -> None:
+        self._wakeup = None
+        now = time.monotonic()
+        while self._waiters and self.in_flight < self.max_concurrency:
+            priority, _, tokens, fut = self._waiters[0]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if now < self._blocked_until:
+                self._schedule_wakeup(self._blocked_until - now)
+                return
+            if self.tokens_per_minute:
+                used = self._tokens_used(now)
+                # A request larger than the whole budget is still admitted once the window is empty
+                if used and used + tokens > self.tokens_per_minute:
+                    self._schedule_wakeup(60.0 - (now - self._token_log[0][0]))
+                    return
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            self._token_log.append([now, tokens])
+            fut.set_result(self._token_log[-1])
+
+    async def acquire(self, priority: int, tokens: int) -> Admission:
+        started = time.monotonic()
+        fut = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), tokens, fut))
+        self._pump()
+        try:
+            entry = await fut
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                # Admitted just as we were cancelled - give the slot back
+                self.in_flight -= 1
+                self._pump()
+            raise
+        queued_for = time.monotonic() - started
+        self.queue_times.append(queued_for)
+        self.admitted += 1
+        return Admission(priority, tokens, queued_for, entry)
+
+    def release(self, admission: Admission) -> None:
+        self.in_flight -= 1
+        if admission.tokens is not None:
+            # Replace the reservation with what the call actually used
+            admission._budget_entry[1] = admission.tokens
+        self._pump()
+
+    @contextlib.asynccontextmanager
+    async def admit(self, priority: int, tokens: int):
+        admission = await self.acquire(priority, tokens)
+        try:
+            yield admission
+        finally:
+            self.release(admission)
+
+    def note_rate_limited(self, retry_after: float) -> None:
+        """Pause all admissions for the provider's Retry-After window."""
+        self.rate_limited += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        logger.warning(f"LLM provider rate limited; pausing admissions for {retry_after:.1f}s")
+
+    def snapshot(self) -> Dict[str, object]:
+        ordered = sorted(self.queue_times)
+        pct = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000) if ordered else None
+        return {
+            'in_flight': self.in_flight,
+            'queued': sum(1 for w in self._waiters if not w[3].done()),
+            'admitted': self.admitted,
+            'rate_limited': self.rate_limited,
+            'tokens_last_minute': int(self._tokens_used(time.monotonic())),
+            'queue_p50_ms': pct(0.5),
+            'queue_p95_ms': pct(0.95),
+        }
+
+
+llm_admission = LLMAdmissionController()
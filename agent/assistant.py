@@ -1,8 +1,20 @@
-import os
-from mistralai import Mistral
+import time
+from typing import Optional
 from livekit.agents import Agent, function_tool, RunContext
+from livekit.agents.llm import ChatContext, ChatMessage
 from livekit.plugins import google
 from agent.history import get_room_history, update_history
+from agent.llm import hedged_stream_chat, CompletionTimeout
+from agent.deadline import Deadline, get_turn_deadline, start_turn_deadline
+from agent.response_stream import ResponseStreamPublisher
+from agent.model_router import FALLBACK_TIER, is_low_confidence, model_router
+from agent.admission import PRIORITY_CUSTOMER, LLMRateLimited, llm_admission
+from agent.reasoning_cache import (
+    DEEP_REASONING_CACHE_ENABLED,
+    is_personalized,
+    make_cache_key,
+    reasoning_cache,
+)
 from agent import get_logger
 from tools import (
     get_weather,
@@ -20,11 +32,32 @@ from tools import (
 )
 
 logger = get_logger(__name__)
-mistral_client = Mistral(api_key=os.getenv("MISTRAL_API_KEY"))
+
+# Upper bound for one deep_reasoning completion; the voice turn cannot wait longer
+DEEP_REASONING_TIMEOUT = 20.0
+# Share of that budget a small-tier attempt may use before falling back
+SMALL_TIER_TIMEOUT_SHARE = 0.35
+# Below this much remaining turn time a completion is not attempted at all
+MIN_REASONING_BUDGET = 1.5
+REASONING_FALLBACK_REPLY = "That analysis is taking too long right now. Let me give you a shorter answer instead."
 
 
 class Assistant(Agent):
-    def __init__(self, instructions: str) -> None:
+    def __init__(
+        self,
+        instructions: str,
+        response_publisher: Optional[ResponseStreamPublisher] = None,
+        business_id: str = '',
+        llm_priority: int = PRIORITY_CUSTOMER,
+        mode: str = 'CUSTOMER',
+    ) -> None:
+        # Admission priority of this session's LLM calls (owners are served first)
+        self._llm_priority = llm_priority
+        # Streams deep_reasoning text to the data channel as it arrives
+        self._response_publisher = response_publisher
+        # Scopes cached deep_reasoning answers to this business and instruction mode
+        self._business_id = business_id or ''
+        self._mode = mode
         # Initialize with base tools first
         super().__init__(
             instructions=instructions,
@@ -50,14 +83,29 @@ class Assistant(Agent):
         # Note: The @function_tool decorator on deep_reasoning should make it automatically available
         # If it doesn't work, we may need to register it explicitly via the Agent's tool system
 
+    def set_cache_scope(self, business_id: str, mode: str) -> None:
+        """Re-scope cached deep_reasoning answers after role_context changes the role or business."""
+        self._business_id = business_id or ''
+        self._mode = mode
+
+    async def on_user_turn_completed(self, turn_ctx: ChatContext, new_message: ChatMessage) -> None:
+        # Each voice turn gets a fresh deadline that tool and LLM calls inherit
+        try:
+            start_turn_deadline(self.session)
+        except Exception:
+            logger.debug('Could not start turn deadline')
+
     @function_tool(
         description="Use advanced reasoning for complex analysis, data interpretation, or multi-step problem solving. Use this for queries that require deep analysis, logic, or detailed explanations. ALWAYS use this tool when: 1) The user asks about complex topics, broad contexts, or requires detailed analysis, 2) You need to reason through multiple steps or interpret data, 3) The question requires deeper understanding beyond simple facts, 4) You need to synthesize information from multiple sources (like search results) into a coherent answer. This tool uses Mistral AI for superior reasoning capabilities."
     )
-    def deep_reasoning(self, run_ctx: RunContext, query: str) -> str:
+    async def deep_reasoning(self, run_ctx: RunContext, query: str) -> str:
         """
         Use Mistral AI for deep reasoning and complex analysis.
         This is especially useful when you have search results or need to analyze complex topics.
         """
+        # Every exit closes an opened agent_response stream (finish() is a no-op once closed)
+        stream = None
+        reply = None
         try:
             logger.info(f"Using Mistral for deep reasoning: {query[:100]}...")
 
@@ -83,20 +131,70 @@ class Assistant(Agent):
             messages = [{"role": "system", "content": system_prompt}]
             
             # Include recent conversation history for context
-            if room_name:
-                hist = get_room_history(room_name)
-                # Include more context (last 10 messages) for better reasoning
-                messages.extend(hist[-10:])
+            hist = get_room_history(room_name) if room_name else []
+            # Include more context (last 10 messages) for better reasoning
+            messages.extend(hist[-10:])
 
             messages.append({"role": "user", "content": query})
 
-            completion = mistral_client.chat.complete(
-                model="mistral-medium",
-                messages=messages,
-            )
+            # Repeated policy/product questions for the same business are served from cache
+            cache_key = None
+            if DEEP_REASONING_CACHE_ENABLED and not is_personalized(query):
+                cache_key = make_cache_key(self._business_id, query, hist, self._mode)
+                cached = reasoning_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Mistral reasoning served from cache: {len(cached)} chars")
+                    stream = self._response_publisher.open() if self._response_publisher else None
+                    if stream is not None:
+                        await stream.finish(cached)
+                    if room_name:
+                        update_history(room_name, "user", query)
+                        update_history(room_name, "assistant", cached)
+                    return cached
 
-            response = completion.choices[0].message.content
+            # The completion may only use what is left of the current turn's deadline
+            deadline = get_turn_deadline(run_ctx) or Deadline(DEEP_REASONING_TIMEOUT)
+            budget = deadline.timeout(cap=DEEP_REASONING_TIMEOUT)
+            if budget < MIN_REASONING_BUDGET:
+                logger.warning(f"Skipping Mistral reasoning: only {budget:.1f}s left in this turn")
+                return REASONING_FALLBACK_REPLY
+
+            stream = self._response_publisher.open() if self._response_publisher else None
+            tier, reason = model_router.choose(query, hist)
+            try:
+                if tier != FALLBACK_TIER:
+                    # Small-tier answers are not streamed so a fallback never leaves a half-sent reply
+                    try:
+                        response = await self._complete(messages, tier, budget * SMALL_TIER_TIMEOUT_SHARE)
+                    except Exception as e:
+                        logger.debug(f"Small-tier reasoning failed, falling back: {e}")
+                        response = ''
+                    if is_low_confidence(response):
+                        logger.info(f"Low-confidence {tier} answer ({reason}), retrying on {FALLBACK_TIER}")
+                        model_router.record_fallback(tier)
+                        tier = FALLBACK_TIER
+                        if deadline.remaining() < MIN_REASONING_BUDGET:
+                            reply = response or REASONING_FALLBACK_REPLY
+                            return reply
+                        response = await self._complete(messages, tier, deadline.timeout(cap=DEEP_REASONING_TIMEOUT), stream)
+                else:
+                    response = await self._complete(messages, tier, budget, stream)
+            except CompletionTimeout as te:
+                logger.warning(f"Mistral reasoning hit the turn deadline ({len(te.partial)} chars received)")
+                if stream is not None:
+                    await stream.finish(te.partial)
+                if not te.partial:
+                    return REASONING_FALLBACK_REPLY
+                response = te.partial
+                cache_key = None  # never cache a truncated answer
+
+            if stream is not None:
+                await stream.finish(response)
+
+            logger.debug(f"Reasoning tier={tier} ({reason}); tier stats: {model_router.snapshot()}; admission: {llm_admission.snapshot()}")
             logger.info(f"Mistral reasoning complete: {len(response)} chars")
+            if cache_key and response:
+                reasoning_cache.put(cache_key, response)
 
             if room_name:
                 update_history(room_name, "user", query)
@@ -104,8 +202,39 @@ class Assistant(Agent):
 
             return response
 
+        except LLMRateLimited:
+            logger.warning(f"Mistral reasoning rate limited; admission: {llm_admission.snapshot()}")
+            reply = "I'm handling a lot of requests right now and couldn't complete that analysis. Please ask again in a moment."
+            return reply
         except Exception as e:
             logger.error(f"Mistral reasoning failed: {e}", exc_info=True)
-            return f"I encountered an error while processing that request: {str(e)}"
+            reply = f"I encountered an error while processing that request: {str(e)}"
+            return reply
+        finally:
+            if stream is not None:
+                try:
+                    await stream.finish(reply or REASONING_FALLBACK_REPLY)
+                except Exception as e:
+                    logger.debug(f"Could not close agent_response stream: {e}")
+
+    async def _complete(self, messages: list, tier: str, timeout: float, stream=None) -> str:
+        """Run one (optionally hedged) completion on the given tier and record its latency and token usage."""
+        usage: dict = {}
+        started = time.monotonic()
+        try:
+            text = await hedged_stream_chat(
+                messages,
+                model=model_router.model_for(tier),
+                timeout=timeout,
+                on_delta=stream.push if stream is not None else None,
+                usage=usage,
+                priority=self._llm_priority,
+                hedge_after=model_router.hedge_delay(tier),
+            )
+        except BaseException:
+            model_router.record(tier, time.monotonic() - started, ok=False)
+            raise
+        model_router.record(tier, time.monotonic() - started, usage)
+        return text
 
 
@@ -0,0 +1,119 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKEND_HEALTH_INTERVAL = float(os.getenv('BACKEND_HEALTH_INTERVAL', '30'))
+BACKEND_HEALTH_TIMEOUT = float(os.getenv('BACKEND_HEALTH_TIMEOUT', '3'))
+# Consecutive failed probes before the backend is reported 'down' rather than 'degraded'
+BACKEND_HEALTH_DOWN_AFTER = int(os.getenv('BACKEND_HEALTH_DOWN_AFTER', '2'))
+
+STATUS_UNKNOWN = 'unknown'
+STATUS_UP = 'up'
+STATUS_DEGRADED = 'degraded'
+STATUS_DOWN = 'down'
+
+
+def _probe(backend_url: str, timeout: float) -> str:
+    """Blocking probe of the backend; returns a short description on success and raises otherwise."""
+    import requests
+    health = requests.get(f"{backend_url}/api/business/resolve", timeout=timeout)
+    if not health.ok:
+        raise RuntimeError(f"status {health.status_code}")
+    try:
+        data = health.json()
+        return f"resolved business {data.get('businessId') or data.get('name', '(none)')}"
+    except Exception:
+        return "/api/business/resolve returned non-json response"
+
+
+class BackendHealth:
+    """Cached backend reachability, refreshed by a background task.
+
+    Reading the status never blocks; callers such as tools can use ``is_available()``
+    to fail fast while the backend is known to be down.
+    """
+
+    def __init__(self, interval: float = BACKEND_HEALTH_INTERVAL, timeout: float = BACKEND_HEALTH_TIMEOUT) -> None:
+        self.interval = interval
+        self.timeout = timeout
+        self.status = STATUS_UNKNOWN
+        self.last_checked: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def backend_url(self) -> str:
+        return os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
+
+    def is_available(self) -> bool:
+        """False only when recent probes have consistently failed; unknown counts as available."""
+        return self.status != STATUS_DOWN
+
+    async def check(self) -> str:
+        """Probe the backend once (off the event loop) and update the cached status."""
+        started = time.monotonic()
+        loop = asyncio.get_event_loop()
+        try:
+            detail = await loop.run_in_executor(None, _probe, self.backend_url, self.timeout)
+        except Exception as e:
+            self.consecutive_failures += 1
+            self.last_error = str(e)
+            previous = self.status
+            self.status = STATUS_DOWN if self.consecutive_failures >= BACKEND_HEALTH_DOWN_AFTER else STATUS_DEGRADED
+            if self.status != previous:
+                logger.warning(f"Backend health {previous} -> {self.status}: {e}")
+        else:
+            if self.status != STATUS_UP:
+                logger.info(f"Backend reachable: {detail}")
+            self.consecutive_failures = 0
+            self.last_error = None
+            self.status = STATUS_UP
+        self.latency = time.monotonic() - started
+        self.last_checked = time.time()
+        return self.status
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"Backend health check failed unexpectedly: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start periodic probing on the running loop (no-op if already running there)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop probing; the status resets so a later start() does not fail fast on stale results."""
+        self.status = STATUS_UNKNOWN
+        self.consecutive_failures = 0
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            'status': self.status,
+            'last_checked': self.last_checked,
+            'latency_ms': round(self.latency * 1000) if self.latency is not None else None,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+        }
+
+
+backend_health = BackendHealth()
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import urllib.parse
+from typing import Any, Dict, Optional
+
+from agent.business_cache import business_context_cache
+from agent.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for all session-start lookups together; whatever has not arrived by then is skipped
+BOOTSTRAP_TIMEOUT = float(os.getenv('BOOTSTRAP_TIMEOUT_SECONDS', '6'))
+
+
+class _ToolContext:
+    """Stands in for RunContext when tools run outside a turn.
+
+    Carries the room (for metadata lookups) and a deadline in ``userdata``, so the
+    tools' call_timeout bounds every request by what is left of the bootstrap.
+    """
+
+    def __init__(self, room, deadline: Deadline) -> None:
+        self.room = room
+        self.userdata = {'turn_deadline': deadline}
+
+
+async def _run_tool(tool, room, deadline: Deadline, *args) -> Any:
+    """Run a backend tool on its own thread.
+
+    The business tools call requests synchronously inside their coroutine, so awaiting
+    several of them on the session loop would still run them one after another.
+    Cancelling the awaiting task does not stop the thread; the shared ``deadline``
+    caps the tool's request timeouts so the thread finishes by then anyway.
+    """
+    return await asyncio.to_thread(asyncio.run, tool(_ToolContext(room, deadline), *args))
+
+
+def _parse(result: Any) -> dict:
+    if isinstance(result, dict):
+        return result
+    if isinstance(result, str) and result:
+        try:
+            parsed = json.loads(result)
+        except Exception:
+            return {}
+        # Timed-out or backend-unavailable tool results carry no data
+        if isinstance(parsed, dict) and parsed.get('status') not in ('timeout', 'unavailable'):
+            return parsed
+    return {}
+
+
+async def fetch_owner_profile(room, identifier: str, timeout: float = BOOTSTRAP_TIMEOUT) -> dict:
+    """Owner profile for a businessId/slug/email without blocking the session loop."""
+    from tools import get_owner_profile
+    return _parse(await _run_tool(get_owner_profile, room, Deadline(timeout), identifier))
+
+
+def _fetch_general_user(email: str, timeout: float = 5) -> dict:
+    import requests
+    backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
+    headers = {}
+    api_key = os.getenv('BACKEND_API_KEY', '')
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    encoded_email = urllib.parse.quote(email, safe='')
+    resp = requests.get(f"{backend_url}/api/auth/general/user/{encoded_email}", headers=headers, timeout=timeout)
+    return resp.json() if resp.status_code == 200 else {}
+
+
+async def bootstrap_session(
+    room,
+    metadata: Dict[str, Any],
+    user_role: str,
+    business_id: str,
+    slug_candidate: Optional[str] = None,
+    timeout: float = BOOTSTRAP_TIMEOUT,
+) -> Dict[str, Any]:
+    """Resolve business context, owner profile and general-user identity concurrently.
+
+    Every independent lookup starts at once; lookups that depend on an earlier answer
+    (slug fallback, owner email -> businessId -> context) run as soon as it arrives.
+    All of it shares one ``timeout``, so session start takes about as long as the
+    slowest lookup rather than the sum. Returns business_context, business_id,
+    owner_info and general_user (empty values for anything that did not arrive).
+    """
+    from tools import get_business_context, get_owner_profile
+
+    started = time.monotonic()
+    # Every lookup's requests are bounded by this, so none outlives the bootstrap
+    deadline = Deadline(timeout)
+    out: Dict[str, Any] = {
+        'business_context': {},
+        'business_id': business_id,
+        'owner_info': {},
+        'general_user': {},
+    }
+    identifier = business_id or slug_candidate
+    owner_email = metadata.get('userEmail') or metadata.get('ownerEmail') or metadata.get('email')
+    general_email = metadata.get('userEmail') or metadata.get('email')
+
+    async def cached_context(ident: str) -> dict:
+        context = business_context_cache.get(ident)
+        if context is not None:
+            return context
+        context = _parse(await _run_tool(get_business_context, room, deadline, ident))
+        if context.get('name'):
+            resolved = str(context.get('businessId') or context.get('_id') or ident)
+            business_context_cache.put(resolved, context)
+            if resolved != ident:
+                # Looked up by slug: make the slug resolve to this entry next time
+                business_context_cache.alias(ident, resolved)
+        return context
+
+    async def business():
+        context = await cached_context(identifier) if identifier else {}
+        # The ID lookup can miss while the slug still resolves
+        if not context.get('name') and slug_candidate and identifier != slug_candidate:
+            context = await cached_context(slug_candidate) or context
+        if context:
+            out['business_context'] = context
+            resolved_id = context.get('businessId') or context.get('_id')
+            if resolved_id and not out['business_id']:
+                out['business_id'] = str(resolved_id)
+                logger.info(f"Resolved {identifier or slug_candidate} to businessId {out['business_id']}")
+
+    async def owner(ident: str, resolves_business: bool):
+        parsed = _parse(await _run_tool(get_owner_profile, room, deadline, ident))
+        if parsed.get('name') and not out['owner_info']:
+            out['owner_info'] = parsed
+        found_bid = parsed.get('businessId') or parsed.get('business') or parsed.get('business_id')
+        if resolves_business and found_bid and not out['business_id']:
+            # Owner rooms without a businessId resolve it through the owner's profile
+            out['business_id'] = str(found_bid)
+            out['business_context'] = await cached_context(out['business_id'])
+
+    async def general_user():
+        loop = asyncio.get_event_loop()
+        data = await loop.run_in_executor(None, _fetch_general_user, general_email, max(0.1, deadline.remaining()))
+        if isinstance(data, dict):
+            out['general_user'] = data
+
+    lookups = {}
+    if identifier or slug_candidate:
+        lookups['business'] = business()
+    if user_role == 'owner':
+        if isinstance(owner_email, str) and '@' in owner_email:
+            lookups['owner_by_email'] = owner(owner_email, not identifier)
+        if business_id:
+            lookups['owner_by_business'] = owner(business_id, False)
+    if user_role == 'general' and general_email and not (metadata.get('userName') or metadata.get('name')):
+        lookups['general_user'] = general_user()
+
+    if lookups:
+        tasks = {asyncio.ensure_future(coro): name for name, coro in lookups.items()}
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            logger.warning(f"Session bootstrap lookup '{tasks[task]}' missed the {timeout:.1f}s deadline")
+            task.cancel()
+        for task in done:
+            if task.exception() is not None:
+                logger.debug(f"Session bootstrap lookup '{tasks[task]}' failed: {task.exception()}")
+
+    # Owner info embedded in the business context wins over a separate profile lookup
+    context_owner = out['business_context'].get('owner') if isinstance(out['business_context'], dict) else None
+    if user_role == 'owner' and isinstance(context_owner, dict) and context_owner:
+        if context_owner.get('name') or not out['owner_info']:
+            out['owner_info'] = context_owner.copy()
+
+    logger.info(
+        f"Session bootstrap finished in {(time.monotonic() - started) * 1000:.0f}ms "
+        f"({', '.join(lookups) or 'no lookups'})"
+    )
+    return out
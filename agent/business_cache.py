@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from agent.instructions import config_hash, instruction_cache
+
+logger = logging.getLogger(__name__)
+
+BUSINESS_CONTEXT_TTL = float(os.getenv('BUSINESS_CONTEXT_TTL', '300'))
+BUSINESS_CONTEXT_CACHE_SIZE = int(os.getenv('BUSINESS_CONTEXT_CACHE_SIZE', '500'))
+
+# Warm-up: explicit business IDs and/or the N most active businesses from the backend (0 = off)
+WARM_BUSINESS_IDS = [b.strip() for b in os.getenv('WARM_BUSINESS_IDS', '').split(',') if b.strip()]
+WARM_TOP_BUSINESSES = int(os.getenv('WARM_TOP_BUSINESSES', '0'))
+WARM_INTERVAL = float(os.getenv('WARM_INTERVAL_SECONDS', '240'))
+WARM_CONCURRENCY = int(os.getenv('WARM_CONCURRENCY', '8'))
+# Prewarm runs inside LiveKit's process initialize timeout: the whole warm-up gets one
+# short deadline and every request a short timeout; whatever is late is fetched on demand
+WARM_DEADLINE = float(os.getenv('WARM_DEADLINE_SECONDS', '4'))
+WARM_REQUEST_TIMEOUT = float(os.getenv('WARM_REQUEST_TIMEOUT', '2'))
+
+# Modes compiled ahead of time for warmed businesses
+_WARM_MODES = ('CUSTOMER', 'OWNER', 'GENERAL')
+
+
+class BusinessContextCache:
+    """TTL + LRU cache of business contexts, addressable by businessId or slug.
+
+    Refreshing a business with a changed context, or invalidating it, also drops
+    its compiled instructions and cached deep_reasoning answers.
+    """
+
+    def __init__(self, ttl: float = BUSINESS_CONTEXT_TTL, max_entries: int = BUSINESS_CONTEXT_CACHE_SIZE) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # businessId -> (expires_at, context)
+        self._entries: 'OrderedDict[str, Tuple[float, dict]]' = OrderedDict()
+        # slug -> businessId
+        self._aliases: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _resolve(self, identifier: str) -> str:
+        return self._aliases.get(str(identifier).strip().lower(), identifier)
+
+    def get(self, identifier: str) -> Optional[dict]:
+        if not identifier:
+            return None
+        business_id = self._resolve(identifier)
+        entry = self._entries.get(business_id)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(business_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, business_id: str, context: dict) -> None:
+        if not business_id or not isinstance(context, dict) or not context:
+            return
+        previous = self._entries.get(business_id)
+        if previous is not None and config_hash(previous[1]) != config_hash(context):
+            self._invalidate_derived(business_id)
+        self._entries[business_id] = (time.monotonic() + self.ttl, context)
+        self._entries.move_to_end(business_id)
+        slug = context.get('slug')
+        if isinstance(slug, str) and slug:
+            self._aliases[slug.strip().lower()] = business_id
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._aliases = {s: b for s, b in self._aliases.items() if b != evicted}
+
+    def alias(self, identifier: str, business_id: str) -> None:
+        """Make ``identifier`` (e.g. a slug the context does not carry) resolve to ``business_id``."""
+        if identifier and business_id in self._entries:
+            self._aliases[str(identifier).strip().lower()] = business_id
+
+    def invalidate(self, business_id: str) -> None:
+        self._entries.pop(business_id, None)
+        self._aliases = {s: b for s, b in self._aliases.items() if b != business_id}
+        self._invalidate_derived(business_id)
+
+    def _invalidate_derived(self, business_id: str) -> None:
+        instruction_cache.invalidate_business(business_id)
+        try:
+            from agent.reasoning_cache import reasoning_cache
+            reasoning_cache.invalidate_business(business_id)
+        except Exception:
+            logger.debug('Could not invalidate reasoning cache')
+
+    def snapshot(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+business_context_cache = BusinessContextCache()
+
+
+def _backend():
+    backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
+    headers = {}
+    api_key = os.getenv('BACKEND_API_KEY', '')
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return backend_url, headers
+
+
+def _fetch_context(business_id: str, timeout: float = WARM_REQUEST_TIMEOUT) -> dict:
+    import requests
+    backend_url, headers = _backend()
+    resp = requests.get(f"{backend_url}/api/business/context/{business_id}", headers=headers, timeout=timeout)
+    return resp.json() if resp.status_code == 200 else {}
+
+
+def _top_business_ids(limit: int, timeout: float = WARM_REQUEST_TIMEOUT) -> List[str]:
+    import requests
+    backend_url, headers = _backend()
+    resp = requests.get(f"{backend_url}/api/business/top", params={'limit': limit}, headers=headers, timeout=timeout)
+    if resp.status_code != 200:
+        return []
+    return [str(b.get('businessId')) for b in resp.json() if isinstance(b, dict) and b.get('businessId')]
+
+
+def warm_targets(timeout: float = WARM_REQUEST_TIMEOUT) -> List[str]:
+    """Business IDs to warm: WARM_BUSINESS_IDS first, then the backend's most active businesses."""
+    ids = list(WARM_BUSINESS_IDS)
+    if WARM_TOP_BUSINESSES > 0:
+        try:
+            ids.extend(b for b in _top_business_ids(WARM_TOP_BUSINESSES, timeout) if b not in ids)
+        except Exception as e:
+            logger.warning(f"Could not list top businesses for warm-up: {e}")
+    return ids
+
+
+def _fetch_one(business_id: str, timeout: float) -> Optional[dict]:
+    """Runs on worker threads: network only, the cache is never touched here."""
+    try:
+        return _fetch_context(business_id, timeout) or None
+    except Exception as e:
+        logger.debug(f"Warm-up fetch failed for {business_id}: {e}")
+        return None
+
+
+def _store(contexts: Dict[str, dict]) -> int:
+    """Put fetched contexts in the cache and compile their instructions (caller's thread only)."""
+    for business_id, context in contexts.items():
+        business_context_cache.put(business_id, context)
+        for mode in _WARM_MODES:
+            instruction_cache.get(business_id, mode, context)
+    return len(contexts)
+
+
+def _snapshot_path() -> Optional[str]:
+    from agent.load import worker_dir
+    directory = worker_dir()
+    return os.path.join(directory, 'business-contexts.json') if directory else None
+
+
+def _read_snapshot(max_age: float) -> Optional[Dict[str, dict]]:
+    """Contexts another job process of this worker fetched less than ``max_age`` seconds ago."""
+    path = _snapshot_path()
+    try:
+        if not path or time.time() - os.path.getmtime(path) > max_age:
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except Exception:
+        return None
+
+
+def _write_snapshot(contexts: Dict[str, dict]) -> None:
+    path = _snapshot_path()
+    if not path or not contexts:
+        return
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # Contexts include owner names and emails: readable by this user only
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(contexts, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.debug(f"Could not share warmed business contexts: {e}")
+
+
+def _fetch_all(deadline: float) -> Dict[str, dict]:
+    """Fetch the warm-up targets concurrently, giving up on whatever is unfinished at ``deadline``."""
+    from concurrent.futures import ThreadPoolExecutor, wait
+    targets = warm_targets(min(WARM_REQUEST_TIMEOUT, max(0.1, deadline - time.monotonic())))
+    if not targets:
+        return {}
+    pool = ThreadPoolExecutor(max_workers=max(1, WARM_CONCURRENCY), thread_name_prefix='context-warmup')
+    try:
+        timeout = min(WARM_REQUEST_TIMEOUT, max(0.1, deadline - time.monotonic()))
+        futures = {pool.submit(_fetch_one, b, timeout): b for b in targets}
+        done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        if pending:
+            logger.warning(f"Business context warm-up deadline hit; {len(pending)}/{len(targets)} fetches skipped")
+        return {futures[f]: f.result() for f in done if f.result()}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_business_contexts_sync(budget: float = WARM_DEADLINE) -> int:
+    """Bounded warm-up for the prewarm hook (runs before the job process has a loop).
+
+    Uses the snapshot another job process of this worker wrote recently; otherwise
+    fetches within ``budget`` seconds and shares the result.
+    """
+    if not warm_up_enabled():
+        return 0
+    started = time.monotonic()
+    contexts = _read_snapshot(max_age=WARM_INTERVAL)
+    source = 'shared snapshot'
+    if contexts is None:
+        contexts = _fetch_all(started + budget)
+        _write_snapshot(contexts)
+        source = 'backend'
+    warmed = _store(contexts)
+    logger.info(f"Warmed {warmed} business contexts from {source} in {(time.monotonic() - started) * 1000:.0f}ms")
+    return warmed
+
+
+async def warm_business_contexts(budget: float = WARM_DEADLINE) -> int:
+    """Refresh the warm-up targets without blocking the loop; cache writes stay on the loop thread."""
+    loop = asyncio.get_event_loop()
+    started = time.monotonic()
+    # A sibling process may already have refreshed within this interval
+    contexts = await loop.run_in_executor(None, _read_snapshot, WARM_INTERVAL / 2)
+    if contexts is None:
+        contexts = await loop.run_in_executor(None, _fetch_all, started + budget)
+        await loop.run_in_executor(None, _write_snapshot, contexts)
+    warmed = _store(contexts)
+    logger.debug(f"Refreshed {warmed} business contexts in {(time.monotonic() - started) * 1000:.0f}ms")
+    return warmed
+
+
+_warmer_task: Optional[asyncio.Task] = None
+
+
+def warm_up_enabled() -> bool:
+    return bool(WARM_BUSINESS_IDS) or WARM_TOP_BUSINESSES > 0
+
+
+def start_context_warmer(interval: float = WARM_INTERVAL) -> None:
+    """Refresh the warm-up targets every ``interval`` seconds on the running loop (once per process).
+
+    Ticks are jittered so the job processes of a worker do not refresh together; the
+    first to refresh shares its result through the snapshot and the others reuse it.
+    """
+    global _warmer_task
+    if not warm_up_enabled() or (_warmer_task is not None and not _warmer_task.done()):
+        return
+
+    async def _run() -> None:
+        while True:
+            await asyncio.sleep(interval * random.uniform(0.8, 1.2))
+            try:
+                await warm_business_contexts()
+            except Exception as e:
+                logger.debug(f"Business context warm-up failed: {e}")
+
+    _warmer_task = asyncio.get_event_loop().create_task(_run())
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import msgpack as _msgpack
+except Exception:
+    _msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Identical messages seen again within this many seconds are dropped as duplicates
+DATA_DEDUPE_WINDOW = float(os.getenv('DATA_DEDUPE_WINDOW', '2.0'))
+
+TOPIC_CHAT = 'lk.chat'
+MSG_ROLE_CONTEXT = 'role_context'
+MSG_TEXT = 'text_message'
+
+MSG_AGENT_RESPONSE = 'agent_response'
+MSG_AGENT_ERROR = 'agent_error'
+
+# Topics the agent handles; '' covers publishData without a topic
+ACCEPTED_TOPICS = (TOPIC_CHAT, '')
+
+# Binary envelope: marker byte (never the first byte of UTF-8 text or JSON), envelope
+# version, message type code, then the remaining fields as a msgpack map.
+# Clients opt in through role_context ({'encodings': ['msgpack', 'json']}); JSON stays the default.
+# The bundled frontend does not offer msgpack yet, so its rooms always get JSON.
+ENCODING_JSON = 'json'
+ENCODING_MSGPACK = 'msgpack'
+_FRAME_MARKER = 0xFE
+ENVELOPE_VERSION = 1
+_TYPE_CODES = {MSG_ROLE_CONTEXT: 1, MSG_TEXT: 2, MSG_AGENT_RESPONSE: 3, MSG_AGENT_ERROR: 4}
+_TYPE_NAMES = {v: k for k, v in _TYPE_CODES.items()}
+
+# Encoding negotiated per room; rooms that never negotiated get JSON
+_room_encodings: Dict[str, str] = {}
+
+
+def negotiate_encoding(context: dict) -> str:
+    """Pick the outgoing encoding from a role_context payload."""
+    offered = context.get('encodings') or [context.get('encoding')]
+    if isinstance(offered, str):
+        offered = [offered]
+    if _msgpack is not None and ENCODING_MSGPACK in (offered or []):
+        return ENCODING_MSGPACK
+    return ENCODING_JSON
+
+
+def set_room_encoding(room_name: str, encoding: str) -> None:
+    _room_encodings[room_name] = encoding
+
+
+def room_encoding(room_name: Optional[str]) -> str:
+    return _room_encodings.get(room_name or '', ENCODING_JSON)
+
+
+def forget_room_encoding(room_name: str) -> None:
+    _room_encodings.pop(room_name, None)
+
+
+def encode_message(message: dict, encoding: str = ENCODING_JSON) -> bytes:
+    """Serialize an outgoing message as JSON or as a binary envelope."""
+    type_code = _TYPE_CODES.get(message.get('type'))
+    if encoding != ENCODING_MSGPACK or _msgpack is None or type_code is None:
+        return json.dumps(message).encode('utf-8')
+    body = {k: v for k, v in message.items() if k != 'type'}
+    return bytes((_FRAME_MARKER, ENVELOPE_VERSION, type_code)) + _msgpack.packb(body, use_bin_type=True)
+
+
+async def publish_message(room, message: dict, reliable: bool = True) -> bool:
+    """Publish a message to the room in the encoding its client negotiated."""
+    local_participant = getattr(room, 'local_participant', None)
+    if local_participant is None or not hasattr(local_participant, 'publish_data'):
+        return False
+    payload = encode_message(message, room_encoding(getattr(room, 'name', None)))
+    await local_participant.publish_data(payload, reliable=reliable)
+    return True
+
+
+class DataMessage:
+    """One decoded data-channel packet."""
+
+    __slots__ = ('type', 'topic', 'text', 'obj', 'participant', 'msg_id', 'hashed_id')
+
+    def __init__(
+        self,
+        type: Optional[str],
+        topic: str,
+        text: Optional[str],
+        obj: Optional[dict],
+        participant,
+        msg_id: str,
+        hashed_id: bool = False,
+    ) -> None:
+        self.type = type
+        self.topic = topic
+        self.text = text
+        self.obj = obj
+        self.participant = participant
+        self.msg_id = msg_id
+        # True when the sender gave no id and msg_id is a digest of the content
+        self.hashed_id = hashed_id
+
+
+def _unpack_event(args: tuple, kwargs: dict) -> Tuple[Any, str, Any]:
+    """Normalize the room event signatures into (payload, topic, participant)."""
+    packet = kwargs.get('packet') or kwargs.get('message') or (args[0] if args else None)
+    participant = kwargs.get('participant') or (args[1] if len(args) > 1 else None) or getattr(packet, 'participant', None)
+    topic = kwargs.get('topic') or getattr(packet, 'topic', None) or ''
+    payload = packet.data if hasattr(packet, 'data') else packet
+    return payload, topic, participant
+
+
+def _decode_frame(frame: bytes, topic: str, participant) -> Optional[DataMessage]:
+    if _msgpack is None or len(frame) < 3 or frame[1] != ENVELOPE_VERSION:
+        logger.debug('Dropping binary data frame: unsupported envelope or msgpack not installed')
+        return None
+    msg_type = _TYPE_NAMES.get(frame[2])
+    obj = _msgpack.unpackb(frame[3:], raw=False)
+    if msg_type is None or not isinstance(obj, dict):
+        return None
+    obj['type'] = msg_type
+    text = obj.get('text')
+    msg_id = obj.get('id')
+    return DataMessage(
+        msg_type, topic or obj.get('topic') or '', text if isinstance(text, str) else None, obj, participant,
+        str(msg_id or hashlib.sha1(frame).hexdigest()), hashed_id=not msg_id,
+    )
+
+
+def decode_message(payload: Any, topic: str = '', participant=None) -> Optional[DataMessage]:
+    """Decode a payload once: binary envelopes by their type byte, JSON objects by their
+    ``type``, anything else as plain chat text."""
+    obj = None
+    if isinstance(payload, (bytes, bytearray, memoryview)) and len(payload) and payload[0] == _FRAME_MARKER:
+        return _decode_frame(bytes(payload), topic, participant)
+    if isinstance(payload, dict):
+        obj = payload
+        raw = None
+    elif isinstance(payload, (bytes, bytearray, memoryview)):
+        try:
+            raw = bytes(payload).decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+    elif isinstance(payload, str):
+        raw = payload
+    else:
+        return None
+
+    if raw is not None:
+        stripped = raw.strip()
+        if not stripped:
+            return None
+        if stripped[0] == '{':
+            try:
+                parsed = json.loads(stripped)
+                if isinstance(parsed, dict):
+                    obj = parsed
+            except ValueError:
+                pass
+
+    if obj is not None:
+        text = obj.get('text') or obj.get('message')
+        msg_type = obj.get('type') or (MSG_TEXT if text else None)
+        topic = topic or obj.get('topic') or ''
+        msg_id = obj.get('id') or obj.get('messageId') or obj.get('msgId')
+    else:
+        text = raw
+        msg_type = MSG_TEXT
+        msg_id = None
+
+    hashed_id = not msg_id
+    if hashed_id:
+        # No id from the sender: key by content (the dispatcher only matches it across delivery paths)
+        body = text if isinstance(text, str) and msg_type == MSG_TEXT else (raw if raw is not None else json.dumps(obj, sort_keys=True, default=str))
+        msg_id = hashlib.sha1(body.encode('utf-8')).hexdigest()
+    return DataMessage(msg_type, topic, text if isinstance(text, str) else None, obj, participant, str(msg_id), hashed_id=hashed_id)
+
+
+class DataChannelDispatcher:
+    """Single entry point for data-channel packets in a room.
+
+    Every packet is decoded once, filtered by topic, deduplicated over ``dedupe_window``
+    seconds and handed to the handler registered for its type. Handlers run as tasks
+    through ``spawn`` (the room's task supervisor).
+
+    Messages carrying a sender id are deduplicated by that id. Messages without one are
+    only matched by content across delivery paths (data channel vs. session
+    user_message), so a user repeating the same text on purpose is still answered.
+    """
+
+    def __init__(
+        self,
+        room_name: str,
+        spawn: Callable[[Awaitable, str], Any],
+        dedupe_window: float = DATA_DEDUPE_WINDOW,
+        topics: Tuple[str, ...] = ACCEPTED_TOPICS,
+    ) -> None:
+        self.room_name = room_name
+        self.spawn = spawn
+        self.dedupe_window = dedupe_window
+        self.topics = topics
+        self._routes: Dict[str, Callable[[DataMessage], Awaitable]] = {}
+        # dedupe key -> (first seen, delivery path)
+        self._seen: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self.received = 0
+        self.duplicates = 0
+        self.ignored = 0
+
+    def route(self, msg_type: str, handler: Callable[[DataMessage], Awaitable]) -> None:
+        self._routes[msg_type] = handler
+
+    def _is_duplicate(self, message: DataMessage, source: str) -> bool:
+        now = time.monotonic()
+        while self._seen:
+            _, (seen_at, _) = next(iter(self._seen.items()))
+            if now - seen_at <= self.dedupe_window:
+                break
+            self._seen.popitem(last=False)
+        key = f"{'hash' if message.hashed_id else 'id'}:{message.msg_id}"
+        seen = self._seen.get(key)
+        if seen is not None and (not message.hashed_id or seen[1] != source):
+            if message.hashed_id:
+                # Consumed: a later copy on either path is a new message again
+                del self._seen[key]
+            return True
+        self._seen[key] = (now, source)
+        self._seen.move_to_end(key)
+        if not message.hashed_id and message.type == MSG_TEXT and message.text:
+            # Lets an id-less copy of this text on the other delivery path be recognised
+            self._seen[f"hash:{hashlib.sha1(message.text.encode('utf-8')).hexdigest()}"] = (now, source)
+        return False
+
+    def on_packet(self, *args, **kwargs) -> None:
+        """Room event callback; accepts the (packet) and (data, participant, topic=...) signatures."""
+        self._dispatch(args, kwargs, 'data')
+
+    def on_session_text(self, text) -> None:
+        """Text delivered by the session's user_message event."""
+        self._dispatch((text,), {}, 'session')
+
+    def _dispatch(self, args: tuple, kwargs: dict, source: str) -> None:
+        self.received += 1
+        try:
+            payload, topic, participant = _unpack_event(args, kwargs)
+            if topic not in self.topics:
+                self.ignored += 1
+                return
+            message = decode_message(payload, topic, participant)
+        except Exception as e:
+            logger.debug(f"Could not decode data packet in room {self.room_name}: {e}")
+            return
+        if message is None or (message.topic and message.topic not in self.topics):
+            self.ignored += 1
+            return
+        if self._is_duplicate(message, source):
+            self.duplicates += 1
+            logger.info(f"Dropping duplicate {message.type} message {message.msg_id[:12]} ({source}) in room {self.room_name}")
+            return
+        handler = self._routes.get(message.type)
+        if handler is None:
+            self.ignored += 1
+            logger.debug(f"No handler for data message type {message.type!r} in room {self.room_name}")
+            return
+        self.spawn(handler(message), f"data:{message.type}")
+
+    def attach(self, room) -> bool:
+        """Subscribe to the room's data_received event (once)."""
+        try:
+            room.on('data_received', self.on_packet)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not attach data channel dispatcher: {e}")
+            return False
+
+    def snapshot(self) -> Dict[str, int]:
+        return {'received': self.received, 'duplicates': self.duplicates, 'ignored': self.ignored}
@@ -0,0 +1,101 @@
+import os
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Total time a single user turn (voice or text) may spend on tool/LLM work
+TURN_BUDGET = float(os.getenv('TURN_BUDGET_SECONDS', '20'))
+# A deadline that expired this long ago belongs to an earlier turn and is ignored
+STALE_DEADLINE_AFTER = 5.0
+
+
+class Deadline:
+    """Absolute expiry for one user turn, shared by every outbound call made during it."""
+
+    def __init__(self, budget: float = TURN_BUDGET) -> None:
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Timeout for the next call: what is left of the turn, optionally capped."""
+        remaining = self.remaining()
+        return min(remaining, cap) if cap is not None else remaining
+
+
+def start_turn_deadline(session, budget: float = TURN_BUDGET) -> Optional[Deadline]:
+    """Start a new turn deadline and store it in the session's userdata dict."""
+    deadline = Deadline(budget)
+    userdata = _session_userdata(session)
+    if userdata is None:
+        return deadline
+    userdata['turn_deadline'] = deadline
+    return deadline
+
+
+def get_turn_deadline(run_ctx) -> Optional[Deadline]:
+    """Return the current turn's deadline from a RunContext (or session), if one was started."""
+    userdata = None
+    try:
+        userdata = run_ctx.userdata if run_ctx is not None else None
+    except Exception:
+        userdata = None
+    if userdata is None:
+        userdata = _session_userdata(getattr(run_ctx, 'session', None))
+    if isinstance(userdata, dict):
+        deadline = userdata.get('turn_deadline')
+        if isinstance(deadline, Deadline):
+            if time.monotonic() - deadline.expires_at > STALE_DEADLINE_AFTER:
+                # Left over from a turn that was never closed; do not let it fail this one
+                userdata.pop('turn_deadline', None)
+                return None
+            return deadline
+    return None
+
+
+def clear_turn_deadline(session, deadline: Optional[Deadline] = None) -> None:
+    """End the current turn's deadline (only ``deadline`` itself, when given)."""
+    userdata = _session_userdata(session)
+    if userdata is None:
+        return
+    if deadline is None or userdata.get('turn_deadline') is deadline:
+        userdata.pop('turn_deadline', None)
+
+
+def scope_turn_deadlines(session) -> None:
+    """Tie deadlines to the agent's turn cycle.
+
+    A turn that reaches 'thinking' without a deadline (voice turns where
+    on_user_turn_completed did not fire) gets one, and returning to 'listening'
+    ends it so the next turn never inherits an expired deadline.
+    """
+    def _on_state(event) -> None:
+        new_state = getattr(event, 'new_state', None)
+        if new_state == 'listening':
+            clear_turn_deadline(session)
+        elif new_state == 'thinking':
+            userdata = _session_userdata(session)
+            if userdata is not None and not isinstance(userdata.get('turn_deadline'), Deadline):
+                start_turn_deadline(session)
+
+    try:
+        session.on('agent_state_changed', _on_state)
+    except Exception as e:
+        logger.debug(f"Could not scope turn deadlines to agent state: {e}")
+
+
+def _session_userdata(session) -> Optional[dict]:
+    if session is None:
+        return None
+    try:
+        userdata = session.userdata
+    except Exception:
+        return None
+    return userdata if isinstance(userdata, dict) else None
@@ -1,42 +1,49 @@
-import os
+import asyncio
 import logging
 
+from agent.history_store import create_history_store
+from agent.persistence import get_conversation_writer
+
 logger = logging.getLogger(__name__)
 
-# In-memory history per room
+# In-memory history per room (hot cache; the configured HistoryStore is written behind)
 conversation_histories: dict = {}
 HISTORY_LIMIT = 10
 room_user_identity: dict = {}
 
-# Optional Redis backend
-try:
-    import redis as _redis
-    _redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
+_history_store = None
+_pending_saves: dict = {}
+_dirty_rooms: set = set()
+
+
+def get_history_store():
+    """Return the process-wide HistoryStore selected by HISTORY_BACKEND."""
+    global _history_store
+    if _history_store is None:
+        _history_store = create_history_store()
+        logger.info(f"Using '{_history_store.name}' history store")
+    return _history_store
+
+
+async def load_room_history(room_name: str):
+    """Warm the in-memory history for a room from the history store (call once per session)."""
     try:
-        redis_client = _redis.from_url(_redis_url)
+        stored = await get_history_store().load(room_name)
     except Exception:
-        redis_client = _redis.StrictRedis.from_url(_redis_url)
-except Exception:
-    redis_client = None
+        logger.debug('Failed to load room history from store')
+        stored = []
+    current = conversation_histories.get(room_name) or []
+    merged = (stored + current)[-HISTORY_LIMIT:]
+    if room_name in conversation_histories:
+        conversation_histories[room_name][:] = merged
+    else:
+        conversation_histories[room_name] = merged
+    return conversation_histories[room_name]
 
 
 def get_room_history(room_name: str):
     if room_name not in conversation_histories:
-        if redis_client:
-            try:
-                raw = redis_client.get(f"voxa:history:{room_name}")
-                if raw:
-                    try:
-                        import json as _json
-                        conversation_histories[room_name] = _json.loads(raw)
-                    except Exception:
-                        conversation_histories[room_name] = []
-                else:
-                    conversation_histories[room_name] = []
-            except Exception:
-                conversation_histories[room_name] = []
-        else:
-            conversation_histories[room_name] = []
+        conversation_histories[room_name] = []
     return conversation_histories[room_name]
 
 
@@ -45,85 +52,103 @@ def update_history(room_name: str, role: str, content: str):
     hist.append({"role": role, "content": content})
     if len(hist) > HISTORY_LIMIT:
         hist.pop(0)
-    if redis_client:
-        try:
-            import json as _json
-            redis_client.set(f"voxa:history:{room_name}", _json.dumps(hist))
-        except Exception:
-            logger.debug('Failed to persist room history to Redis')
+    _schedule_save(room_name)
 
 
-async def persist_user_message_if_possible(ctx, user_role: str, text: str, business_id: str):
-    """Persist user messages for customers/general users when we can identify by email."""
+def _schedule_save(room_name: str) -> None:
+    """Write the room's history behind; bursts of updates coalesce into one save."""
     try:
-        room = getattr(ctx, 'room', None)
-        rname = getattr(room, 'name', None) if room is not None else None
-        identity = room_user_identity.get(rname, {}) if rname else {}
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _dirty_rooms.add(room_name)
+    task = _pending_saves.get(room_name)
+    if task is None or task.done():
+        _pending_saves[room_name] = loop.create_task(_save_room(room_name))
 
-        metadata = getattr(room, 'metadata', {}) if hasattr(room, 'metadata') else {}
-        if isinstance(metadata, str):
+
+async def _save_room(room_name: str) -> None:
+    try:
+        while room_name in _dirty_rooms:
+            _dirty_rooms.discard(room_name)
+            hist = conversation_histories.get(room_name)
+            if hist is None:
+                break
             try:
-                import json as _json
-                metadata = _json.loads(metadata)
+                await get_history_store().save(room_name, list(hist))
             except Exception:
-                metadata = {}
-        email = identity.get('email') or (metadata.get('email') if isinstance(metadata, dict) else None)
+                logger.debug('Failed to persist room history to store')
+    finally:
+        _pending_saves.pop(room_name, None)
 
-        if not email or not isinstance(email, str) or '@' not in email:
-            return
 
-        import requests as _req
-        backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
-        payload = { 'role': 'user', 'content': text }
+async def flush_room_history(room_name: str) -> None:
+    """Wait for any pending history write for the room to finish."""
+    task = _pending_saves.get(room_name)
+    if task is not None and not task.done():
+        try:
+            await task
+        except Exception:
+            pass
 
-        if user_role == 'customer' and business_id:
-            try:
-                _req.post(f"{backend_url}/api/crm/customers/email/{email}/conversations", params={'businessId': business_id}, json=payload, timeout=6)
-            except Exception:
-                pass
-        elif user_role == 'general':
-            try:
-                _req.post(f"{backend_url}/api/general/users/email/{email}/conversations", json=payload, timeout=6)
-            except Exception:
-                pass
-    except Exception:
-        logger.debug('persist_assistant_message_if_possible failed')
 
+async def release_room(room_name: str) -> None:
+    """Flush the room's pending history write and drop its in-memory state (call once the room is gone)."""
+    await flush_room_history(room_name)
+    conversation_histories.pop(room_name, None)
+    room_user_identity.pop(room_name, None)
+    _dirty_rooms.discard(room_name)
 
-async def persist_assistant_message_if_possible(ctx, user_role: str, text: str, business_id: str):
-    """Persist assistant (agent) messages to DB for customers and general users."""
-    try:
-        room = getattr(ctx, 'room', None)
-        rname = getattr(room, 'name', None) if room is not None else None
-        identity = room_user_identity.get(rname, {}) if rname else {}
 
-        metadata = getattr(room, 'metadata', {}) if hasattr(room, 'metadata') else {}
-        if isinstance(metadata, str):
-            try:
-                import json as _json
-                metadata = _json.loads(metadata)
-            except Exception:
-                metadata = {}
-        email = identity.get('email') or (metadata.get('email') if isinstance(metadata, dict) else None)
+def _resolve_room_email(ctx):
+    """Return (room_name, email) for the room's known user, preferring cached identity over metadata."""
+    room = getattr(ctx, 'room', None)
+    rname = getattr(room, 'name', None) if room is not None else None
+    identity = room_user_identity.get(rname, {}) if rname else {}
 
-        if not email or not isinstance(email, str) or '@' not in email:
-            return
+    metadata = getattr(room, 'metadata', {}) if hasattr(room, 'metadata') else {}
+    if isinstance(metadata, str):
+        try:
+            import json as _json
+            metadata = _json.loads(metadata)
+        except Exception:
+            metadata = {}
+    email = identity.get('email') or (metadata.get('email') if isinstance(metadata, dict) else None)
 
-        import requests as _req
-        backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
-        payload = { 'role': 'assistant', 'content': text }
+    if not email or not isinstance(email, str) or '@' not in email:
+        return rname, None
+    return rname, email
 
-        if user_role == 'customer' and business_id:
-            try:
-                _req.post(f"{backend_url}/api/crm/customers/email/{email}/conversations", params={'businessId': business_id}, json=payload, timeout=6)
-            except Exception:
-                pass
-        elif user_role == 'general':
-            try:
-                _req.post(f"{backend_url}/api/general/users/email/{email}/conversations", json=payload, timeout=6)
-            except Exception:
-                pass
+
+def _enqueue(rname: str, email: str, user_role: str, business_id: str, role: str, text: str) -> None:
+    writer = get_conversation_writer(rname)
+    if writer is None:
+        logger.warning(f"Not persisting {role} message for room {rname}: the room was already released")
+        return
+    writer.enqueue(email, user_role, business_id, role, text)
+
+
+async def persist_user_message_if_possible(ctx, user_role: str, text: str, business_id: str):
+    """Queue user messages for customers/general users when we can identify by email.
+
+    Messages go to the room's write-behind queue (agent.persistence) and are sent
+    in batches off the reply path.
+    """
+    try:
+        rname, email = _resolve_room_email(ctx)
+        if not email or not rname:
+            return
+        _enqueue(rname, email, user_role, business_id, 'user', text)
     except Exception:
-        logger.debug('persist_assistant_message_if_possible failed')
+        logger.debug('persist_user_message_if_possible failed')
 
 
+async def persist_assistant_message_if_possible(ctx, user_role: str, text: str, business_id: str):
+    """Queue assistant (agent) messages for customers and general users."""
+    try:
+        rname, email = _resolve_room_email(ctx)
+        if not email or not rname:
+            return
+        _enqueue(rname, email, user_role, business_id, 'assistant', text)
+    except Exception:
+        logger.debug('persist_assistant_message_if_possible failed')
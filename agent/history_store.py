@@ -0,0 +1,237 @@
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# HISTORY_BACKEND selects the store: 'memory', 'redis' or 'sqlite'.
+# When unset, Redis is used if REDIS_URL is configured, otherwise memory.
+HISTORY_BACKEND = os.getenv('HISTORY_BACKEND', '').strip().lower()
+HISTORY_MAX_ROOMS = int(os.getenv('HISTORY_MAX_ROOMS', '1000'))
+HISTORY_SQLITE_PATH = os.getenv('HISTORY_SQLITE_PATH', 'voxa_history.db')
+HISTORY_KEY_PREFIX = 'voxa:history:'
+
+
+# Optional compact encoding for stored history. HISTORY_ENCODING=msgpack stores
+# a versioned binary blob (msgpack, zstd-compressed once it is large); 'json'
+# keeps the legacy plain-JSON format. Reads accept both, so switching is transparent.
+try:
+    import msgpack as _msgpack
+except Exception:
+    _msgpack = None
+try:
+    import zstandard as _zstd
+except Exception:
+    _zstd = None
+
+HISTORY_ENCODING = os.getenv('HISTORY_ENCODING', 'msgpack' if _msgpack else 'json').strip().lower()
+HISTORY_COMPRESS_MIN_BYTES = int(os.getenv('HISTORY_COMPRESS_MIN_BYTES', '512'))
+COMPACT_ENCODING = HISTORY_ENCODING == 'msgpack' and _msgpack is not None
+
+# Blob header: marker byte (never the first byte of UTF-8 JSON) + format version
+_HEADER_MARKER = 0xFF
+FORMAT_MSGPACK = 1
+FORMAT_MSGPACK_ZSTD = 2
+
+_ROLE_CODES = {'system': 0, 'user': 1, 'assistant': 2}
+_ROLE_NAMES = {v: k for k, v in _ROLE_CODES.items()}
+
+if HISTORY_ENCODING == 'msgpack' and _msgpack is None:
+    logger.warning("HISTORY_ENCODING=msgpack but msgpack is not installed; storing history as JSON")
+
+
+def encode_history(history: List[dict], encoding: Optional[str] = None) -> bytes:
+    encoding = encoding or ('msgpack' if COMPACT_ENCODING else 'json')
+    if encoding != 'msgpack' or _msgpack is None:
+        return json.dumps(history).encode('utf-8')
+
+    # Messages become [role_code, content] pairs; unknown roles keep their name
+    rows = [[_ROLE_CODES.get(m.get('role'), m.get('role')), m.get('content', '')] for m in history]
+    payload = _msgpack.packb(rows, use_bin_type=True)
+    if _zstd is not None and len(payload) >= HISTORY_COMPRESS_MIN_BYTES:
+        return bytes((_HEADER_MARKER, FORMAT_MSGPACK_ZSTD)) + _zstd.ZstdCompressor(level=3).compress(payload)
+    return bytes((_HEADER_MARKER, FORMAT_MSGPACK)) + payload
+
+
+def decode_history(raw) -> List[dict]:
+    if not raw:
+        return []
+    if isinstance(raw, memoryview):
+        raw = bytes(raw)
+    if isinstance(raw, (bytes, bytearray)) and len(raw) >= 2 and raw[0] == _HEADER_MARKER:
+        version, body = raw[1], bytes(raw[2:])
+        if version == FORMAT_MSGPACK_ZSTD:
+            if _zstd is None:
+                logger.warning('Stored history is zstd-compressed but zstandard is not installed')
+                return []
+            body = _zstd.ZstdDecompressor().decompress(body)
+        elif version != FORMAT_MSGPACK:
+            logger.warning(f"Unknown stored history format version {version}")
+            return []
+        if _msgpack is None:
+            logger.warning('Stored history is msgpack-encoded but msgpack is not installed')
+            return []
+        rows = _msgpack.unpackb(body, raw=False)
+        return [{'role': _ROLE_NAMES.get(r[0], r[0]), 'content': r[1]} for r in rows]
+
+    # Legacy plain-JSON history
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw.decode('utf-8')
+    data = json.loads(raw)
+    return data if isinstance(data, list) else []
+
+
+class HistoryStore(ABC):
+    """Durable storage for per-room conversation history.
+
+    A store persists the whole (already trimmed) history list of a room. The
+    in-process cache in agent.history stays the source of truth for reads during
+    a session; stores are read on cache misses and written behind every update.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    async def load(self, room_name: str) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def save(self, room_name: str, history: List[dict]) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, room_name: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryHistoryStore(HistoryStore):
+    """Bounded in-process store; evicts the least recently used room beyond max_rooms."""
+
+    name = 'memory'
+
+    def __init__(self, max_rooms: int = HISTORY_MAX_ROOMS) -> None:
+        self.max_rooms = max_rooms
+        self._rooms: 'OrderedDict[str, List[dict]]' = OrderedDict()
+
+    async def load(self, room_name: str) -> List[dict]:
+        hist = self._rooms.get(room_name)
+        if hist is None:
+            return []
+        self._rooms.move_to_end(room_name)
+        return list(hist)
+
+    async def save(self, room_name: str, history: List[dict]) -> None:
+        self._rooms[room_name] = list(history)
+        self._rooms.move_to_end(room_name)
+        while len(self._rooms) > self.max_rooms:
+            self._rooms.popitem(last=False)
+
+    async def delete(self, room_name: str) -> None:
+        self._rooms.pop(room_name, None)
+
+
+class RedisHistoryStore(HistoryStore):
+    """Async Redis store (redis.asyncio); one key per room, shared across workers."""
+
+    name = 'redis'
+
+    def __init__(self, url: Optional[str] = None, ttl: Optional[int] = None) -> None:
+        import redis.asyncio as _aioredis
+        self.url = url or os.getenv('REDIS_URL', 'redis://localhost:6379')
+        self.ttl = ttl if ttl is not None else int(os.getenv('HISTORY_TTL_SECONDS', '0')) or None
+        self._client = _aioredis.from_url(self.url)
+
+    async def load(self, room_name: str) -> List[dict]:
+        raw = await self._client.get(f"{HISTORY_KEY_PREFIX}{room_name}")
+        return decode_history(raw)
+
+    async def save(self, room_name: str, history: List[dict]) -> None:
+        await self._client.set(f"{HISTORY_KEY_PREFIX}{room_name}", encode_history(history), ex=self.ttl)
+
+    async def delete(self, room_name: str) -> None:
+        await self._client.delete(f"{HISTORY_KEY_PREFIX}{room_name}")
+
+    async def close(self) -> None:
+        try:
+            await self._client.aclose()
+        except AttributeError:
+            await self._client.close()
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """Local SQLite store in WAL mode so history survives restarts on single-node deployments.
+
+    sqlite3 is blocking, so every statement runs on a dedicated single thread.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = HISTORY_SQLITE_PATH) -> None:
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='history-sqlite')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS room_history ('
+            'room TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)'
+        )
+
+    def _run(self, fn, *args):
+        def _locked():
+            with self._lock:
+                return fn(*args)
+        return asyncio.get_event_loop().run_in_executor(self._executor, _locked)
+
+    def _load_sync(self, room_name: str):
+        row = self._conn.execute('SELECT data FROM room_history WHERE room = ?', (room_name,)).fetchone()
+        return row[0] if row else None
+
+    def _save_sync(self, room_name: str, data: bytes) -> None:
+        self._conn.execute(
+            'INSERT INTO room_history (room, data, updated_at) VALUES (?, ?, julianday(\'now\')) '
+            'ON CONFLICT(room) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at',
+            (room_name, data),
+        )
+
+    def _delete_sync(self, room_name: str) -> None:
+        self._conn.execute('DELETE FROM room_history WHERE room = ?', (room_name,))
+
+    async def load(self, room_name: str) -> List[dict]:
+        return decode_history(await self._run(self._load_sync, room_name))
+
+    async def save(self, room_name: str, history: List[dict]) -> None:
+        await self._run(self._save_sync, room_name, encode_history(history))
+
+    async def delete(self, room_name: str) -> None:
+        await self._run(self._delete_sync, room_name)
+
+    async def close(self) -> None:
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+
+def create_history_store(backend: Optional[str] = None) -> HistoryStore:
+    """Build the configured store, falling back to memory if the backend is unavailable."""
+    backend = (backend or HISTORY_BACKEND or ('redis' if os.getenv('REDIS_URL') else 'memory')).lower()
+    try:
+        if backend == 'redis':
+            return RedisHistoryStore()
+        if backend == 'sqlite':
+            return SQLiteHistoryStore()
+        if backend != 'memory':
+            logger.warning(f"Unknown HISTORY_BACKEND '{backend}', using in-memory history")
+    except Exception as e:
+        logger.warning(f"History backend '{backend}' unavailable ({e}), using in-memory history")
+    return MemoryHistoryStore()
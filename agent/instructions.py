@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from prompts import AGENT_INSTRUCTION, CUSTOMER_CARE_INSTRUCTION, SESSION_INSTRUCTION
+
+logger = logging.getLogger(__name__)
+
+INSTRUCTION_CACHE_SIZE = int(os.getenv('INSTRUCTION_CACHE_SIZE', '256'))
+
+# Business context fields that end up in the compiled instructions
+_INSTRUCTION_FIELDS = ('name', 'description', 'products', 'policies', 'agentConfig')
+
+
+def mode_for_role(user_role: str) -> str:
+    if user_role == 'owner':
+        return 'OWNER'
+    if user_role == 'general':
+        return 'GENERAL'
+    return 'CUSTOMER'
+
+
+def config_hash(business_context: dict) -> str:
+    """Digest of everything in the business context that the instructions depend on."""
+    if not isinstance(business_context, dict):
+        business_context = {}
+    relevant = {k: business_context.get(k) for k in _INSTRUCTION_FIELDS}
+    return hashlib.md5(json.dumps(relevant, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _business_hours(agent_config: dict) -> str:
+    business_hours_config = agent_config.get('businessHours', {})
+    if isinstance(business_hours_config, dict):
+        return ', '.join([f"{k}: {v}" for k, v in business_hours_config.items()]) if business_hours_config else '9-5'
+    return str(business_hours_config) if business_hours_config else '9-5'
+
+
+def build_instructions(business_context: dict, mode: str) -> str:
+    """Format the full system prompt for a business and mode (OWNER, CUSTOMER or GENERAL)."""
+    if not isinstance(business_context, dict):
+        business_context = {}
+    agent_config = business_context.get('agentConfig', {})
+    if not isinstance(agent_config, dict):
+        agent_config = {}
+    biz_products = business_context.get('products', [])
+
+    instruction = AGENT_INSTRUCTION.format(
+        business_name=business_context.get('name', 'the business'),
+        business_description=business_context.get('description', ''),
+        products_list=', '.join(biz_products) if isinstance(biz_products, list) else '',
+        business_policies=business_context.get('policies', ''),
+        mode=mode,
+        agent_tone=agent_config.get('tone', 'professional'),
+        response_style=agent_config.get('responseStyle', 'concise'),
+        business_hours_str=_business_hours(agent_config),
+        custom_prompt=agent_config.get('customPrompt', ''),
+    )
+    # Customers also get the customer care guidance
+    if mode == 'CUSTOMER':
+        instruction = f"{instruction}\n\n{CUSTOMER_CARE_INSTRUCTION}"
+    # Session onboarding instructions are always included
+    return f"{instruction}\n\n{SESSION_INSTRUCTION}"
+
+
+class InstructionCache:
+    """LRU of compiled instructions keyed by (businessId, mode, config hash).
+
+    Sessions for the same business and mode reuse the identical prompt string;
+    a changed business context hashes to a new key, and invalidate_business()
+    drops every entry for a business when its cached context is refreshed.
+    """
+
+    def __init__(self, max_entries: int = INSTRUCTION_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, str, str], str]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, business_id: str, mode: str, business_context: dict) -> str:
+        key = (business_id or '', mode, config_hash(business_context))
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+        instruction = build_instructions(business_context, mode)
+        self._entries[key] = instruction
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return instruction
+
+    def invalidate_business(self, business_id: str) -> int:
+        stale = [k for k in self._entries if k[0] == (business_id or '')]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+instruction_cache = InstructionCache()
@@ -0,0 +1,189 @@
+import os
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional
+
+from agent.admission import PRIORITY_CUSTOMER, LLMRateLimited, estimate_tokens, llm_admission
+
+if TYPE_CHECKING:
+    from mistralai import Mistral
+
+logger = logging.getLogger(__name__)
+
+MISTRAL_MAX_CONNECTIONS = int(os.getenv('MISTRAL_MAX_CONNECTIONS', '20'))
+MISTRAL_TIMEOUT = float(os.getenv('MISTRAL_TIMEOUT', '25'))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv('LLM_RATE_LIMIT_RETRIES', '2'))
+
+_mistral_client: Optional['Mistral'] = None
+
+
+def get_mistral_client() -> 'Mistral':
+    """Return the process-wide Mistral client.
+
+    The client shares one pooled keep-alive httpx.AsyncClient, so concurrent rooms
+    reuse TLS connections instead of opening one per completion.
+    """
+    global _mistral_client
+    if _mistral_client is None:
+        # Imported here so importing this module (and the tools) stays cheap
+        import httpx
+        from mistralai import Mistral
+
+        limits = httpx.Limits(
+            max_connections=MISTRAL_MAX_CONNECTIONS,
+            max_keepalive_connections=MISTRAL_MAX_CONNECTIONS,
+        )
+        _mistral_client = Mistral(
+            api_key=os.getenv("MISTRAL_API_KEY"),
+            async_client=httpx.AsyncClient(limits=limits, timeout=MISTRAL_TIMEOUT),
+        )
+    return _mistral_client
+
+
+class CompletionTimeout(Exception):
+    """Raised when a streamed completion does not finish within its timeout."""
+
+    def __init__(self, partial: str) -> None:
+        super().__init__('completion timed out')
+        self.partial = partial
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Return the Retry-After delay for a rate-limit error, or None if it is not one.
+
+    A 429 without a usable Retry-After header returns 0.0 so the caller falls back
+    to exponential backoff.
+    """
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'raw_response', None), 'status_code', None)
+    if status != 429:
+        return None
+    headers = getattr(getattr(error, 'raw_response', None), 'headers', None) or {}
+    try:
+        return max(0.0, float(headers.get('retry-after') or headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def stream_chat(
+    messages: List[dict],
+    model: str = "mistral-medium",
+    timeout: float = MISTRAL_TIMEOUT,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    usage: Optional[dict] = None,
+    priority: int = PRIORITY_CUSTOMER,
+) -> str:
+    """Stream a chat completion, forwarding each text delta to on_delta, and return the full text.
+
+    If ``usage`` is given it is filled with prompt_tokens/completion_tokens from the
+    final stream event.
+
+    Every attempt goes through the worker-wide admission controller at ``priority``.
+    Provider rate limits (429) pause admissions for the Retry-After window and the
+    call is retried while time remains; LLMRateLimited is raised otherwise.
+
+    The whole call, queueing included, is bounded by ``timeout``; on expiry the HTTP
+    stream is closed and CompletionTimeout carries whatever text had arrived.
+    Cancelling the caller cancels the stream as well.
+    """
+    parts: List[str] = []
+    reserved = estimate_tokens(messages)
+
+    async def _attempt() -> None:
+        async with llm_admission.admit(priority, reserved) as admission:
+            stream = await get_mistral_client().chat.stream_async(model=model, messages=messages)
+            async with stream as events:
+                async for event in events:
+                    event_usage = getattr(event.data, 'usage', None)
+                    if event_usage is not None:
+                        prompt_tokens = getattr(event_usage, 'prompt_tokens', 0) or 0
+                        completion_tokens = getattr(event_usage, 'completion_tokens', 0) or 0
+                        admission.tokens = prompt_tokens + completion_tokens
+                        if usage is not None:
+                            usage['prompt_tokens'] = prompt_tokens
+                            usage['completion_tokens'] = completion_tokens
+                    choices = getattr(event.data, 'choices', None) or []
+                    if not choices:
+                        continue
+                    delta = choices[0].delta.content
+                    if not delta or not isinstance(delta, str):
+                        continue
+                    parts.append(delta)
+                    if on_delta is not None:
+                        try:
+                            await on_delta(delta)
+                        except Exception:
+                            logger.debug('on_delta callback failed', exc_info=True)
+
+    async def _consume() -> None:
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            try:
+                await _attempt()
+                return
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after is None or parts:
+                    raise
+                delay = retry_after or min(8.0, 0.5 * (2 ** attempt))
+                llm_admission.note_rate_limited(delay)
+                if attempt >= LLM_RATE_LIMIT_RETRIES:
+                    raise LLMRateLimited(str(e)) from e
+
+    try:
+        await asyncio.wait_for(_consume(), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise CompletionTimeout(''.join(parts))
+    return ''.join(parts)
+
+
+async def hedged_stream_chat(
+    messages: List[dict],
+    model: str = "mistral-medium",
+    timeout: float = MISTRAL_TIMEOUT,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    usage: Optional[dict] = None,
+    priority: int = PRIORITY_CUSTOMER,
+    hedge_after: Optional[float] = None,
+) -> str:
+    """stream_chat with an optional hedge: if no answer has completed after ``hedge_after``
+    seconds, a duplicate request is sent and the first complete answer wins; the other
+    request is cancelled. Only the primary streams deltas to on_delta.
+    """
+    if not hedge_after or hedge_after >= timeout:
+        return await stream_chat(messages, model, timeout, on_delta, usage, priority)
+
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    usages = {'primary': {}, 'hedge': {}}
+    primary = asyncio.create_task(stream_chat(messages, model, timeout, on_delta, usages['primary'], priority))
+    tasks = {primary: 'primary'}
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if not done:
+            logger.info(f"Hedging {model} request after {hedge_after:.2f}s")
+            hedge = asyncio.create_task(
+                stream_chat(messages, model, max(0.1, deadline - loop.time()), None, usages['hedge'], priority)
+            )
+            tasks[hedge] = 'hedge'
+
+        pending = set(tasks)
+        errors = []
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if usage is not None:
+                        usage.update(usages[tasks[task]])
+                    return task.result()
+                errors.append(task.exception())
+
+        # Both failed: prefer the timeout that carries the most partial text
+        timeouts = [e for e in errors if isinstance(e, CompletionTimeout)]
+        if timeouts:
+            raise max(timeouts, key=lambda e: len(e.partial))
+        raise errors[0]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
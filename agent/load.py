@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Each signal is divided by its limit; the worker reports the most saturated one (1.0 = full)
+WORKER_MAX_ROOMS = int(os.getenv('WORKER_MAX_ROOMS', '8'))
+WORKER_MAX_PENDING_LLM = int(os.getenv('WORKER_MAX_PENDING_LLM', '16'))
+WORKER_MAX_EXECUTOR_BACKLOG = int(os.getenv('WORKER_MAX_EXECUTOR_BACKLOG', '32'))
+WORKER_MAX_LOOP_LAG = float(os.getenv('WORKER_MAX_LOOP_LAG', '0.5'))
+LOAD_REPORT_INTERVAL = float(os.getenv('LOAD_REPORT_INTERVAL', '1.0'))
+
+# Job processes share their signals with the main worker process through this directory
+_LOAD_DIR_ENV = 'WORKER_LOAD_DIR'
+
+
+def _load_dir() -> Optional[str]:
+    return os.environ.get(_LOAD_DIR_ENV)
+
+
+def worker_dir() -> Optional[str]:
+    """Directory shared by the main worker process and its job processes, once configured."""
+    return _load_dir()
+
+
+def configure_load_reporting() -> str:
+    """Call in the main worker process before run_app; job processes inherit the report directory."""
+    path = _load_dir() or os.path.join(tempfile.gettempdir(), f"voxa-load-{os.getpid()}")
+    # Private to this user: job processes also share warmed business contexts here
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    try:
+        os.chmod(path, 0o700)
+    except OSError as e:
+        logger.warning(f"Could not restrict permissions of {path}: {e}")
+    os.environ[_LOAD_DIR_ENV] = path
+    return path
+
+
+def _executor_backlog(loop: asyncio.AbstractEventLoop) -> int:
+    """Queued plus running work items on the loop's default executor (tools, search extraction, HTTP)."""
+    executor = getattr(loop, '_default_executor', None)
+    if executor is None:
+        return 0
+    try:
+        queued = executor._work_queue.qsize()
+        busy = len(executor._threads) - executor._idle_semaphore._value
+        return queued + max(0, busy)
+    except Exception:
+        return 0
+
+
+class JobLoadReporter:
+    """Samples this job process's load signals and publishes them for the worker's load_fnc.
+
+    Event-loop lag is measured as the overshoot of a periodic sleep; the snapshot is
+    written atomically to ``<WORKER_LOAD_DIR>/<pid>.json`` every ``interval`` seconds.
+    """
+
+    def __init__(self, interval: float = LOAD_REPORT_INTERVAL) -> None:
+        self.interval = interval
+        self.loop_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> Dict[str, float]:
+        from agent.admission import llm_admission
+        from agent.tasks import task_metrics
+        llm = llm_admission.snapshot()
+        return {
+            'pid': os.getpid(),
+            'at': time.time(),
+            'rooms': len(task_metrics()['rooms']),
+            'pending_llm': llm['in_flight'] + llm['queued'],
+            'executor_backlog': _executor_backlog(asyncio.get_event_loop()),
+            'loop_lag': round(self.loop_lag, 4),
+        }
+
+    def _publish(self, report: Dict[str, float]) -> None:
+        directory = _load_dir()
+        if not directory:
+            return
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f)
+        os.replace(tmp_path, path)
+
+    async def _run(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            overshoot = max(0.0, time.monotonic() - before - self.interval)
+            # Spikes decay over a few intervals instead of vanishing after one quiet sample
+            self.loop_lag = max(overshoot, self.loop_lag * 0.5)
+            try:
+                self._publish(self.sample())
+            except Exception as e:
+                logger.debug(f"Could not publish job load: {e}")
+
+    def start(self) -> None:
+        """Start reporting on the running loop (no-op if already running or reporting is not configured)."""
+        if not _load_dir() or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+
+job_load_reporter = JobLoadReporter()
+
+
+def _read_reports(max_age: float) -> List[dict]:
+    directory = _load_dir()
+    if not directory or not os.path.isdir(directory):
+        return []
+    reports = []
+    now = time.time()
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except Exception:
+            continue
+        if now - report.get('at', 0) > max_age:
+            # The job process exited or is stuck; a stuck one also shows up as loop lag until then
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        reports.append(report)
+    return reports
+
+
+def load_signals(worker=None) -> Dict[str, float]:
+    """Aggregate job process reports (and the worker's own job count) into raw load signals."""
+    reports = _read_reports(max_age=max(5.0, LOAD_REPORT_INTERVAL * 5))
+    rooms = sum(r.get('rooms', 0) for r in reports)
+    active_jobs = getattr(worker, 'active_jobs', None)
+    if active_jobs is not None:
+        rooms = max(rooms, len(active_jobs))
+    try:
+        cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        cpu = 0.0
+    return {
+        'rooms': rooms,
+        'pending_llm': sum(r.get('pending_llm', 0) for r in reports),
+        'executor_backlog': sum(r.get('executor_backlog', 0) for r in reports),
+        'loop_lag': max((r.get('loop_lag', 0.0) for r in reports), default=0.0),
+        'cpu': cpu,
+    }
+
+
+def worker_load(worker=None) -> float:
+    """WorkerOptions.load_fnc: 0.0 (idle) to 1.0 (saturated) from the agent's own signals."""
+    signals = load_signals(worker)
+    ratios = {
+        'rooms': signals['rooms'] / max(1, WORKER_MAX_ROOMS),
+        'pending_llm': signals['pending_llm'] / max(1, WORKER_MAX_PENDING_LLM),
+        'executor_backlog': signals['executor_backlog'] / max(1, WORKER_MAX_EXECUTOR_BACKLOG),
+        'loop_lag': signals['loop_lag'] / WORKER_MAX_LOOP_LAG if WORKER_MAX_LOOP_LAG > 0 else 0.0,
+        'cpu': signals['cpu'],
+    }
+    bottleneck = max(ratios, key=ratios.get)
+    load = min(1.0, ratios[bottleneck])
+    if load >= 0.75:
+        logger.debug(f"Worker load {load:.2f} (bottleneck: {bottleneck}): {signals}")
+    return load
@@ -0,0 +1,137 @@
+import os
+import re
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEEP_REASONING_ROUTER_ENABLED = os.getenv('DEEP_REASONING_ROUTER', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+# Tier name -> Mistral model. 'medium' is the default deep_reasoning model.
+MODEL_TIERS = {
+    'small': os.getenv('MISTRAL_SMALL_MODEL', 'mistral-small-latest'),
+    'medium': os.getenv('MISTRAL_MEDIUM_MODEL', 'mistral-medium'),
+}
+FALLBACK_TIER = 'medium'
+
+# Optional hedging: duplicate a request once it runs past the tier's observed p95 latency
+LLM_HEDGING_ENABLED = os.getenv('LLM_HEDGING', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+
+_COMPLEX_INTENT = re.compile(
+    r"\b(analy[sz]\w*|compar\w*|explain why|why does|why do|strateg\w*|plan\w*|summari[sz]\w*|pros and cons|"
+    r"evaluat\w*|forecast\w*|calculat\w*|step[- ]by[- ]step|reason\w*|recommend\w*|trend\w*|trade-?offs?|"
+    r"implication\w*|interpret\w*|breakdown|in detail|detailed)\b",
+    re.I,
+)
+_SEARCH_MARKERS = re.compile(r"(https?://|\"results\"|search results|extracted_content|according to)", re.I)
+_LOW_CONFIDENCE = re.compile(
+    r"\b(i'?m not sure|i am not sure|i don'?t know|i do not know|cannot determine|can'?t determine|"
+    r"unable to (answer|determine|help)|not enough information|insufficient information)\b",
+    re.I,
+)
+
+SMALL_MAX_WORDS = 40
+SMALL_MAX_HISTORY_CHARS = 4000
+MIN_CONFIDENT_CHARS = 20
+
+
+def query_features(query: str, history: Optional[List[dict]] = None) -> Dict[str, object]:
+    history = history or []
+    return {
+        'words': len(query.split()),
+        'has_search': bool(_SEARCH_MARKERS.search(query)),
+        'complex_intent': bool(_COMPLEX_INTENT.search(query)),
+        'history_chars': sum(len(str(m.get('content', ''))) for m in history[-10:]),
+    }
+
+
+def is_low_confidence(text: str) -> bool:
+    """Heuristic check that a small-model answer should be retried on the larger tier."""
+    if not text or len(text.strip()) < MIN_CONFIDENT_CHARS:
+        return True
+    return bool(_LOW_CONFIDENCE.search(text))
+
+
+class TierStats:
+    def __init__(self, window: int = 200) -> None:
+        self.calls = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, object]:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'fallbacks': self.fallbacks,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'p50_ms': round(p50 * 1000) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000) if p95 is not None else None,
+        }
+
+
+class ModelRouter:
+    """Chooses a model tier for deep_reasoning from cheap local features and tracks per-tier latency/tokens."""
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, TierStats] = {tier: TierStats() for tier in MODEL_TIERS}
+
+    def choose(self, query: str, history: Optional[List[dict]] = None) -> Tuple[str, str]:
+        """Return (tier, reason)."""
+        if not DEEP_REASONING_ROUTER_ENABLED:
+            return FALLBACK_TIER, 'router disabled'
+        f = query_features(query, history)
+        if f['has_search']:
+            return 'medium', 'search results'
+        if f['complex_intent']:
+            return 'medium', 'complex intent'
+        if f['words'] > SMALL_MAX_WORDS:
+            return 'medium', 'long query'
+        if f['history_chars'] > SMALL_MAX_HISTORY_CHARS:
+            return 'medium', 'large history'
+        return 'small', 'trivial query'
+
+    def model_for(self, tier: str) -> str:
+        return MODEL_TIERS.get(tier, MODEL_TIERS[FALLBACK_TIER])
+
+    def record(self, tier: str, latency: float, usage: Optional[dict] = None, ok: bool = True) -> None:
+        stats = self.stats.setdefault(tier, TierStats())
+        stats.calls += 1
+        if not ok:
+            stats.failures += 1
+            return
+        stats.latencies.append(latency)
+        if usage:
+            stats.prompt_tokens += usage.get('prompt_tokens', 0)
+            stats.completion_tokens += usage.get('completion_tokens', 0)
+
+    def hedge_delay(self, tier: str) -> Optional[float]:
+        """Observed p95 latency for the tier, or None when hedging is off or there are too few samples."""
+        if not LLM_HEDGING_ENABLED:
+            return None
+        stats = self.stats.get(tier)
+        if stats is None or len(stats.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return stats.percentile(0.95)
+
+    def record_fallback(self, tier: str) -> None:
+        self.stats.setdefault(tier, TierStats()).fallbacks += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {tier: stats.snapshot() for tier, stats in self.stats.items()}
+
+
+model_router = ModelRouter()
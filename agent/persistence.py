@@ -0,0 +1,179 @@
+import os
+import uuid
+import asyncio
+import logging
+import functools
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Write-behind tuning: a batch is sent when it reaches PERSIST_BATCH_SIZE messages
+# or PERSIST_FLUSH_INTERVAL seconds after its first message, whichever comes first.
+PERSIST_BATCH_SIZE = int(os.getenv('PERSIST_BATCH_SIZE', '20'))
+PERSIST_FLUSH_INTERVAL = float(os.getenv('PERSIST_FLUSH_INTERVAL', '2.0'))
+PERSIST_MAX_RETRIES = int(os.getenv('PERSIST_MAX_RETRIES', '4'))
+PERSIST_BACKOFF_BASE = 0.5
+
+
+def _conversation_target(email: str, user_role: str, business_id: Optional[str]) -> Optional[Tuple[str, Optional[str]]]:
+    """Return (bulk path, businessId param) for the conversation log of this user, or None."""
+    if user_role == 'customer' and business_id:
+        return (f"/api/crm/customers/email/{email}/conversations", business_id)
+    if user_role == 'general':
+        return (f"/api/general/users/email/{email}/conversations", None)
+    return None
+
+
+def _post_batch(path: str, business_id: Optional[str], entries: List[dict]) -> int:
+    """Blocking POST of a batch to the bulk endpoint; falls back to per-message posts on old backends.
+
+    Returns how many entries (from the start of ``entries``) were stored. Every entry
+    carries an ``entryId`` the backend dedupes on, so a batch re-sent after a timeout
+    that the backend did complete is not stored twice.
+    """
+    import requests as _req
+    backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
+    headers = {}
+    api_key = os.getenv('BACKEND_API_KEY', '')
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    params = {'businessId': business_id} if business_id else None
+
+    resp = _req.post(f"{backend_url}{path}/bulk", params=params, json={'entries': entries}, headers=headers, timeout=6)
+    if resp.status_code == 404:
+        # Backend without the bulk route - degrade to one request per entry
+        for stored, entry in enumerate(entries):
+            try:
+                single = _req.post(f"{backend_url}{path}", params=params, json=entry, headers=headers, timeout=6)
+            except _req.exceptions.RequestException as e:
+                logger.debug(f"Conversation entry post failed after {stored} stored: {e}")
+                return stored
+            if not single.ok:
+                return stored
+        return len(entries)
+    return len(entries) if resp.ok else 0
+
+
+class ConversationWriter:
+    """Per-room async write-behind queue that batches conversation messages to the backend."""
+
+    def __init__(self, room_name: str) -> None:
+        self.room_name = room_name
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def enqueue(self, email: str, user_role: str, business_id: Optional[str], role: str, content: str) -> bool:
+        """Queue a message for persistence without blocking. Returns False if it cannot be persisted."""
+        if self._closed:
+            return False
+        target = _conversation_target(email, user_role, business_id)
+        if target is None:
+            return False
+        entry = {
+            'role': role,
+            'content': content,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'entryId': uuid.uuid4().hex,
+        }
+        self._queue.put_nowait((target, entry))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return True
+
+    async def _run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + PERSIST_FLUSH_INTERVAL
+            stop = False
+            while len(batch) < PERSIST_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            await self._send(batch)
+            if stop:
+                return
+
+    async def _send(self, batch: List[tuple]) -> None:
+        # Group by destination so a batch maps to one request per conversation log
+        grouped: Dict[Tuple[str, Optional[str]], List[dict]] = {}
+        for target, entry in batch:
+            grouped.setdefault(target, []).append(entry)
+
+        loop = asyncio.get_event_loop()
+        for (path, business_id), entries in grouped.items():
+            for attempt in range(PERSIST_MAX_RETRIES):
+                try:
+                    stored = await loop.run_in_executor(None, functools.partial(_post_batch, path, business_id, entries))
+                    # Retry only what is still pending so stored entries are not posted twice
+                    entries = entries[stored:]
+                    if not entries:
+                        break
+                except Exception as e:
+                    logger.debug(f"Conversation batch post failed for room {self.room_name}: {e}")
+                if attempt < PERSIST_MAX_RETRIES - 1:
+                    await asyncio.sleep(PERSIST_BACKOFF_BASE * (2 ** attempt))
+            else:
+                logger.warning(f"Dropping {len(entries)} conversation message(s) for room {self.room_name} after {PERSIST_MAX_RETRIES} attempts")
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Flush everything queued so far and stop the writer."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out flushing conversation messages for room {self.room_name}")
+            self._task.cancel()
+        except Exception:
+            logger.debug(f"Conversation writer for room {self.room_name} ended with error", exc_info=True)
+
+
+_writers: Dict[str, ConversationWriter] = {}
+# Rooms whose writer is being flushed on release; writes arriving meanwhile are refused
+_released_rooms: Set[str] = set()
+
+
+def open_conversation_writer(room_name: str) -> None:
+    """Allow persistence for a room again (call when a job starts for it)."""
+    _released_rooms.discard(room_name)
+
+
+def get_conversation_writer(room_name: str) -> Optional[ConversationWriter]:
+    """The room's writer, or None while the room is being released."""
+    if room_name in _released_rooms:
+        return None
+    writer = _writers.get(room_name)
+    if writer is None or writer._closed:
+        writer = ConversationWriter(room_name)
+        _writers[room_name] = writer
+    return writer
+
+
+async def flush_conversation_writer(room_name: str, timeout: float = 10.0) -> None:
+    """Flush and drop the writer for a room (call on room disconnect)."""
+    _released_rooms.add(room_name)
+    writer = _writers.pop(room_name, None)
+    try:
+        if writer is not None:
+            await writer.close(timeout=timeout)
+    finally:
+        # Drained: forget the room so the set does not grow for the life of the worker
+        _released_rooms.discard(room_name)
@@ -0,0 +1,83 @@
+import time
+import logging
+import importlib
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Imported only to fill the module cache before the first job needs them
+_PLUGIN_MODULES = ('livekit.plugins.google', 'livekit.plugins.noise_cancellation')
+_TOOL_MODULES = ('tools', 'agent.assistant')
+
+
+def _import_all(names) -> bool:
+    for name in names:
+        importlib.import_module(name)
+    return True
+
+
+def _load_plugins():
+    return _import_all(_PLUGIN_MODULES)
+
+
+def _load_noise_cancellation():
+    from livekit.plugins import noise_cancellation
+    return noise_cancellation.BVC()
+
+
+def _load_mistral_client():
+    from agent.llm import get_mistral_client
+    return get_mistral_client()
+
+
+def _load_history_store():
+    from agent.history import get_history_store
+    return get_history_store()
+
+
+def _load_tools():
+    return _import_all(_TOOL_MODULES)
+
+
+def _warm_business_contexts():
+    from agent.business_cache import warm_business_contexts_sync
+    return warm_business_contexts_sync()
+
+
+# (userdata key, loader) in load order; a failing step is logged and left for the job to retry lazily
+PREWARM_STEPS = [
+    ('plugins', _load_plugins),
+    ('noise_cancellation', _load_noise_cancellation),
+    ('mistral_client', _load_mistral_client),
+    ('history_store', _load_history_store),
+    ('tools', _load_tools),
+    ('business_contexts', _warm_business_contexts),
+]
+
+
+def prewarm(proc) -> None:
+    """WorkerOptions.prewarm_fnc: load plugins, models and clients once per job process.
+
+    Loaded objects are stored in ``proc.userdata`` under their step name and the
+    per-step timings under ``proc.userdata['prewarm_report']``.
+    """
+    report: Dict[str, float] = {}
+    started = time.monotonic()
+    for key, loader in PREWARM_STEPS:
+        step_started = time.monotonic()
+        try:
+            proc.userdata[key] = loader()
+        except Exception as e:
+            logger.warning(f"Prewarm step '{key}' failed: {e}")
+        report[key] = round((time.monotonic() - step_started) * 1000, 1)
+    report['total'] = round((time.monotonic() - started) * 1000, 1)
+    proc.userdata['prewarm_report'] = report
+    logger.info(f"Job process prewarmed in {report['total']}ms: {report}")
+
+
+def prewarmed(proc, key: str, factory: Callable):
+    """Return the object prewarm stored under ``key``, or build it with ``factory``."""
+    userdata = getattr(proc, 'userdata', None)
+    if isinstance(userdata, dict) and userdata.get(key) is not None:
+        return userdata[key]
+    return factory()
@@ -0,0 +1,89 @@
+import os
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEEP_REASONING_CACHE_ENABLED = os.getenv('DEEP_REASONING_CACHE', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+DEEP_REASONING_CACHE_TTL = float(os.getenv('DEEP_REASONING_CACHE_TTL', '1800'))
+DEEP_REASONING_CACHE_SIZE = int(os.getenv('DEEP_REASONING_CACHE_SIZE', '512'))
+
+# Queries about the caller's own data must never be answered from another caller's cache entry
+_PERSONAL_PATTERNS = [
+    re.compile(r"\S+@\S+\.\S+"),
+    re.compile(r"\d[\d\s\-()]{6,}\d"),
+    re.compile(r"\b(my|our)\s+(order|account|ticket|booking|appointment|payment|subscription|invoice|address|refund|delivery|card|meeting|password)s?\b", re.I),
+]
+# Follow-up phrasing depends on the conversation, so recent history becomes part of the key
+_FOLLOW_UP = re.compile(r"\b(it|that|this|those|these|they|them|above|previous|earlier|same|again|else)\b", re.I)
+_FOLLOW_UP_HISTORY = 4
+
+
+def normalize_query(query: str) -> str:
+    text = re.sub(r"[^\w\s@.]", " ", query.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def is_personalized(query: str) -> bool:
+    return any(p.search(query) for p in _PERSONAL_PATTERNS)
+
+
+def make_cache_key(business_id: str, query: str, history: Optional[List[dict]] = None, mode: str = 'CUSTOMER') -> str:
+    """Key on business, instruction mode, normalized query (including any search results
+    it embeds) and, for follow-up questions, a digest of the last few history messages.
+
+    The mode keeps answers built from owner-only data out of customer sessions.
+    """
+    normalized = normalize_query(query)
+    context = ''
+    if history and _FOLLOW_UP.search(normalized):
+        context = '\n'.join(f"{m.get('role')}:{m.get('content')}" for m in history[-_FOLLOW_UP_HISTORY:])
+    context_digest = hashlib.md5(context.encode()).hexdigest() if context else '-'
+    query_digest = hashlib.md5(normalized.encode()).hexdigest()
+    return f"{business_id or '-'}:{mode or '-'}:{query_digest}:{context_digest}"
+
+
+class ReasoningCache:
+    """TTL + LRU bounded cache of deep_reasoning answers."""
+
+    def __init__(self, max_entries: int = DEEP_REASONING_CACHE_SIZE, ttl: float = DEEP_REASONING_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_business(self, business_id: str) -> None:
+        prefix = f"{business_id or '-'}:"
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+reasoning_cache = ReasoningCache()
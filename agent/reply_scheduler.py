@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Messages arriving within this quiet period are answered as one turn
+REPLY_DEBOUNCE_SECONDS = float(os.getenv('REPLY_DEBOUNCE_SECONDS', '0.6'))
+# Upper bound on how long a steady stream of messages can postpone the reply
+REPLY_MAX_DELAY_SECONDS = float(os.getenv('REPLY_MAX_DELAY_SECONDS', '2.0'))
+
+
+class ReplyScheduler:
+    """Serializes reply generation for one room.
+
+    Text submitted in quick succession is merged into a single turn, only one
+    generation runs at a time, and a generation that is still running when new
+    text arrives is cancelled (``interrupt`` stops its speech) and its input is
+    answered together with the new text.
+    """
+
+    def __init__(
+        self,
+        room_name: str,
+        generate: Callable[[str], Awaitable],
+        interrupt: Optional[Callable[[], None]] = None,
+        debounce: float = REPLY_DEBOUNCE_SECONDS,
+        max_delay: float = REPLY_MAX_DELAY_SECONDS,
+    ) -> None:
+        self.room_name = room_name
+        self.generate = generate
+        self.interrupt = interrupt
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending: List[str] = []
+        self._in_flight: List[str] = []
+        self._current: Optional[asyncio.Future] = None
+        self._wake = asyncio.Event()
+        self.submitted = 0
+        self.turns = 0
+        self.superseded = 0
+
+    @property
+    def busy(self) -> bool:
+        return self._current is not None and not self._current.done()
+
+    def submit(self, text: str) -> None:
+        """Queue user text; supersedes a generation that has not finished yet."""
+        if not text or not text.strip():
+            return
+        self.submitted += 1
+        self._pending.append(text.strip())
+        if self.busy:
+            self.superseded += 1
+            logger.info(f"New input in room {self.room_name} supersedes the reply in progress")
+            self._current.cancel()
+            if self.interrupt is not None:
+                try:
+                    self.interrupt()
+                except Exception as e:
+                    logger.debug(f"Could not interrupt superseded speech: {e}")
+        self._wake.set()
+
+    async def _settle(self) -> None:
+        """Wait until no new text has arrived for ``debounce`` seconds (at most ``max_delay``)."""
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            self._wake.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=min(self.debounce, remaining))
+            except asyncio.TimeoutError:
+                return
+
+    async def run(self) -> None:
+        """Scheduler loop; spawn once per room and cancel it when the room closes."""
+        try:
+            while True:
+                await self._wake.wait()
+                await self._settle()
+                if not self._pending:
+                    continue
+                self._in_flight, self._pending = self._pending, []
+                merged = '\n'.join(self._in_flight)
+                if len(self._in_flight) > 1:
+                    logger.info(f"Coalesced {len(self._in_flight)} messages into one turn in room {self.room_name}")
+                self.turns += 1
+                self._current = asyncio.ensure_future(self.generate(merged))
+                # asyncio.wait does not propagate the generation's cancellation into this loop
+                await asyncio.wait([self._current])
+                if self._current.cancelled():
+                    # Superseded: answer the cancelled input together with what replaced it
+                    self._pending = self._in_flight + self._pending
+                elif self._current.exception() is not None:
+                    logger.error(f"Reply generation failed in room {self.room_name}: {self._current.exception()}")
+                self._in_flight = []
+        finally:
+            if self.busy:
+                self._current.cancel()
+
+    def snapshot(self) -> dict:
+        return {
+            'submitted': self.submitted,
+            'turns': self.turns,
+            'superseded': self.superseded,
+            'pending': len(self._pending),
+            'busy': self.busy,
+        }
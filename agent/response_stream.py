@@ -0,0 +1,76 @@
+import time
+import uuid
+import logging
+from typing import Optional
+
+from agent.data_channel import MSG_AGENT_RESPONSE, publish_message
+
+logger = logging.getLogger(__name__)
+
+# Deltas are coalesced so a token stream does not become one packet per token;
+# the first chunk is always sent immediately to keep time-to-first-text low.
+STREAM_MIN_CHARS = 48
+STREAM_MAX_DELAY = 0.08
+
+
+class ResponseStream:
+    """One incremental agent_response message: numbered chunk frames followed by a final frame.
+
+    Frames: {'type': 'agent_response', 'streamId', 'seq', 'text', 'final'}. Chunk frames carry
+    only the new text; the final frame carries the complete text so late joiners and
+    clients that dropped a chunk still end up with the full answer.
+    """
+
+    def __init__(self, room) -> None:
+        self.room = room
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self._buffer = ''
+        self._last_sent = 0.0
+        self._published = False
+        self._finished = False
+
+    async def _publish(self, text: str, final: bool) -> None:
+        message = {
+            'type': MSG_AGENT_RESPONSE,
+            'streamId': self.stream_id,
+            'seq': self.seq,
+            'text': text,
+            'final': final,
+        }
+        self.seq += 1
+        try:
+            if await publish_message(self.room, message):
+                self._published = True
+        except Exception as e:
+            logger.debug(f"Failed to publish agent_response frame: {e}")
+
+    async def push(self, delta: str) -> None:
+        if self._finished or not delta:
+            return
+        self._buffer += delta
+        now = time.monotonic()
+        if not self._published or len(self._buffer) >= STREAM_MIN_CHARS or now - self._last_sent >= STREAM_MAX_DELAY:
+            chunk, self._buffer = self._buffer, ''
+            self._last_sent = now
+            await self._publish(chunk, final=False)
+
+    async def finish(self, text: str) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        if not text and not self._published:
+            return
+        await self._publish(text, final=True)
+
+
+class ResponseStreamPublisher:
+    """Opens ResponseStreams on a room's data channel."""
+
+    def __init__(self, room) -> None:
+        self.room = room
+
+    def open(self) -> Optional[ResponseStream]:
+        if getattr(self.room, 'local_participant', None) is None:
+            return None
+        return ResponseStream(self.room)
@@ -1,9 +1,14 @@
 import logging
-from livekit.agents import AgentSession
+from typing import TYPE_CHECKING
+
+from agent.data_channel import MSG_AGENT_ERROR, publish_message
+
+if TYPE_CHECKING:
+    from livekit.agents import AgentSession
 
 logger = logging.getLogger(__name__)
 
-async def safe_generate_reply(session: AgentSession, ctx, instructions: str, timeout: float = 30.0, publish_back: bool = True) -> bool:
+async def safe_generate_reply(session: 'AgentSession', ctx, instructions: str, timeout: float = 30.0, publish_back: bool = True) -> bool:
     """Robust wrapper around session.generate_reply with timeout and UX data-channel errors."""
     try:
         import asyncio as _asyncio
@@ -15,9 +20,7 @@ async def safe_generate_reply(session: AgentSession, ctx, instructions: str, tim
             try:
                 if publish_back and hasattr(ctx, 'room') and getattr(ctx.room, 'local_participant', None):
                     try:
-                        import json as _json
-                        payload = _json.dumps({'type': 'agent_error', 'message': 'Reply generation timed out. Please try again.'})
-                        await ctx.room.local_participant.publish_data(payload.encode('utf-8'), reliable=True)
+                        await publish_message(ctx.room, {'type': MSG_AGENT_ERROR, 'message': 'Reply generation timed out. Please try again.'})
                     except Exception:
                         pass
             except Exception:
@@ -29,9 +32,7 @@ async def safe_generate_reply(session: AgentSession, ctx, instructions: str, tim
             try:
                 if publish_back and hasattr(ctx, 'room') and getattr(ctx.room, 'local_participant', None):
                     try:
-                        import json as _json
-                        payload = _json.dumps({'type': 'agent_error', 'message': 'Agent failed to generate reply. Please try again later.'})
-                        await ctx.room.local_participant.publish_data(payload.encode('utf-8'), reliable=True)
+                        await publish_message(ctx.room, {'type': MSG_AGENT_ERROR, 'message': 'Agent failed to generate reply. Please try again later.'})
                     except Exception:
                         pass
             except Exception:
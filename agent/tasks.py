@@ -0,0 +1,129 @@
+import os
+import asyncio
+import logging
+from typing import Coroutine, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Tasks running at once per room; further tasks wait for a slot
+ROOM_MAX_CONCURRENT_TASKS = int(os.getenv('ROOM_MAX_CONCURRENT_TASKS', '8'))
+# Tasks allowed to wait for a slot; beyond this new work is dropped
+ROOM_MAX_PENDING_TASKS = int(os.getenv('ROOM_MAX_PENDING_TASKS', '64'))
+
+
+class RoomTaskSupervisor:
+    """Owns every background task spawned for one room.
+
+    Tasks run under a per-room concurrency limit, their exceptions are logged instead
+    of being lost, and cancel_all() cancels whatever is still running when the room
+    goes away. Long-lived room loops (and work awaited by a task that already holds a
+    slot) are spawned with ``limit=False`` so they never occupy a slot.
+    """
+
+    def __init__(
+        self,
+        room_name: str,
+        max_concurrent: int = ROOM_MAX_CONCURRENT_TASKS,
+        max_pending: int = ROOM_MAX_PENDING_TASKS,
+    ) -> None:
+        self.room_name = room_name
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max(1, max_concurrent))
+        self._tasks: Set[asyncio.Task] = set()
+        self._closed = False
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.dropped = 0
+
+    @property
+    def live(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine, name: str = 'task', limit: bool = True) -> Optional[asyncio.Task]:
+        """Schedule ``coro`` for this room; returns None (and closes the coroutine) if it was dropped.
+
+        With ``limit=False`` the task is still tracked and cancelled with the room but
+        does not wait for or hold a concurrency slot.
+        """
+        if self._closed or len(self._tasks) >= self.max_pending:
+            self.dropped += 1
+            coro.close()
+            if not self._closed:
+                logger.warning(f"Dropping '{name}' task for room {self.room_name}: {len(self._tasks)} tasks pending")
+            return None
+        task = asyncio.ensure_future(self._run(coro) if limit else self._run_unlimited(coro))
+        try:
+            task.set_name(f"{self.room_name}:{name}")
+        except Exception:
+            pass
+        self._tasks.add(task)
+        self.started += 1
+        task.add_done_callback(self._on_done)
+        # A task cancelled before it started never ran ``coro``; closing it avoids 'never awaited' warnings
+        task.add_done_callback(lambda _task: coro.close())
+        return task
+
+    async def _run(self, coro: Coroutine):
+        async with self._slots:
+            return await coro
+
+    async def _run_unlimited(self, coro: Coroutine):
+        return await coro
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            self.cancelled += 1
+            return
+        error = task.exception()
+        if error is not None:
+            self.failed += 1
+            logger.error(f"Background task {task.get_name()} failed: {error}", exc_info=error)
+        else:
+            self.completed += 1
+
+    async def cancel_all(self, timeout: float = 5.0) -> None:
+        """Stop accepting work and cancel every task still running for the room."""
+        self._closed = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        logger.debug(f"Task supervisor for room {self.room_name} closed: {self.snapshot()}")
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            'live': self.live,
+            'started': self.started,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'dropped': self.dropped,
+        }
+
+
+_supervisors: Dict[str, RoomTaskSupervisor] = {}
+
+
+def get_room_supervisor(room_name: str) -> RoomTaskSupervisor:
+    supervisor = _supervisors.get(room_name)
+    if supervisor is None or supervisor._closed:
+        supervisor = RoomTaskSupervisor(room_name)
+        _supervisors[room_name] = supervisor
+    return supervisor
+
+
+async def close_room_supervisor(room_name: str, timeout: float = 5.0) -> None:
+    """Cancel and drop the supervisor for a room (call on room disconnect)."""
+    supervisor = _supervisors.pop(room_name, None)
+    if supervisor is not None:
+        await supervisor.cancel_all(timeout=timeout)
+
+
+def task_metrics() -> Dict[str, object]:
+    """Live background task counts per room and in total for this worker process."""
+    rooms = {name: s.snapshot() for name, s in _supervisors.items()}
+    return {'rooms': rooms, 'live_total': sum(r['live'] for r in rooms.values())}
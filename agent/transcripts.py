@@ -0,0 +1,106 @@
+import os
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Final segments arriving within this gap of each other belong to the same spoken turn
+TRANSCRIPT_TURN_GAP = float(os.getenv('TRANSCRIPT_TURN_GAP', '1.5'))
+# Segment ids remembered to ignore re-sent finals
+_SEEN_SEGMENT_LIMIT = 512
+
+
+def _segment_key(segment) -> Tuple[str, str, bool]:
+    """(id, text, final) for a transcription segment; segments without an id are keyed by text."""
+    text = (getattr(segment, 'text', '') or '').strip()
+    seg_id = getattr(segment, 'id', None) or hashlib.sha1(text.encode('utf-8')).hexdigest()
+    # Events that do not report finality (plain text events) are treated as final
+    final = bool(getattr(segment, 'final', True))
+    return str(seg_id), text, final
+
+
+class TranscriptCoalescer:
+    """Turns the agent's transcription events into one persisted message per turn.
+
+    Interim segments are ignored; each finalized segment id is taken once, and the
+    finals of a turn are joined and handed to ``persist`` when the agent stops
+    speaking (end_turn) or no new final arrives for ``turn_gap`` seconds.
+    """
+
+    def __init__(
+        self,
+        room_name: str,
+        persist: Callable[[str], Awaitable],
+        spawn: Callable[[Awaitable, str], object],
+        turn_gap: float = TRANSCRIPT_TURN_GAP,
+    ) -> None:
+        self.room_name = room_name
+        self.persist = persist
+        self.spawn = spawn
+        self.turn_gap = turn_gap
+        self._turn: List[str] = []
+        self._seen: Set[str] = set()
+        self._seen_order: Deque[str] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.segments = 0
+        self.interim_skipped = 0
+        self.turns = 0
+
+    def _remember(self, seg_id: str) -> None:
+        self._seen.add(seg_id)
+        self._seen_order.append(seg_id)
+        if len(self._seen_order) > _SEEN_SEGMENT_LIMIT:
+            self._seen.discard(self._seen_order.popleft())
+
+    def add_segments(self, segments) -> None:
+        """Feed the segments of one transcription event."""
+        added = False
+        for segment in segments:
+            self.segments += 1
+            seg_id, text, final = _segment_key(segment)
+            if not final:
+                self.interim_skipped += 1
+                continue
+            if not text or seg_id in self._seen:
+                continue
+            self._remember(seg_id)
+            self._turn.append(text)
+            added = True
+        if added:
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_event_loop().call_later(self.turn_gap, self.end_turn)
+
+    def _take_turn(self) -> str:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        text, self._turn = ' '.join(self._turn), []
+        return text
+
+    def end_turn(self) -> None:
+        """Persist the finals collected so far as one message."""
+        text = self._take_turn()
+        if text:
+            self.turns += 1
+            self.spawn(self.persist(text), 'persist_assistant')
+
+    async def close(self) -> None:
+        """Persist an unfinished turn directly (the room's task supervisor may already be closing)."""
+        text = self._take_turn()
+        if text:
+            self.turns += 1
+            try:
+                await self.persist(text)
+            except Exception as e:
+                logger.debug(f"Could not persist final transcript for room {self.room_name}: {e}")
+        logger.debug(
+            f"Transcripts for room {self.room_name}: {self.turns} turns from {self.segments} segments "
+            f"({self.interim_skipped} interim skipped)"
+        )
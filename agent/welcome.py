@@ -0,0 +1,89 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Greet anyway if neither role_context nor a participant shows up within this many seconds
+WELCOME_FALLBACK_SECONDS = float(os.getenv('WELCOME_FALLBACK_SECONDS', '3'))
+# After a participant joins, how long role_context may still take to arrive and pick the greeting
+WELCOME_ROLE_CONTEXT_GRACE = float(os.getenv('WELCOME_ROLE_CONTEXT_GRACE', '0.3'))
+
+TRIGGER_ROLE_CONTEXT = 'role_context'
+TRIGGER_PARTICIPANT = 'participant'
+TRIGGER_FALLBACK = 'fallback'
+
+
+def has_remote_participants(room) -> bool:
+    try:
+        remote_parts = getattr(room, 'remote_participants', {})
+        return isinstance(remote_parts, dict) and len(remote_parts) > 0
+    except Exception:
+        return False
+
+
+class WelcomeGate:
+    """Decides when a session greets: on role_context, a participant join, or a fallback timer.
+
+    Also records time-to-first-audio (job start -> agent first speaking) for the session.
+    """
+
+    def __init__(self, room_name: str) -> None:
+        self.room_name = room_name
+        self.started = time.monotonic()
+        self.reason: Optional[str] = None
+        self.triggered_at: Optional[float] = None
+        self.first_audio_at: Optional[float] = None
+        self._participant = asyncio.Event()
+        self._role_context = asyncio.Event()
+
+    def trigger(self, reason: str) -> None:
+        if reason == TRIGGER_ROLE_CONTEXT:
+            self._role_context.set()
+        elif reason == TRIGGER_PARTICIPANT:
+            self._participant.set()
+
+    async def wait(self, fallback: float = WELCOME_FALLBACK_SECONDS, grace: float = WELCOME_ROLE_CONTEXT_GRACE) -> str:
+        """Wait for the first trigger and return its reason."""
+        waiters = [asyncio.ensure_future(self._role_context.wait()), asyncio.ensure_future(self._participant.wait())]
+        try:
+            await asyncio.wait(waiters, timeout=fallback, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        if self._role_context.is_set():
+            reason = TRIGGER_ROLE_CONTEXT
+        elif self._participant.is_set():
+            # role_context normally follows a join within a few hundred ms; it picks the right greeting
+            try:
+                await asyncio.wait_for(self._role_context.wait(), timeout=grace)
+                reason = TRIGGER_ROLE_CONTEXT
+            except asyncio.TimeoutError:
+                reason = TRIGGER_PARTICIPANT
+        else:
+            reason = TRIGGER_FALLBACK
+        self.reason = reason
+        self.triggered_at = time.monotonic()
+        logger.info(f"Welcome triggered by {reason} after {(self.triggered_at - self.started) * 1000:.0f}ms in room {self.room_name}")
+        return reason
+
+    def attach_first_audio(self, session) -> None:
+        """Log time-to-first-audio the first time the agent starts speaking in this session."""
+        def _on_state(event) -> None:
+            if self.first_audio_at is not None or getattr(event, 'new_state', None) != 'speaking':
+                return
+            self.first_audio_at = time.monotonic()
+            since_trigger = ''
+            if self.triggered_at is not None:
+                since_trigger = f", {(self.first_audio_at - self.triggered_at) * 1000:.0f}ms after {self.reason} trigger"
+            logger.info(
+                f"Time to first audio in room {self.room_name}: "
+                f"{(self.first_audio_at - self.started) * 1000:.0f}ms since job start{since_trigger}"
+            )
+
+        try:
+            session.on('agent_state_changed', _on_state)
+        except Exception as e:
+            logger.debug(f"Could not attach first-audio listener: {e}")
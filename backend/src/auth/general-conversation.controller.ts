@@ -28,15 +28,20 @@ export class GeneralConversationController {
   @Post('email/:email/conversations')
   async appendByEmail(
     @Param('email') email: string,
-    @Body() body: { role: 'user' | 'assistant'; content: string; timestamp?: string | Date },
+    @Body() body: { role: 'user' | 'assistant'; content: string; timestamp?: string | Date; entryId?: string },
   ) {
     const user = await this.generalModel.findOne({ email: String(email).trim().toLowerCase() });
     if (!user) return {};
+    if (body.entryId && (user.conversationHistory || []).some((c: any) => c.entryId === body.entryId)) {
+      // Retry of an entry that was already stored
+      return user;
+    }
     const entry = {
       timestamp: body.timestamp ? new Date(body.timestamp) : new Date(),
       role: body.role,
       content: body.content,
     } as any;
+    if (body.entryId) entry.entryId = String(body.entryId);
     const updated = await this.generalModel.findByIdAndUpdate(
       user._id,
       { $push: { conversationHistory: entry }, $set: { lastInteraction: new Date() } },
@@ -44,6 +49,30 @@ export class GeneralConversationController {
     );
     return updated || {};
   }
-}
-
 
+  @Post('email/:email/conversations/bulk')
+  async appendByEmailBulk(
+    @Param('email') email: string,
+    @Body() body: { entries: { role: 'user' | 'assistant'; content: string; timestamp?: string | Date; entryId?: string }[] },
+  ) {
+    if (!body || !Array.isArray(body.entries)) return { error: 'entries array is required' };
+    const user = await this.generalModel.findOne({ email: String(email).trim().toLowerCase() });
+    if (!user) return {};
+    // Entries whose entryId is already stored come from a retried batch and are skipped
+    const storedIds = new Set((user.conversationHistory || []).map((c: any) => c.entryId).filter(Boolean));
+    const entries = body.entries
+      .filter((e) => e && e.role && e.content && !(e.entryId && storedIds.has(e.entryId)))
+      .map((e) => ({
+        timestamp: e.timestamp ? new Date(e.timestamp) : new Date(),
+        role: e.role,
+        content: e.content,
+        ...(e.entryId ? { entryId: String(e.entryId) } : {}),
+      })) as any[];
+    if (!entries.length) return { appended: 0 };
+    await this.generalModel.updateOne(
+      { _id: user._id },
+      { $push: { conversationHistory: { $each: entries } }, $set: { lastInteraction: new Date() } },
+    );
+    return { appended: entries.length };
+  }
+}
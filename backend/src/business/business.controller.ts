@@ -1,14 +1,18 @@
-import { Body, Controller, Get, Param, Put, Req } from '@nestjs/common';
+import { Body, Controller, Get, Param, Put, Query, Req } from '@nestjs/common';
 import { UpdateBusinessDto } from '../dto/business.dto';
 import { ApiTags } from '@nestjs/swagger';
 import { InjectModel } from '@nestjs/mongoose';
 import { Model, Types } from 'mongoose';
 import { Business, BusinessDocument } from '../schemas/business.schema';
+import { Customer, CustomerDocument } from '../schemas/customer.schema';
 
 @ApiTags('Business')
 @Controller('api/business')
 export class BusinessController {
-  constructor(@InjectModel(Business.name) private businessModel: Model<BusinessDocument>) {}
+  constructor(
+    @InjectModel(Business.name) private businessModel: Model<BusinessDocument>,
+    @InjectModel(Customer.name) private customerModel: Model<CustomerDocument>,
+  ) {}
 
   @Get('by-slug/:slug')
   async getBySlug(@Param('slug') slug: string) {
@@ -51,6 +55,31 @@ export class BusinessController {
     return { businessId: String(biz._id), name: biz.name };
   }
 
+  // Most active businesses (by recently interacting customers), used by agent workers to warm caches
+  @Get('top')
+  async getTopBusinesses(@Query('limit') limit?: string, @Query('days') days?: string) {
+    const n = Math.min(Math.max(parseInt(limit || '20', 10) || 20, 1), 100);
+    const since = new Date(Date.now() - (parseInt(days || '7', 10) || 7) * 24 * 60 * 60 * 1000);
+    const active = await this.customerModel.aggregate([
+      { $match: { lastInteraction: { $gte: since } } },
+      { $group: { _id: '$businessId', customers: { $sum: 1 } } },
+      { $sort: { customers: -1 } },
+      { $limit: n },
+    ]);
+    const results = active.map((a) => ({ businessId: String(a._id), activeCustomers: a.customers }));
+    if (results.length < n) {
+      // Fill up with the most recently updated businesses
+      const seen = new Set(results.map((r) => r.businessId));
+      const recent = await this.businessModel.find({}, { _id: 1 }).sort({ updatedAt: -1 }).limit(n).lean();
+      for (const biz of recent) {
+        const id = String(biz._id);
+        if (results.length >= n) break;
+        if (!seen.has(id)) results.push({ businessId: id, activeCustomers: 0 });
+      }
+    }
+    return results;
+  }
+
   @Get('context/:businessId')
   async getContext(@Param('businessId') businessId: string) {
     const _id = new Types.ObjectId(businessId);
@@ -1,10 +1,16 @@
 import { Module } from '@nestjs/common';
 import { MongooseModule } from '@nestjs/mongoose';
 import { Business, BusinessSchema } from '../schemas/business.schema';
+import { Customer, CustomerSchema } from '../schemas/customer.schema';
 import { BusinessController } from './business.controller';
 
 @Module({
-  imports: [MongooseModule.forFeature([{ name: Business.name, schema: BusinessSchema }])],
+  imports: [
+    MongooseModule.forFeature([
+      { name: Business.name, schema: BusinessSchema },
+      { name: Customer.name, schema: CustomerSchema },
+    ]),
+  ],
   controllers: [BusinessController],
 })
 export class BusinessModule {}
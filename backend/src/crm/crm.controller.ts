@@ -108,12 +108,17 @@ export class CrmController {
     if (businessId) filter.businessId = new Types.ObjectId(businessId);
     const customer = await this.customerModel.findOne(filter);
     if (!customer) return {};
+    if (body.entryId && (customer.conversationHistory || []).some((c: any) => c.entryId === body.entryId)) {
+      // Retry of an entry that was already stored
+      return customer;
+    }
 
     const conv = {
       timestamp: body.timestamp ? new Date(body.timestamp) : new Date(),
       query: body.role === 'user' ? body.content : '',
       response: body.role === 'assistant' ? body.content : '',
     } as any;
+    if (body.entryId) conv.entryId = String(body.entryId);
 
     const updated = await this.customerModel.findByIdAndUpdate(
       customer._id,
@@ -123,6 +128,41 @@ export class CrmController {
     return updated;
   }
 
+  // Append a batch of conversation entries by email (+ optional businessId) in one update
+  @Post('email/:email/conversations/bulk')
+  async appendConversationsByEmailBulk(
+    @Param('email') email: string,
+    @Body() body: { entries?: { role?: 'user' | 'assistant'; content?: string; timestamp?: string | Date; entryId?: string }[] },
+    @Query('businessId') businessId?: string,
+  ) {
+    if (!body || !Array.isArray(body.entries)) {
+      return { error: 'Invalid request body: entries array is required', received: body };
+    }
+
+    const filter: any = { email: String(email).trim().toLowerCase() };
+    if (businessId) filter.businessId = new Types.ObjectId(businessId);
+    const customer = await this.customerModel.findOne(filter);
+    if (!customer) return {};
+
+    // Entries whose entryId is already stored come from a retried batch and are skipped
+    const storedIds = new Set((customer.conversationHistory || []).map((c: any) => c.entryId).filter(Boolean));
+    const convs = body.entries
+      .filter((e) => e && e.role && e.content && !(e.entryId && storedIds.has(e.entryId)))
+      .map((e) => ({
+        timestamp: e.timestamp ? new Date(e.timestamp) : new Date(),
+        query: e.role === 'user' ? e.content : '',
+        response: e.role === 'assistant' ? e.content : '',
+        ...(e.entryId ? { entryId: String(e.entryId) } : {}),
+      })) as any[];
+    if (!convs.length) return { appended: 0 };
+
+    await this.customerModel.updateOne(
+      { _id: customer._id },
+      { $push: { conversationHistory: { $each: convs } }, $set: { lastInteraction: new Date() } },
+    );
+    return { appended: convs.length };
+  }
+
   @Get()
   async list(@Query('businessId') businessId: string) {
     const filter: any = {};
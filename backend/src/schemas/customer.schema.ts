@@ -13,6 +13,10 @@ export class ConversationEntry {
 
   @Prop({ required: true })
   response: string;
+
+  // Client idempotency key; retried posts carrying a stored entryId are skipped
+  @Prop()
+  entryId?: string;
 }
 
 const ConversationEntrySchema = SchemaFactory.createForClass(ConversationEntry);
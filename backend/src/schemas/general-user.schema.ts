@@ -13,6 +13,10 @@ export class GeneralConversationEntry {
 
   @Prop({ required: true })
   content: string;
+
+  // Client idempotency key; retried posts carrying a stored entryId are skipped
+  @Prop()
+  entryId?: string;
 }
 
 const GeneralConversationEntrySchema = SchemaFactory.createForClass(GeneralConversationEntry);
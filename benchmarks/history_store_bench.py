@@ -0,0 +1,144 @@
+"""Append/read latency benchmark for the history stores in agent/history_store.py.
+
+Usage:
+    python benchmarks/history_store_bench.py
+    python benchmarks/history_store_bench.py --backends memory,sqlite --rooms 1,100,1000 --ops 20
+
+Sizes of a full room history under each stored encoding are printed first.
+Each simulated room appends ``--ops`` messages the way agent.history.update_history
+does (append, trim to HISTORY_LIMIT, save the whole list) and then reads its history
+back ``--ops`` times. All rooms run concurrently on one event loop, as they would on a
+single worker. The redis backend needs REDIS_URL to point at a reachable server.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.history import HISTORY_LIMIT
+from agent.history_store import (
+    MemoryHistoryStore,
+    RedisHistoryStore,
+    SQLiteHistoryStore,
+    encode_history,
+)
+
+# Varied conversation text; repeating one message would let zstd overstate the savings
+MESSAGES = [
+    "Hi, I'd like to know your opening hours this weekend.",
+    "We're open Saturday 9am to 5pm and closed on Sunday. Anything else I can help with?",
+    "Could you tell me whether the premium plan includes priority support?",
+    "Yes, premium includes priority support with a four-hour response time on business days.",
+    "How much does it cost per month if I pay annually?",
+    "Billed annually, premium works out to $49 per month, saving about 18% compared to monthly billing.",
+    "My order #48213 arrived with a cracked screen, what should I do?",
+    "I'm sorry to hear that. I've opened ticket T-1932 and you'll get a prepaid return label by email within the hour.",
+    "Can I book a demo for Thursday afternoon with someone from sales?",
+    "Thursday at 3:30pm is available with Priya from our sales team; shall I confirm it?",
+    "Please do, and send the invite to jordan.lee@example.com.",
+    "Done! The invite is on its way. Is there anything you'd like Priya to prepare for the call?",
+    "Do you ship to Canada, and how long does delivery usually take?",
+    "We ship to Canada in 5-8 business days; duties are calculated at checkout.",
+    "What's the difference between the starter and growth tiers?",
+    "Growth adds CRM integrations, analytics dashboards and up to ten team seats; starter covers one seat.",
+    "Is there a discount for nonprofits?",
+    "Registered nonprofits get 30% off any plan after verification.",
+    "Thanks, that's all for now.",
+    "You're welcome! Have a great day.",
+]
+
+
+def _make_store(backend: str, tmpdir: str, max_rooms: int):
+    if backend == 'memory':
+        return MemoryHistoryStore(max_rooms=max_rooms)
+    if backend == 'sqlite':
+        return SQLiteHistoryStore(os.path.join(tmpdir, 'history_bench.db'))
+    if backend == 'redis':
+        return RedisHistoryStore()
+    raise ValueError(f"unknown backend {backend}")
+
+
+async def _room(store, room_name: str, ops: int, append_lat: list, read_lat: list) -> None:
+    hist = []
+    for i in range(ops):
+        hist.append({"role": "user" if i % 2 == 0 else "assistant", "content": MESSAGES[i % len(MESSAGES)]})
+        if len(hist) > HISTORY_LIMIT:
+            hist.pop(0)
+        t0 = time.perf_counter()
+        await store.save(room_name, hist)
+        append_lat.append(time.perf_counter() - t0)
+    for _ in range(ops):
+        t0 = time.perf_counter()
+        await store.load(room_name)
+        read_lat.append(time.perf_counter() - t0)
+
+
+def _fmt(lat: list) -> str:
+    lat = sorted(lat)
+    p = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000
+    return f"p50={p(0.50):7.3f}ms p95={p(0.95):7.3f}ms p99={p(0.99):7.3f}ms mean={statistics.mean(lat) * 1000:7.3f}ms"
+
+
+def report_encoding_sizes() -> None:
+    """Print the stored size of a full room history and of the whole sample per encoding."""
+    for count in sorted({HISTORY_LIMIT, len(MESSAGES)}):
+        hist = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": MESSAGES[i % len(MESSAGES)]}
+            for i in range(count)
+        ]
+        sizes = {encoding: len(encode_history(hist, encoding)) for encoding in ('json', 'msgpack')}
+        for encoding, size in sizes.items():
+            print(f"encoding {encoding:7s}: {size:6d} bytes for {count} messages ({size / sizes['json']:.0%} of json)")
+
+
+async def run(backends, room_counts, ops) -> None:
+    report_encoding_sizes()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for backend in backends:
+            for rooms in room_counts:
+                try:
+                    store = _make_store(backend, tmpdir, max_rooms=max(room_counts))
+                except Exception as e:
+                    print(f"{backend:7s} unavailable: {e}")
+                    break
+                append_lat, read_lat = [], []
+                prefix = f"bench-{backend}-{rooms}-"
+                t0 = time.perf_counter()
+                try:
+                    await asyncio.gather(*[
+                        _room(store, f"{prefix}{r}", ops, append_lat, read_lat) for r in range(rooms)
+                    ])
+                except Exception as e:
+                    print(f"{backend:7s} rooms={rooms:5d} failed: {e}")
+                    await store.close()
+                    break
+                wall = time.perf_counter() - t0
+                total_ops = len(append_lat) + len(read_lat)
+                print(f"{backend:7s} rooms={rooms:5d} append {_fmt(append_lat)}")
+                print(f"{backend:7s} rooms={rooms:5d} read   {_fmt(read_lat)}  ({total_ops / wall:,.0f} ops/s)")
+                for r in range(rooms):
+                    await store.delete(f"{prefix}{r}")
+                await store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default='memory,sqlite,redis')
+    parser.add_argument('--rooms', default='1,100,1000')
+    parser.add_argument('--ops', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(
+        [b.strip() for b in args.backends.split(',') if b.strip()],
+        [int(r) for r in args.rooms.split(',') if r.strip()],
+        args.ops,
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Import-time benchmark for the agent and tools packages, checked against import_budget.json.
+
+Usage:
+    python benchmarks/import_time_bench.py
+    python benchmarks/import_time_bench.py --targets tools --runs 5
+
+Each target is imported in a fresh interpreter under ``python -X importtime``.
+For every target the script reports the total cumulative import time, the self
+time spent in this repo's own modules (``own_packages`` in the budget file) and
+the slowest imported modules. It exits non-zero when the median own-module time
+exceeds the target's ``own_ms`` budget or a ``forbidden`` heavy dependency is
+imported eagerly; those must be loaded lazily on first use.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_budget.json')
+
+
+def _import_times(target: str):
+    """Return {module: (self_us, cumulative_us)} for a fresh ``import target``."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{proc.stderr[-2000:]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return times
+
+
+def _is_own(module: str, packages) -> bool:
+    return any(module == p or module.startswith(p + '.') for p in packages)
+
+
+def measure(target: str, packages, runs: int):
+    own, total, last = [], [], {}
+    for _ in range(runs):
+        last = _import_times(target)
+        own.append(sum(s for m, (s, _) in last.items() if _is_own(m, packages)) / 1000)
+        total.append(last.get(target, (0, 0))[1] / 1000)
+    return statistics.median(own), statistics.median(total), last
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', default=BUDGET_PATH)
+    parser.add_argument('--targets', default='', help='comma-separated subset of the budget targets')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8)
+    args = parser.parse_args()
+
+    with open(args.budget) as f:
+        budget = json.load(f)
+    packages = budget.get('own_packages', [])
+    targets = budget['targets']
+    if args.targets:
+        targets = {t: targets.get(t, {}) for t in args.targets.split(',')}
+
+    failures = []
+    for target, limits in targets.items():
+        own_ms, total_ms, times = measure(target, packages, args.runs)
+        # A module counts as imported eagerly if it or any of its submodules shows up
+        eager = [m for m in limits.get('forbidden', []) if any(n == m or n.startswith(m + '.') for n in times)]
+        print(f"{target}: total {total_ms:.1f}ms, own modules {own_ms:.1f}ms (budget {limits.get('own_ms', '-')}ms)")
+        slowest = sorted(times.items(), key=lambda kv: kv[1][0], reverse=True)[:args.top]
+        for name, (self_us, _) in slowest:
+            print(f"    {self_us / 1000:8.1f}ms  {name}")
+        if 'own_ms' in limits and own_ms > limits['own_ms']:
+            failures.append(f"{target}: own modules took {own_ms:.1f}ms > {limits['own_ms']}ms")
+        if eager:
+            failures.append(f"{target}: eagerly imports {', '.join(eager)}")
+
+    if failures:
+        print('\nImport budget exceeded:')
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print('\nImport budget OK')
+
+
+if __name__ == '__main__':
+    main()
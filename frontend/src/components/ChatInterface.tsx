@@ -42,7 +42,21 @@ const ChatInterface = ({ mode, businessName, onSend, onStartVoice }: ChatInterfa
   // Listen for agent messages from LiveKit
   useEffect(() => {
     const handleAgentMessage = (event: CustomEvent) => {
-      const text = event.detail;
+      const detail = event.detail;
+      // Streamed replies update one message in place as more text arrives
+      if (detail && typeof detail === 'object' && detail.id && typeof detail.text === 'string') {
+        setMessages((prev) => {
+          const idx = prev.findIndex((m) => m.id === detail.id);
+          if (idx === -1) {
+            return [...prev, { id: detail.id, role: "assistant", content: detail.text, timestamp: new Date() }];
+          }
+          const next = [...prev];
+          next[idx] = { ...next[idx], content: detail.text };
+          return next;
+        });
+        return;
+      }
+      const text = detail;
       if (text && typeof text === 'string') {
         const aiMessage: Message = {
           id: Date.now().toString(),
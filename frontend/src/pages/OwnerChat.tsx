@@ -361,8 +361,8 @@ const OwnerChat = () => {
                       userEmail={currentUserEmail} 
                     />
                     <PublishPendingText />
-                    <AgentChatListener onMessage={(msg) => {
-                      const chatEvent = new CustomEvent('voxa-agent-message', { detail: msg });
+                    <AgentChatListener onMessage={(msg, streamId) => {
+                      const chatEvent = new CustomEvent('voxa-agent-message', { detail: streamId ? { id: streamId, text: msg } : msg });
                       window.dispatchEvent(chatEvent);
                     }} />
                     <div className="grid grid-rows-[1fr_auto]">
@@ -573,6 +573,8 @@ function PublishPendingText() {
             } else if (typeof (lp as any).publishData === 'function') {
               const message = JSON.stringify({
                 type: 'text_message',
+                // Unique per send so the agent can tell a repeated message from a duplicate delivery
+                id: (globalThis.crypto as any)?.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`,
                 text: textMessage,
                 topic: 'lk.chat'
               });
@@ -671,12 +673,15 @@ function PublishPendingText() {
   return null;
 }
 
-function AgentChatListener({ onMessage }: { onMessage: (msg: string) => void }) {
+function AgentChatListener({ onMessage }: { onMessage: (msg: string, streamId?: string) => void }) {
   const room = useRoomContext();
   
   useEffect(() => {
     if (!room) return;
     
+    // Text assembled so far for streamed agent_response messages, by streamId
+    const streams = new Map<string, string>();
+
     const handleData = (payload: any) => {
       try {
         let text = '';
@@ -698,7 +703,16 @@ function AgentChatListener({ onMessage }: { onMessage: (msg: string) => void })
         if (text) {
           try {
             const parsed = JSON.parse(text);
-            if (parsed.type === 'agent_response' && parsed.text) {
+            if (parsed.type === 'agent_response' && parsed.streamId) {
+              // Chunk frames carry new text only; the final frame carries the full answer
+              const full = parsed.final ? (parsed.text || '') : (streams.get(parsed.streamId) || '') + (parsed.text || '');
+              if (parsed.final) {
+                streams.delete(parsed.streamId);
+              } else {
+                streams.set(parsed.streamId, full);
+              }
+              if (full) onMessage(full, parsed.streamId);
+            } else if (parsed.type === 'agent_response' && parsed.text) {
               onMessage(parsed.text);
             } else if (parsed.text) {
               onMessage(parsed.text);
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from agent.admission import (
+    PRIORITY_CUSTOMER, PRIORITY_GENERAL, PRIORITY_OWNER, LLMAdmissionController, estimate_tokens, priority_for_role,
+)
+from agent.llm import _retry_after
+
+
+def test_priority_for_role():
+    assert priority_for_role('owner') == PRIORITY_OWNER
+    assert priority_for_role('general') == PRIORITY_GENERAL
+    assert priority_for_role('customer') == PRIORITY_CUSTOMER
+    assert priority_for_role(None) == PRIORITY_CUSTOMER
+
+
+def test_estimate_tokens_counts_content_and_completion():
+    assert estimate_tokens([{'content': 'x' * 400}], completion_tokens=100) == 200
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def main():
+        controller = LLMAdmissionController(max_concurrency=1)
+        held = await controller.acquire(PRIORITY_CUSTOMER, 1)
+        order = []
+
+        async def waiter(name, priority):
+            async with controller.admit(priority, 1):
+                order.append(name)
+
+        tasks = [
+            asyncio.ensure_future(waiter('general', PRIORITY_GENERAL)),
+            asyncio.ensure_future(waiter('customer-1', PRIORITY_CUSTOMER)),
+            asyncio.ensure_future(waiter('owner', PRIORITY_OWNER)),
+            asyncio.ensure_future(waiter('customer-2', PRIORITY_CUSTOMER)),
+        ]
+        await asyncio.sleep(0)
+        assert controller.snapshot()['queued'] == 4
+        controller.release(held)
+        await asyncio.gather(*tasks)
+        return order, controller
+
+    order, controller = asyncio.run(main())
+    assert order == ['owner', 'customer-1', 'customer-2', 'general']
+    assert controller.in_flight == 0
+
+
+def test_token_budget_holds_requests_until_actual_usage_frees_room():
+    async def main():
+        controller = LLMAdmissionController(max_concurrency=4, tokens_per_minute=100)
+        first = await controller.acquire(PRIORITY_CUSTOMER, 80)
+        second = asyncio.ensure_future(controller.acquire(PRIORITY_CUSTOMER, 50))
+        await asyncio.sleep(0)
+        assert not second.done()
+        # The call used far less than it reserved, which makes room for the next one
+        first.tokens = 10
+        controller.release(first)
+        admission = await asyncio.wait_for(second, 1.0)
+        controller.release(admission)
+        return controller.snapshot()
+
+    snapshot = asyncio.run(main())
+    assert snapshot['tokens_last_minute'] == 60
+    assert snapshot['admitted'] == 2
+
+
+def test_request_larger_than_budget_is_admitted_into_an_empty_window():
+    async def main():
+        controller = LLMAdmissionController(tokens_per_minute=100)
+        admission = await asyncio.wait_for(controller.acquire(PRIORITY_CUSTOMER, 500), 1.0)
+        controller.release(admission)
+
+    asyncio.run(main())
+
+
+def test_rate_limit_pauses_admissions_for_retry_after():
+    async def main():
+        controller = LLMAdmissionController()
+        controller.note_rate_limited(0.1)
+        started = time.monotonic()
+        async with controller.admit(PRIORITY_OWNER, 1):
+            return time.monotonic() - started, controller.rate_limited
+
+    waited, rate_limited = asyncio.run(main())
+    assert waited >= 0.09
+    assert rate_limited == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        controller = LLMAdmissionController(max_concurrency=1)
+        held = await controller.acquire(PRIORITY_CUSTOMER, 1)
+        waiter = asyncio.ensure_future(controller.acquire(PRIORITY_CUSTOMER, 1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        controller.release(held)
+        return controller
+
+    controller = asyncio.run(main())
+    assert controller.in_flight == 0
+    assert controller.snapshot()['queued'] == 0
+
+
+def _http_error(status, headers=None):
+    return SimpleNamespace(status_code=status, raw_response=SimpleNamespace(status_code=status, headers=headers or {}))
+
+
+def test_retry_after_reads_the_header_of_a_429():
+    assert _retry_after(_http_error(429, {'retry-after': '3'})) == 3.0
+    assert _retry_after(_http_error(429, {'Retry-After': '1.5'})) == 1.5
+
+
+def test_retry_after_without_usable_header_falls_back_to_backoff():
+    assert _retry_after(_http_error(429)) == 0.0
+    assert _retry_after(_http_error(429, {'retry-after': 'Wed, 21 Oct 2026 07:28:00 GMT'})) == 0.0
+
+
+def test_retry_after_ignores_other_errors():
+    assert _retry_after(_http_error(500)) is None
+    assert _retry_after(ValueError('boom')) is None
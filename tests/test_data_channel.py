@@ -0,0 +1,126 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agent.data_channel import MSG_ROLE_CONTEXT, MSG_TEXT, DataChannelDispatcher, decode_message
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr('agent.data_channel.time.monotonic', clock)
+    return clock
+
+
+def _dispatcher(window=2.0):
+    handled = []
+
+    async def on_text(message):
+        pass
+
+    def spawn(coro, name):
+        # Handlers are not awaited here; only what was routed matters
+        coro.close()
+        handled.append(name)
+
+    dispatcher = DataChannelDispatcher('room', spawn, dedupe_window=window)
+    dispatcher.route(MSG_TEXT, on_text)
+    dispatcher.route(MSG_ROLE_CONTEXT, on_text)
+    return dispatcher, handled
+
+
+def _packet(payload, topic='lk.chat'):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+    return SimpleNamespace(data=data, topic=topic, participant=None)
+
+
+def test_decode_plain_text_and_json():
+    plain = decode_message(b'hello there')
+    assert (plain.type, plain.text, plain.hashed_id) == (MSG_TEXT, 'hello there', True)
+    obj = decode_message(json.dumps({'type': MSG_TEXT, 'text': 'hi', 'id': 'abc'}).encode())
+    assert (obj.type, obj.text, obj.msg_id, obj.hashed_id) == (MSG_TEXT, 'hi', 'abc', False)
+    assert decode_message(b'   ') is None
+    assert decode_message(b'\xff\xfe broken') is None
+
+
+def test_same_id_is_dropped_within_window(clock):
+    dispatcher, handled = _dispatcher()
+    packet = _packet({'type': MSG_TEXT, 'text': 'hi', 'id': 'm1'})
+    dispatcher.on_packet(packet)
+    dispatcher.on_packet(packet)
+    assert handled == ['data:text_message']
+    assert dispatcher.duplicates == 1
+
+
+def test_same_id_is_accepted_again_after_window(clock):
+    dispatcher, handled = _dispatcher(window=2.0)
+    packet = _packet({'type': MSG_TEXT, 'text': 'hi', 'id': 'm1'})
+    dispatcher.on_packet(packet)
+    clock.now += 2.5
+    dispatcher.on_packet(packet)
+    assert len(handled) == 2
+
+
+def test_repeated_text_without_id_on_one_path_is_kept(clock):
+    dispatcher, handled = _dispatcher()
+    dispatcher.on_packet(_packet(b'yes'))
+    dispatcher.on_packet(_packet(b'yes'))
+    assert len(handled) == 2
+    assert dispatcher.duplicates == 0
+
+
+def test_same_text_on_both_paths_is_answered_once(clock):
+    dispatcher, handled = _dispatcher()
+    dispatcher.on_packet(_packet(b'what are your hours'))
+    dispatcher.on_session_text('what are your hours')
+    assert len(handled) == 1
+    # The match is consumed: the next copy on either path is a new message
+    dispatcher.on_session_text('what are your hours')
+    assert len(handled) == 2
+
+
+def test_id_message_suppresses_id_less_copy_on_session_path(clock):
+    dispatcher, handled = _dispatcher()
+    dispatcher.on_packet(_packet({'type': MSG_TEXT, 'text': 'book a demo', 'id': 'm7'}))
+    dispatcher.on_session_text('book a demo')
+    assert len(handled) == 1
+
+
+def test_other_topics_and_unrouted_types_are_ignored(clock):
+    dispatcher, handled = _dispatcher()
+    dispatcher.on_packet(_packet(b'hello', topic='lk.transcription'))
+    dispatcher.on_packet(_packet({'type': 'cursor', 'x': 1}))
+    assert handled == []
+    assert dispatcher.ignored == 2
+
+
+def test_encoding_is_negotiated_from_role_context():
+    from agent.data_channel import ENCODING_JSON, ENCODING_MSGPACK, negotiate_encoding
+    assert negotiate_encoding({'encodings': ['msgpack', 'json']}) == ENCODING_MSGPACK
+    assert negotiate_encoding({'encoding': 'msgpack'}) == ENCODING_MSGPACK
+    # What the bundled frontend sends today
+    assert negotiate_encoding({'role': 'customer', 'businessId': 'b1'}) == ENCODING_JSON
+
+
+def test_binary_envelope_round_trip():
+    from agent.data_channel import MSG_AGENT_RESPONSE, encode_message
+    frame = encode_message({'type': MSG_TEXT, 'text': 'hola', 'id': 'm9'}, 'msgpack')
+    assert frame[:2] == bytes((0xFE, 1))
+    message = decode_message(frame, 'lk.chat')
+    assert (message.type, message.text, message.msg_id, message.hashed_id) == (MSG_TEXT, 'hola', 'm9', False)
+    # Types without a code fall back to JSON
+    assert json.loads(encode_message({'type': 'custom', 'x': 1}, 'msgpack')) == {'type': 'custom', 'x': 1}
+    assert json.loads(encode_message({'type': MSG_AGENT_RESPONSE, 'text': 'hi'})) == {'type': MSG_AGENT_RESPONSE, 'text': 'hi'}
+
+
+def test_unknown_envelope_version_is_dropped():
+    assert decode_message(bytes((0xFE, 9, 2)) + b'\x80') is None
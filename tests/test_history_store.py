@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import pytest
+
+from agent import history_store
+from agent.history_store import (
+    FORMAT_MSGPACK, FORMAT_MSGPACK_ZSTD, MemoryHistoryStore, SQLiteHistoryStore, decode_history, encode_history,
+)
+
+HISTORY = [
+    {'role': 'system', 'content': 'Customer is asking about plans.'},
+    {'role': 'user', 'content': 'Does premium include weekend support? 🙂'},
+    {'role': 'assistant', 'content': 'Yes, Saturdays from 9am to 5pm.'},
+]
+
+
+def test_json_encoding_is_plain_json():
+    raw = encode_history(HISTORY, 'json')
+    assert json.loads(raw) == HISTORY
+    assert decode_history(raw) == HISTORY
+
+
+def test_msgpack_round_trip_with_version_header():
+    raw = encode_history(HISTORY, 'msgpack')
+    assert raw[0] == 0xFF and raw[1] == FORMAT_MSGPACK
+    assert len(raw) < len(encode_history(HISTORY, 'json'))
+    assert decode_history(raw) == HISTORY
+
+
+def test_large_history_is_zstd_compressed(monkeypatch):
+    monkeypatch.setattr(history_store, 'HISTORY_COMPRESS_MIN_BYTES', 64)
+    raw = encode_history(HISTORY * 5, 'msgpack')
+    assert raw[1] == FORMAT_MSGPACK_ZSTD
+    assert decode_history(raw) == HISTORY * 5
+
+
+def test_unknown_roles_keep_their_name():
+    hist = [{'role': 'tool', 'content': '{"ok": true}'}]
+    assert decode_history(encode_history(hist, 'msgpack')) == hist
+
+
+def test_legacy_json_blobs_are_still_readable():
+    legacy = json.dumps(HISTORY)
+    assert decode_history(legacy) == HISTORY
+    assert decode_history(legacy.encode('utf-8')) == HISTORY
+    assert decode_history(memoryview(legacy.encode('utf-8'))) == HISTORY
+
+
+def test_empty_and_unknown_versions_decode_to_empty_history():
+    assert decode_history(None) == []
+    assert decode_history(b'') == []
+    assert decode_history(bytes((0xFF, 99)) + b'\x90') == []
+
+
+def test_memory_store_evicts_least_recently_used_room():
+    async def main():
+        store = MemoryHistoryStore(max_rooms=2)
+        await store.save('a', HISTORY)
+        await store.save('b', HISTORY)
+        await store.load('a')
+        await store.save('c', HISTORY)
+        return [await store.load(room) for room in ('a', 'b', 'c')]
+
+    a, b, c = asyncio.run(main())
+    assert a == HISTORY and b == [] and c == HISTORY
+
+
+@pytest.mark.parametrize('encoding', ['json', 'msgpack'])
+def test_sqlite_store_round_trip(tmp_path, monkeypatch, encoding):
+    monkeypatch.setattr(history_store, 'COMPACT_ENCODING', encoding == 'msgpack')
+
+    async def main():
+        store = SQLiteHistoryStore(str(tmp_path / 'history.db'))
+        try:
+            await store.save('room', HISTORY)
+            loaded = await store.load('room')
+            await store.delete('room')
+            return loaded, await store.load('room')
+        finally:
+            await store.close()
+
+    loaded, after_delete = asyncio.run(main())
+    assert loaded == HISTORY
+    assert after_delete == []
+
+
+def test_incomplete_backend_fails_at_construction():
+    class LoadOnly(history_store.HistoryStore):
+        async def load(self, room_name):
+            return []
+
+    with pytest.raises(TypeError):
+        LoadOnly()
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+import requests
+
+from agent import persistence
+from agent.persistence import ConversationWriter, _post_batch
+
+
+class _Resp:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.ok = 200 <= status_code < 300
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(persistence, 'PERSIST_BACKOFF_BASE', 0)
+
+
+def _entries(n):
+    return [{'role': 'user', 'content': f"m{i}", 'entryId': f"id{i}"} for i in range(n)]
+
+
+def _fake_post(calls, fail):
+    """requests.post stand-in: the bulk route is missing and ``fail`` decides per-entry failures."""
+    def post(url, params=None, json=None, headers=None, timeout=None):
+        if url.endswith('/bulk'):
+            calls.append('bulk')
+            return _Resp(404)
+        calls.append(json['content'])
+        outcome = fail(json['content'], calls)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _Resp(outcome)
+    return post
+
+
+def test_fallback_returns_count_stored_before_exception(monkeypatch):
+    calls = []
+    monkeypatch.setattr(requests, 'post', _fake_post(
+        calls, lambda content, _: requests.exceptions.Timeout() if content == 'm1' else 200))
+    assert _post_batch('/conv', None, _entries(3)) == 1
+    assert calls == ['bulk', 'm0', 'm1']
+
+
+def test_fallback_returns_count_stored_before_error_status(monkeypatch):
+    calls = []
+    monkeypatch.setattr(requests, 'post', _fake_post(calls, lambda content, _: 500 if content == 'm2' else 200))
+    assert _post_batch('/conv', None, _entries(3)) == 2
+
+
+def test_retry_resends_only_unstored_entries(monkeypatch):
+    calls = []
+
+    def fail(content, seen):
+        # m1 times out the first time it is posted, then succeeds
+        if content == 'm1' and seen.count('m1') == 1:
+            return requests.exceptions.ConnectionError()
+        return 200
+
+    monkeypatch.setattr(requests, 'post', _fake_post(calls, fail))
+    writer = ConversationWriter('room')
+    batch = [(('/conv', None), e) for e in _entries(2)]
+    asyncio.run(writer._send(batch))
+    assert calls == ['bulk', 'm0', 'm1', 'bulk', 'm1']
+
+
+def test_bulk_post_carries_entry_ids(monkeypatch):
+    sent = []
+
+    def post(url, params=None, json=None, headers=None, timeout=None):
+        sent.append(json)
+        return _Resp(200)
+
+    monkeypatch.setattr(requests, 'post', post)
+
+    async def run():
+        writer = ConversationWriter('room')
+        assert writer.enqueue('a@b.c', 'general', None, 'user', 'hello')
+        assert writer.enqueue('a@b.c', 'general', None, 'assistant', 'hi')
+        await writer.close()
+
+    asyncio.run(run())
+    entries = sent[0]['entries']
+    assert [e['content'] for e in entries] == ['hello', 'hi']
+    assert len({e['entryId'] for e in entries}) == 2
+
+
+def test_enqueue_skips_roles_without_a_conversation_log():
+    async def run():
+        return ConversationWriter('room').enqueue('a@b.c', 'owner', 'biz', 'user', 'hello')
+
+    assert asyncio.run(run()) is False
+
+
+def test_released_room_is_forgotten_once_drained(monkeypatch):
+    monkeypatch.setattr(requests, 'post', lambda *a, **k: _Resp(200))
+
+    async def run():
+        persistence.open_conversation_writer('room-released')
+        writer = persistence.get_conversation_writer('room-released')
+        writer.enqueue('a@b.c', 'general', None, 'user', 'hello')
+        await persistence.flush_conversation_writer('room-released')
+
+    asyncio.run(run())
+    assert 'room-released' not in persistence._released_rooms
+    assert 'room-released' not in persistence._writers
@@ -0,0 +1,36 @@
+from agent.reasoning_cache import ReasoningCache, is_personalized, make_cache_key
+
+
+def test_key_separates_modes_of_the_same_business():
+    owner = make_cache_key('biz', 'What were sales last week?', mode='OWNER')
+    customer = make_cache_key('biz', 'What were sales last week?', mode='CUSTOMER')
+    assert owner != customer
+
+
+def test_key_ignores_case_and_punctuation():
+    assert make_cache_key('biz', 'Refund policy?') == make_cache_key('biz', 'refund   POLICY')
+
+
+def test_follow_up_key_depends_on_history():
+    first = [{'role': 'user', 'content': 'Tell me about plan A'}]
+    second = [{'role': 'user', 'content': 'Tell me about plan B'}]
+    assert make_cache_key('biz', 'How much is it?', first) != make_cache_key('biz', 'How much is it?', second)
+    # Standalone questions share an entry whatever came before
+    assert make_cache_key('biz', 'Opening hours', first) == make_cache_key('biz', 'Opening hours', second)
+
+
+def test_personal_queries_are_detected():
+    assert is_personalized('Where is my order?')
+    assert is_personalized('Email me at a@b.com')
+    assert not is_personalized('What is the return policy?')
+
+
+def test_invalidate_business_drops_every_mode():
+    cache = ReasoningCache()
+    cache.put(make_cache_key('biz', 'q', mode='OWNER'), 'owner answer')
+    cache.put(make_cache_key('biz', 'q', mode='CUSTOMER'), 'customer answer')
+    cache.put(make_cache_key('other', 'q'), 'other answer')
+    cache.invalidate_business('biz')
+    assert cache.get(make_cache_key('biz', 'q', mode='OWNER')) is None
+    assert cache.get(make_cache_key('biz', 'q', mode='CUSTOMER')) is None
+    assert cache.get(make_cache_key('other', 'q')) == 'other answer'
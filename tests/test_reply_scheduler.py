@@ -0,0 +1,117 @@
+import asyncio
+
+from agent.reply_scheduler import ReplyScheduler
+
+
+async def _wait_for(predicate, timeout=2.0):
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, 'condition not reached'
+        await asyncio.sleep(0.01)
+
+
+def _scheduler(generate_delay=0.0, **kwargs):
+    replies = []
+    interrupts = []
+
+    async def generate(text):
+        if generate_delay:
+            await asyncio.sleep(generate_delay)
+        replies.append(text)
+
+    scheduler = ReplyScheduler('room', generate, interrupt=lambda: interrupts.append(1), **kwargs)
+    return scheduler, replies, interrupts
+
+
+async def _run(scheduler, body):
+    task = asyncio.ensure_future(scheduler.run())
+    try:
+        await body()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def test_burst_is_coalesced_into_one_turn():
+    scheduler, replies, _ = _scheduler(debounce=0.05, max_delay=1.0)
+
+    async def body():
+        scheduler.submit('hi')
+        scheduler.submit('  ')
+        scheduler.submit('are you open today?')
+        await _wait_for(lambda: replies)
+
+    asyncio.run(_run(scheduler, body))
+    assert replies == ['hi\nare you open today?']
+    assert scheduler.turns == 1
+
+
+def test_max_delay_bounds_a_steady_stream():
+    scheduler, replies, _ = _scheduler(debounce=0.05, max_delay=0.12)
+
+    async def body():
+        for i in range(10):
+            scheduler.submit(f"m{i}")
+            await asyncio.sleep(0.03)
+        await _wait_for(lambda: sum(r.count('m') for r in replies) == 10)
+
+    asyncio.run(_run(scheduler, body))
+    # The stream lasts ~0.3s, so it cannot have been held back as a single turn
+    assert len(replies) > 1
+
+
+def test_new_text_supersedes_running_reply_and_merges_input():
+    scheduler, replies, interrupts = _scheduler(generate_delay=0.2, debounce=0.02, max_delay=0.5)
+
+    async def body():
+        scheduler.submit('first question')
+        await _wait_for(lambda: scheduler.busy)
+        scheduler.submit('actually, second question')
+        await _wait_for(lambda: replies)
+
+    asyncio.run(_run(scheduler, body))
+    assert replies == ['first question\nactually, second question']
+    assert scheduler.superseded == 1
+    assert interrupts == [1]
+
+
+def test_failed_generation_does_not_stop_the_loop():
+    calls = []
+
+    async def generate(text):
+        calls.append(text)
+        if text == 'boom':
+            raise RuntimeError('llm down')
+
+    scheduler = ReplyScheduler('room', generate, debounce=0.02, max_delay=0.2)
+
+    async def body():
+        scheduler.submit('boom')
+        await _wait_for(lambda: calls == ['boom'] and not scheduler.busy)
+        scheduler.submit('again')
+        await _wait_for(lambda: len(calls) == 2)
+
+    asyncio.run(_run(scheduler, body))
+    assert calls == ['boom', 'again']
+
+
+def test_cancelling_the_loop_cancels_the_reply_in_progress():
+    async def main():
+        began = asyncio.Event()
+
+        async def generate(text):
+            began.set()
+            await asyncio.sleep(10)
+
+        scheduler = ReplyScheduler('room', generate, debounce=0.01, max_delay=0.1)
+        task = asyncio.ensure_future(scheduler.run())
+        scheduler.submit('hello')
+        await asyncio.wait_for(began.wait(), 1.0)
+        current = scheduler._current
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        return current
+
+    assert asyncio.run(main()).cancelled()
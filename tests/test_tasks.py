@@ -0,0 +1,77 @@
+import asyncio
+
+from agent.tasks import RoomTaskSupervisor
+
+
+def test_unlimited_tasks_do_not_hold_slots():
+    async def main():
+        supervisor = RoomTaskSupervisor('room', max_concurrent=1)
+        forever = asyncio.Event()
+        supervisor.spawn(forever.wait(), 'room_loop', limit=False)
+        done = []
+
+        async def handler():
+            done.append(1)
+
+        task = supervisor.spawn(handler(), 'handler')
+        await asyncio.wait_for(task, 1.0)
+        await supervisor.cancel_all()
+        return done, supervisor.snapshot()
+
+    done, snapshot = asyncio.run(main())
+    assert done == [1]
+    assert snapshot['cancelled'] == 1 and snapshot['live'] == 0
+
+
+def test_limited_tasks_wait_for_a_slot():
+    async def main():
+        supervisor = RoomTaskSupervisor('room', max_concurrent=1)
+        release = asyncio.Event()
+        first = supervisor.spawn(release.wait(), 'first')
+        order = []
+
+        async def second():
+            order.append('second')
+
+        task = supervisor.spawn(second(), 'second')
+        await asyncio.sleep(0.02)
+        waited = not order
+        release.set()
+        await asyncio.wait_for(asyncio.gather(first, task), 1.0)
+        return waited, order
+
+    waited, order = asyncio.run(main())
+    assert waited and order == ['second']
+
+
+def test_work_beyond_the_pending_cap_is_dropped():
+    async def main():
+        supervisor = RoomTaskSupervisor('room', max_concurrent=1, max_pending=2)
+        release = asyncio.Event()
+        supervisor.spawn(release.wait(), 'a')
+        supervisor.spawn(release.wait(), 'b')
+        dropped = supervisor.spawn(release.wait(), 'c')
+        release.set()
+        await supervisor.cancel_all()
+        return dropped, supervisor.snapshot()
+
+    dropped, snapshot = asyncio.run(main())
+    assert dropped is None
+    assert snapshot['dropped'] == 1
+
+
+def test_failures_are_counted_and_closed_supervisor_rejects_work():
+    async def main():
+        supervisor = RoomTaskSupervisor('room')
+
+        async def boom():
+            raise RuntimeError('handler failed')
+
+        await asyncio.gather(supervisor.spawn(boom(), 'boom'), return_exceptions=True)
+        await supervisor.cancel_all()
+        late = supervisor.spawn(asyncio.sleep(0), 'late')
+        return late, supervisor.snapshot()
+
+    late, snapshot = asyncio.run(main())
+    assert late is None
+    assert snapshot['failed'] == 1
@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+from agent.transcripts import TranscriptCoalescer
+
+
+def _seg(seg_id, text, final=True):
+    return SimpleNamespace(id=seg_id, text=text, final=final)
+
+
+def _coalescer(turn_gap=10.0):
+    persisted = []
+    tasks = []
+
+    async def persist(text):
+        persisted.append(text)
+
+    def spawn(coro, name):
+        tasks.append(asyncio.ensure_future(coro))
+
+    return TranscriptCoalescer('room', persist, spawn, turn_gap=turn_gap), persisted, tasks
+
+
+def test_turn_joins_finals_and_skips_interims():
+    async def run():
+        coalescer, persisted, tasks = _coalescer()
+        coalescer.add_segments([_seg('a', 'Hello', final=False)])
+        coalescer.add_segments([_seg('a', 'Hello there.'), _seg('b', 'How can I help?', final=False)])
+        coalescer.add_segments([_seg('b', 'How can I help?')])
+        coalescer.end_turn()
+        await asyncio.gather(*tasks)
+        return coalescer, persisted
+
+    coalescer, persisted = asyncio.run(run())
+    assert persisted == ['Hello there. How can I help?']
+    assert coalescer.interim_skipped == 2
+    assert coalescer.turns == 1
+
+
+def test_resent_final_segment_is_persisted_once():
+    async def run():
+        coalescer, persisted, tasks = _coalescer()
+        coalescer.add_segments([_seg('a', 'Hello.')])
+        coalescer.end_turn()
+        coalescer.add_segments([_seg('a', 'Hello.')])
+        coalescer.end_turn()
+        await asyncio.gather(*tasks)
+        return persisted
+
+    assert asyncio.run(run()) == ['Hello.']
+
+
+def test_turn_flushes_after_gap_without_end_turn():
+    async def run():
+        coalescer, persisted, tasks = _coalescer(turn_gap=0.05)
+        coalescer.add_segments([_seg('a', 'First.')])
+        coalescer.add_segments([_seg('b', 'Second.')])
+        await asyncio.sleep(0.15)
+        coalescer.add_segments([_seg('c', 'Next turn.')])
+        await asyncio.sleep(0.15)
+        await asyncio.gather(*tasks)
+        return persisted
+
+    assert asyncio.run(run()) == ['First. Second.', 'Next turn.']
+
+
+def test_empty_turn_persists_nothing():
+    async def run():
+        coalescer, persisted, tasks = _coalescer()
+        coalescer.end_turn()
+        await coalescer.close()
+        return persisted, tasks
+
+    persisted, tasks = asyncio.run(run())
+    assert persisted == [] and tasks == []
+
+
+def test_close_persists_unfinished_turn_directly():
+    async def run():
+        coalescer, persisted, tasks = _coalescer()
+        coalescer.add_segments([_seg('a', 'Goodbye.')])
+        await coalescer.close()
+        return persisted, tasks
+
+    persisted, tasks = asyncio.run(run())
+    assert persisted == ['Goodbye.'] and tasks == []
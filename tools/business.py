@@ -1,14 +1,18 @@
 import logging
 from livekit.agents import function_tool, RunContext
-import requests
 import os
 from typing import Optional
 
+from .utils import BudgetExhausted, backend_unavailable, call_timeout, is_deadline_error, timeout_result, unavailable_result
+
 logger = logging.getLogger(__name__)
 
 @function_tool()
 async def get_business_context(context: RunContext, business_id: str) -> str:
     """Fetch business description, products, policies for AI context."""
+    if backend_unavailable():
+        return unavailable_result('get_business_context')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         headers = {}
@@ -16,8 +20,11 @@ async def get_business_context(context: RunContext, business_id: str) -> str:
         if api_key:
             headers["Authorization"] = f"Bearer {api_key}"
 
+        # ID lookup, then slug lookup + ID lookup: up to three sequential calls share the turn budget
         try:
-            resp = requests.get(f"{backend_url}/api/business/context/{business_id}", headers=headers, timeout=10)
+            resp = requests.get(f"{backend_url}/api/business/context/{business_id}", headers=headers, timeout=call_timeout(context, 10, calls_left=3))
+        except BudgetExhausted:
+            raise
         except Exception as e:
             logger.debug(f"Context fetch by ID failed fast: {e}")
             resp = None
@@ -25,7 +32,9 @@ async def get_business_context(context: RunContext, business_id: str) -> str:
         if not resp or resp.status_code != 200:
             logger.debug(f"Business not found by ID or service error, trying slug: {business_id}")
             try:
-                resp_slug = requests.get(f"{backend_url}/api/business/by-slug/{business_id}", headers=headers, timeout=10)
+                resp_slug = requests.get(f"{backend_url}/api/business/by-slug/{business_id}", headers=headers, timeout=call_timeout(context, 10, calls_left=2))
+            except BudgetExhausted:
+                raise
             except Exception as e:
                 logger.debug(f"Business slug lookup failed: {e}")
                 resp_slug = None
@@ -35,7 +44,9 @@ async def get_business_context(context: RunContext, business_id: str) -> str:
                 resolved_id = business_data.get('businessId') or business_data.get('_id')
                 if resolved_id:
                     try:
-                        resp = requests.get(f"{backend_url}/api/business/context/{resolved_id}", headers=headers, timeout=10)
+                        resp = requests.get(f"{backend_url}/api/business/context/{resolved_id}", headers=headers, timeout=call_timeout(context))
+                    except BudgetExhausted:
+                        raise
                     except Exception as e:
                         logger.debug(f"Context fetch by resolved ID failed: {e}")
 
@@ -46,12 +57,18 @@ async def get_business_context(context: RunContext, business_id: str) -> str:
         logger.warning(f"Failed to fetch business context (status): {getattr(resp, 'status_code', 'no-response')}")
         return "{}"
     except Exception as e:
+        if is_deadline_error(context, e):
+            logger.warning(f"Turn deadline reached while fetching business context for {business_id}")
+            return timeout_result('get_business_context')
         logger.warning(f"Error fetching business context: {e}")
         return "{}"
 
 @function_tool()
 async def get_owner_profile(context: RunContext, identifier: str) -> str:
     """Fetch owner profile by businessId/slug/email; returns JSON string."""
+    if backend_unavailable():
+        return unavailable_result('get_owner_profile')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         headers = {}
@@ -62,37 +79,48 @@ async def get_owner_profile(context: RunContext, identifier: str) -> str:
         import json as _json
 
         try:
-            resp_ctx = requests.get(f"{backend_url}/api/business/context/{identifier}", headers=headers, timeout=10)
+            resp_ctx = requests.get(f"{backend_url}/api/business/context/{identifier}", headers=headers, timeout=call_timeout(context, 10, calls_left=3))
             if resp_ctx and resp_ctx.status_code == 200:
                 data = resp_ctx.json()
                 owner = data.get('owner')
                 if owner:
                     return _json.dumps(owner)
+        except BudgetExhausted:
+            raise
         except Exception:
             pass
 
         try:
-            resp = requests.get(f"{backend_url}/api/business/{identifier}/owner", headers=headers, timeout=10)
+            resp = requests.get(f"{backend_url}/api/business/{identifier}/owner", headers=headers, timeout=call_timeout(context, 10, calls_left=2))
             if resp and resp.status_code == 200:
                 return _json.dumps(resp.json())
+        except BudgetExhausted:
+            raise
         except Exception:
             pass
 
         try:
-            resp = requests.get(f"{backend_url}/api/business/by-slug/{identifier}/owner", headers=headers, timeout=10)
+            resp = requests.get(f"{backend_url}/api/business/by-slug/{identifier}/owner", headers=headers, timeout=call_timeout(context))
             if resp and resp.status_code == 200:
                 return _json.dumps(resp.json())
+        except BudgetExhausted:
+            raise
         except Exception:
             pass
 
         return "{}"
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('get_owner_profile')
         logger.warning(f"get_owner_profile error: {e}")
         return "{}"
 
 @function_tool()
 async def get_analytics(context: RunContext, metric: str, business_id: Optional[str] = None) -> str:
     """Get business metrics: 'overview'|'tickets'|'customers'. business_id may be inferred from room metadata if not provided."""
+    if backend_unavailable():
+        return unavailable_result('get_analytics')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         
@@ -115,9 +143,11 @@ async def get_analytics(context: RunContext, metric: str, business_id: Optional[
         if not business_id:
             return "Error: Business ID is required to get analytics. Please provide the business context or ensure you're connected with business context."
         
-        r = requests.get(f"{backend_url}/api/analytics/{metric}", params={"businessId": business_id}, timeout=10)
+        r = requests.get(f"{backend_url}/api/analytics/{metric}", params={"businessId": business_id}, timeout=call_timeout(context))
         return r.text
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('get_analytics')
         logger.warning(f"get_analytics error: {e}")
         return "{}"
 
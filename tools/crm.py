@@ -1,9 +1,10 @@
 import logging
 from livekit.agents import function_tool, RunContext
-import requests
 import os
 from typing import Optional
 
+from .utils import backend_unavailable, call_timeout, is_deadline_error, timeout_result, unavailable_result
+
 logger = logging.getLogger(__name__)
 
 @function_tool()
@@ -14,12 +15,15 @@ async def crm_lookup(
     """
     Look up customer information in the CRM system.
     """
+    if backend_unavailable():
+        return unavailable_result('crm_lookup')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         response = requests.get(
             f"{backend_url}/api/crm/customers/email/{email}",
             headers={"Authorization": f"Bearer {os.getenv('BACKEND_API_KEY', '')}"},
-            timeout=10,
+            timeout=call_timeout(context),
         )
 
         if response.status_code == 200:
@@ -36,6 +40,8 @@ async def crm_lookup(
             return f"Customer not found for email: {email}"
 
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('crm_lookup')
         logger.warning(f"Error looking up customer: {e}")
         return f"An error occurred while looking up customer: {str(e)}"
 
@@ -47,13 +53,16 @@ async def get_customer_history(
     """
     Get customer history including orders and tickets.
     """
+    if backend_unavailable():
+        return unavailable_result('get_customer_history')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
 
         customer_response = requests.get(
             f"{backend_url}/api/crm/customers/email/{email}",
             headers={"Authorization": f"Bearer {os.getenv('BACKEND_API_KEY', '')}"},
-            timeout=10,
+            timeout=call_timeout(context, 10, calls_left=2),
         )
 
         if customer_response.status_code != 200:
@@ -64,11 +73,17 @@ async def get_customer_history(
 
         history = f"Customer: {customer.get('name', 'Unknown')}\n\n"
 
-        orders_response = requests.get(
-            f"{backend_url}/api/crm/orders/customer/{customer_id}",
-            headers={"Authorization": f"Bearer {os.getenv('BACKEND_API_KEY', '')}"},
-            timeout=10,
-        )
+        # The customer is already known; if the orders call runs out of turn budget return what we have
+        try:
+            orders_response = requests.get(
+                f"{backend_url}/api/crm/orders/customer/{customer_id}",
+                headers={"Authorization": f"Bearer {os.getenv('BACKEND_API_KEY', '')}"},
+                timeout=call_timeout(context),
+            )
+        except Exception as e:
+            if not is_deadline_error(context, e):
+                raise
+            return timeout_result('get_customer_history', {'history': history})
 
         if orders_response.status_code == 200:
             orders = orders_response.json()
@@ -79,12 +94,17 @@ async def get_customer_history(
         return history
 
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('get_customer_history')
         logger.warning(f"Error getting customer history: {e}")
         return f"An error occurred while fetching customer history: {str(e)}"
 
 @function_tool()
 async def manage_customer(context: RunContext, action: str, data: dict) -> str:
     """CRM: 'upsert', 'create', 'update', 'delete', 'search' customers, returns JSON."""
+    if backend_unavailable():
+        return unavailable_result('manage_customer')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         headers = {}
@@ -108,24 +128,26 @@ async def manage_customer(context: RunContext, action: str, data: dict) -> str:
                 pass
 
         if action == 'upsert':
-            r = requests.post(f"{backend_url}/api/crm/customers/upsert", json=data, headers=headers, timeout=10)
+            r = requests.post(f"{backend_url}/api/crm/customers/upsert", json=data, headers=headers, timeout=call_timeout(context))
             return r.text
         if action == 'create':
-            r = requests.post(f"{backend_url}/api/crm/customers", json=data, headers=headers, timeout=10)
+            r = requests.post(f"{backend_url}/api/crm/customers", json=data, headers=headers, timeout=call_timeout(context))
             return r.text
         if action == 'update':
-            r = requests.put(f"{backend_url}/api/crm/customers/{data.get('id')}", json=data, headers=headers, timeout=10)
+            r = requests.put(f"{backend_url}/api/crm/customers/{data.get('id')}", json=data, headers=headers, timeout=call_timeout(context))
             return r.text
         if action == 'delete':
-            r = requests.delete(f"{backend_url}/api/crm/customers/{data.get('id')}", headers=headers, timeout=10)
+            r = requests.delete(f"{backend_url}/api/crm/customers/{data.get('id')}", headers=headers, timeout=call_timeout(context))
             return r.text
         if action == 'search':
             q = data.get('q', '')
             business_id = data.get('businessId', '')
-            r = requests.get(f"{backend_url}/api/crm/customers/search", params={"q": q, "businessId": business_id}, headers=headers, timeout=10)
+            r = requests.get(f"{backend_url}/api/crm/customers/search", params={"q": q, "businessId": business_id}, headers=headers, timeout=call_timeout(context))
             return r.text
         return "{}"
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('manage_customer', {'action': action})
         logger.warning(f"manage_customer error: {e}")
         return "{}"
 
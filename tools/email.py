@@ -1,9 +1,10 @@
 import logging
 from livekit.agents import function_tool, RunContext
-import requests
 import os
 from typing import Optional
 
+from .utils import BudgetExhausted, call_timeout, is_deadline_error, timeout_result
+
 logger = logging.getLogger(__name__)
 
 @function_tool()
@@ -20,6 +21,7 @@ async def send_email(
     otherwise fall back to the server-wide SEND_GRID environment variable.
     business_id may be inferred from room metadata if not provided.
     """
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         
@@ -46,7 +48,7 @@ async def send_email(
         response = requests.get(
             f"{backend_url}/api/email-credentials/{business_id}",
             headers={"Authorization": f"Bearer {os.getenv('BACKEND_API_KEY', '')}"},
-            timeout=10,
+            timeout=call_timeout(context, 10, calls_left=3),
         )
 
         if response.status_code != 200:
@@ -62,11 +64,13 @@ async def send_email(
             full_resp = requests.get(
                 f"{backend_url}/api/email-credentials/{business_id}/full",
                 headers={"Authorization": f"Bearer {os.getenv('BACKEND_API_KEY', '')}"},
-                timeout=10,
+                timeout=call_timeout(context, 10, calls_left=2),
             )
             if full_resp.status_code == 200:
                 full_json = full_resp.json()
                 api_key = full_json.get('sendgridApiKey') or full_json.get('apiKey') or full_json.get('password')
+        except BudgetExhausted:
+            raise
         except Exception:
             api_key = None
 
@@ -101,7 +105,13 @@ async def send_email(
             "Content-Type": "application/json",
         }
 
-        send_resp = requests.post("https://api.sendgrid.com/v3/mail/send", json=payload, headers=headers, timeout=10)
+        # SendGrid may still accept a request that timed out on our side, so report it as unknown
+        try:
+            send_resp = requests.post("https://api.sendgrid.com/v3/mail/send", json=payload, headers=headers, timeout=call_timeout(context))
+        except Exception as e:
+            if not is_deadline_error(context, e):
+                raise
+            return timeout_result('send_email', {'to': to_email, 'sent': 'unknown'})
         if send_resp.status_code in (200, 202):
             logger.debug(f"Email sent successfully to {to_email}")
             return f"Email sent successfully to {to_email}"
@@ -110,6 +120,8 @@ async def send_email(
             return f"Email sending failed: SendGrid error {send_resp.status_code} - {send_resp.text}"
 
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('send_email', {'to': to_email, 'sent': False})
         logger.warning(f"Error sending email via SendGrid: {e}")
         return f"An error occurred while sending email: {str(e)}"
 
@@ -1,9 +1,10 @@
 import logging
 from livekit.agents import function_tool, RunContext
-import requests
 import os
 from typing import Optional
 
+from .utils import BudgetExhausted, backend_unavailable, call_timeout, is_deadline_error, timeout_result, unavailable_result
+
 logger = logging.getLogger(__name__)
 
 @function_tool()
@@ -18,6 +19,9 @@ async def schedule_meeting(
     """
     Schedule a meeting or appointment.
     """
+    if backend_unavailable():
+        return unavailable_result('schedule_meeting')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         headers = {}
@@ -60,11 +64,13 @@ async def schedule_meeting(
                         f"{backend_url}/api/crm/customers/email/{first_attendee}",
                         params={"businessId": business_id},
                         headers=headers,
-                        timeout=5,
+                        timeout=call_timeout(context, 5, calls_left=2),
                     )
                     if customer_resp.status_code == 200:
                         customer_data = customer_resp.json()
                         customer_id_to_use = customer_data.get('_id') or customer_data.get('id')
+                except BudgetExhausted:
+                    raise
                 except Exception:
                     pass
 
@@ -83,7 +89,7 @@ async def schedule_meeting(
             f"{backend_url}/api/meetings",
             json=meeting_data,
             headers=headers,
-            timeout=10,
+            timeout=call_timeout(context),
         )
         if response.status_code in (200, 201):
             meeting = response.json()
@@ -97,6 +103,10 @@ async def schedule_meeting(
             return f"Failed to schedule meeting: {error_text}"
 
     except Exception as e:
+        if is_deadline_error(context, e):
+            # A timed-out POST may still have created the meeting; budget exhaustion means it was never sent
+            scheduled = False if isinstance(e, BudgetExhausted) else 'unknown'
+            return timeout_result('schedule_meeting', {'title': title, 'scheduled': scheduled})
         logger.warning(f"Error scheduling meeting: {e}")
         return f"An error occurred while scheduling meeting: {str(e)}"
 
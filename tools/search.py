@@ -5,11 +5,10 @@ import hashlib
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from livekit.agents import function_tool, RunContext
-from duckduckgo_search import DDGS
-import requests
-from bs4 import BeautifulSoup
 import re
 
+from .utils import BudgetExhausted, call_timeout, is_deadline_error, timeout_result
+
 logger = logging.getLogger(__name__)
 
 # Simple in-memory cache (can be upgraded to Redis later)
@@ -32,8 +31,11 @@ def _is_cache_valid(cache_entry: Dict[str, Any]) -> bool:
     return age < _cache_ttl
 
 
-def _extract_content_from_url(url: str, timeout: int = 5) -> Optional[str]:
+def _extract_content_from_url(url: str, timeout: float = 5) -> Optional[str]:
     """Extract main content from a webpage."""
+    # Loaded on first use so sessions that never search don't pay for them at spawn
+    import requests
+    from bs4 import BeautifulSoup
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -177,6 +179,7 @@ async def search_web(
         
         def _run_search():
             """Run DuckDuckGo search synchronously."""
+            from duckduckgo_search import DDGS
             try:
                 with DDGS() as ddgs:
                     # Configure search parameters
@@ -198,13 +201,16 @@ async def search_web(
                 logger.warning(f"DuckDuckGo search error: {e}")
                 raise
         
-        # Execute search with timeout
+        # Execute search with timeout; keep part of the turn budget for content extraction
         try:
             raw_results = await asyncio.wait_for(
                 loop.run_in_executor(None, _run_search),
-                timeout=10.0
+                timeout=call_timeout(context, 10.0, calls_left=2)
             )
-        except asyncio.TimeoutError:
+        except (BudgetExhausted, asyncio.TimeoutError) as e:
+            if is_deadline_error(context, e):
+                logger.warning(f"Turn deadline reached while searching for '{query}'")
+                return timeout_result('search_web', {'query': query})
             logger.warning(f"Search timeout for query: '{query}'")
             return json.dumps({
                 "error": "Search request timed out. Please try again.",
@@ -227,6 +233,8 @@ async def search_web(
         
         # Process and validate results
         processed_results = []
+        # Set when the turn budget cut content extraction short
+        partial = False
         for result in raw_results[:max_results]:
             if not isinstance(result, dict):
                 continue
@@ -253,15 +261,23 @@ async def search_web(
             }
             
             # Extract full content if requested (for top 3 results only)
-            if extract_content and len(processed_results) < 3 and processed_result['url']:
+            if extract_content and not partial and len(processed_results) < 3 and processed_result['url']:
                 try:
-                    content = await asyncio.get_event_loop().run_in_executor(
-                        None,
-                        _extract_content_from_url,
-                        processed_result['url']
+                    extract_timeout = call_timeout(context, 5, calls_left=3 - len(processed_results))
+                    content = await asyncio.wait_for(
+                        asyncio.get_event_loop().run_in_executor(
+                            None,
+                            _extract_content_from_url,
+                            processed_result['url'],
+                            extract_timeout,
+                        ),
+                        timeout=extract_timeout,
                     )
                     if content:
                         processed_result['extracted_content'] = content[:1500]  # Limit extracted content
+                except (BudgetExhausted, asyncio.TimeoutError):
+                    logger.debug(f"Skipping remaining content extraction for '{query}': turn budget exhausted")
+                    partial = True
                 except Exception as e:
                     logger.debug(f"Failed to extract content from {processed_result['url']}: {e}")
                     # Continue without extracted content
@@ -289,14 +305,16 @@ async def search_web(
             "summary": summary,
             "message": message,
             "timestamp": datetime.now().isoformat(),
+            "partial": partial,
             "note": "ALWAYS use the information in 'results' and 'summary' fields to answer the user's question. Even if results are limited, extract and use whatever information is available."
         }
         
-        # Cache the results
-        _search_cache[cache_key] = {
-            'data': json.dumps(response_data, indent=2),
-            'timestamp': datetime.now().timestamp()
-        }
+        # Cache the results (results cut short by the turn deadline are not cached)
+        if not partial:
+            _search_cache[cache_key] = {
+                'data': json.dumps(response_data, indent=2),
+                'timestamp': datetime.now().timestamp()
+            }
         
         # Limit cache size (keep last 100 entries)
         if len(_search_cache) > 100:
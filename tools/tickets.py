@@ -1,9 +1,10 @@
 import logging
 from livekit.agents import function_tool, RunContext
-import requests
 import os
 from typing import Optional
 
+from .utils import backend_unavailable, call_timeout, is_deadline_error, timeout_result, unavailable_result
+
 logger = logging.getLogger(__name__)
 
 @function_tool()
@@ -20,6 +21,9 @@ async def create_ticket(
     """
     Create a support ticket with best-effort customer upsert. business_id may be inferred from room metadata.
     """
+    if backend_unavailable():
+        return unavailable_result('create_ticket')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         headers = {"Authorization": f"Bearer {os.getenv('BACKEND_API_KEY', '')}"}
@@ -73,7 +77,7 @@ async def create_ticket(
             f"{backend_url}/api/crm/customers/upsert",
             json=customer_data,
             headers=headers,
-            timeout=10,
+            timeout=call_timeout(context, 10, calls_left=2),
         )
         if not customer_resp.ok:
             logger.warning(f"Failed to upsert customer: {customer_resp.status_code} {customer_resp.text}")
@@ -87,12 +91,18 @@ async def create_ticket(
             "businessId": business_id,
             "userEmail": customer_email,
         }
-        response = requests.post(
-            f"{backend_url}/api/tickets",
-            json=ticket_data,
-            headers=headers,
-            timeout=10,
-        )
+        # The customer is upserted; a timeout here may still have created the ticket server-side
+        try:
+            response = requests.post(
+                f"{backend_url}/api/tickets",
+                json=ticket_data,
+                headers=headers,
+                timeout=call_timeout(context),
+            )
+        except Exception as e:
+            if not is_deadline_error(context, e):
+                raise
+            return timeout_result('create_ticket', {'customer_upserted': True, 'ticket_created': 'unknown'})
         if response.status_code in (200, 201):
             ticket = response.json()
             logger.debug(f"Created ticket: {ticket.get('_id')}")
@@ -101,20 +111,30 @@ async def create_ticket(
             logger.warning(f"Failed to create ticket: {response.status_code} {response.text}")
             return f"Failed to create support ticket: {response.text}"
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('create_ticket', {'customer_upserted': False})
         logger.warning(f"Error creating ticket: {e}")
         return f"An error occurred while creating ticket: {str(e)}"
 
 @function_tool()
 async def update_ticket(context: RunContext, ticket_id: str, status: str, notes: str = "") -> str:
     """Update ticket status (owner only)"""
+    if backend_unavailable():
+        return unavailable_result('update_ticket')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         out = {}
-        r = requests.put(f"{backend_url}/api/tickets/{ticket_id}/status", json={"status": status}, timeout=10)
-        out['status'] = r.json()
-        if notes:
-            r2 = requests.post(f"{backend_url}/api/tickets/{ticket_id}/notes", json={"note": notes}, timeout=10)
-            out['note'] = r2.json()
+        try:
+            r = requests.put(f"{backend_url}/api/tickets/{ticket_id}/status", json={"status": status}, timeout=call_timeout(context, 10, calls_left=2 if notes else 1))
+            out['status'] = r.json()
+            if notes:
+                r2 = requests.post(f"{backend_url}/api/tickets/{ticket_id}/notes", json={"note": notes}, timeout=call_timeout(context))
+                out['note'] = r2.json()
+        except Exception as e:
+            if not is_deadline_error(context, e):
+                raise
+            return timeout_result('update_ticket', out)
         return str(out)
     except Exception as e:
         logger.warning(f"update_ticket error: {e}")
@@ -123,6 +143,9 @@ async def update_ticket(context: RunContext, ticket_id: str, status: str, notes:
 @function_tool()
 async def list_tickets(context: RunContext, business_id: Optional[str] = None, status: Optional[str] = None) -> str:
     """List tickets for a business. Optional status filter: open|in-progress|resolved|closed. business_id may be inferred from room metadata if not provided."""
+    if backend_unavailable():
+        return unavailable_result('list_tickets')
+    import requests
     try:
         backend_url = os.getenv("BACKEND_URL", "https://voxa-smoky.vercel.app")
         
@@ -148,9 +171,11 @@ async def list_tickets(context: RunContext, business_id: Optional[str] = None, s
         params = {"businessId": business_id}
         if status:
             params["status"] = status
-        r = requests.get(f"{backend_url}/api/tickets", params=params, timeout=10)
+        r = requests.get(f"{backend_url}/api/tickets", params=params, timeout=call_timeout(context))
         return r.text
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('list_tickets')
         logger.warning(f"list_tickets error: {e}")
         return "[]"
 
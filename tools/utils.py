@@ -1,4 +1,17 @@
 import re
+import json
+import asyncio
+from typing import Optional
+
+from agent.deadline import get_turn_deadline
+
+# Below this much time a backend call is not worth starting
+MIN_CALL_TIMEOUT = 0.5
+
+
+class BudgetExhausted(Exception):
+    """The current turn's deadline leaves no time for another outbound call."""
+
 
 def is_valid_email(email: str) -> bool:
     return bool(re.match(r"^\S+@\S+\.\S+$", email))
@@ -7,4 +20,54 @@ def is_valid_phone(phone: str) -> bool:
     digits = re.sub(r"\D", "", phone)
     return bool(digits) and len(digits) >= 10
 
+def call_timeout(context, default: float = 10, calls_left: int = 1) -> float:
+    """Timeout for the next outbound call in a tool.
+
+    Without a turn deadline this is ``default``. Otherwise the call gets an equal share
+    of the remaining turn budget across the ``calls_left`` sequential calls the tool may
+    still make (capped at ``default``); BudgetExhausted is raised when that share is too
+    small to be useful.
+    """
+    deadline = get_turn_deadline(context)
+    if deadline is None:
+        return default
+    share = deadline.remaining() / max(1, calls_left)
+    if share < MIN_CALL_TIMEOUT:
+        raise BudgetExhausted()
+    return min(default, share)
+
+def has_deadline(context) -> bool:
+    return get_turn_deadline(context) is not None
+
+def is_deadline_error(context, error: BaseException) -> bool:
+    """True if ``error`` means the tool ran out of turn budget and should return timeout_result.
+
+    BudgetExhausted always does; a call timeout (requests or asyncio) only while a turn
+    deadline is set - without one it is an ordinary failure the tool reports itself.
+    """
+    if isinstance(error, BudgetExhausted):
+        return True
+    import requests
+    return isinstance(error, (requests.exceptions.Timeout, asyncio.TimeoutError)) and has_deadline(context)
+
+def timeout_result(tool: str, partial: Optional[dict] = None) -> str:
+    """Structured result returned when a tool runs out of turn budget."""
+    return json.dumps({
+        'status': 'timeout',
+        'tool': tool,
+        'message': 'This took too long to finish within the conversation turn. Tell the user it is still being worked on or offer to try again.',
+        'partial': partial or {},
+    })
+
+def backend_unavailable() -> bool:
+    """True while the background health check reports the backend as down."""
+    from agent.backend_health import backend_health
+    return not backend_health.is_available()
 
+def unavailable_result(tool: str) -> str:
+    """Structured result returned without calling the backend while it is known to be down."""
+    return json.dumps({
+        'status': 'unavailable',
+        'tool': tool,
+        'message': 'The business system is temporarily unreachable. Tell the user and offer to try again shortly.',
+    })
@@ -1,6 +1,7 @@
 import logging
 from livekit.agents import function_tool, RunContext
-import requests
+
+from .utils import call_timeout, is_deadline_error, timeout_result
 
 logger = logging.getLogger(__name__)
 
@@ -12,8 +13,9 @@ async def get_weather(
     """
     Get the current weather for a given city.
     """
+    import requests
     try:
-        response = requests.get(f"https://wttr.in/{city}?format=3")
+        response = requests.get(f"https://wttr.in/{city}?format=3", timeout=call_timeout(context, 10))
         if response.status_code == 200:
             logger.debug(f"Weather for {city}: {response.text.strip()}")
             return response.text.strip()
@@ -21,6 +23,8 @@ async def get_weather(
             logger.warning(f"Failed to get weather for {city}: {response.status_code}")
             return f"Could not retrieve weather for {city}."
     except Exception as e:
+        if is_deadline_error(context, e):
+            return timeout_result('get_weather', {'city': city})
         logger.warning(f"Error retrieving weather for {city}: {e}")
         return f"An error occurred while retrieving weather for {city}."
 